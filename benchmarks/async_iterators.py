@@ -0,0 +1,85 @@
+"""Measure miss throughput of cached async generators.
+
+Caching on the caller's event loop is compared with the previous implementation,
+which ran each generator in a new thread and event loop through
+`cachestore.util.async_to_sync_iterator` and pickled the items from there.
+
+Usage:
+    python benchmarks/async_iterators.py [--calls N] [--items N] [--concurrency N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from typing import AsyncIterator
+
+from cachestore import Cache, LocalStorage, PickleFormatter
+from cachestore.util import async_to_sync_iterator
+
+
+async def produce(n: int) -> AsyncIterator[int]:
+    for i in range(n):
+        await asyncio.sleep(0)
+        yield i
+
+
+def threaded_miss(storage: LocalStorage, key: str, num_items: int) -> None:
+    formatter = PickleFormatter()
+    with storage.open(key, formatter.WRITE_MODE) as file:
+        formatter.write(file, async_to_sync_iterator(produce(num_items)))
+    with storage.open(key, formatter.READ_MODE) as file:
+        for _ in formatter.read(file):
+            pass
+
+
+async def run_threaded(root: Path, num_calls: int, num_items: int, concurrency: int) -> None:
+    storage = LocalStorage(root, fsync=False)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call(i: int) -> None:
+        async with semaphore:
+            # the previous implementation blocked the loop while saving
+            threaded_miss(storage, f"threaded.{i}", num_items)
+
+    await asyncio.gather(*(call(i) for i in range(num_calls)))
+
+
+async def run_in_loop(root: Path, num_calls: int, num_items: int, concurrency: int) -> None:
+    cache = Cache("benchmark", storage=LocalStorage(root, fsync=False))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    @cache()
+    async def cached(i: int, n: int) -> AsyncIterator[int]:
+        async for item in produce(n):
+            yield item
+
+    async def call(i: int) -> None:
+        async with semaphore:
+            async for _ in cached(i, num_items):
+                pass
+
+    await asyncio.gather(*(call(i) for i in range(num_calls)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    print(f"{'implementation':>14} {'misses':>12} {'items':>14}")
+    for name, run in (("threaded", run_threaded), ("in-loop", run_in_loop)):
+        with tempfile.TemporaryDirectory() as tempdir:
+            start = time.perf_counter()
+            asyncio.run(run(Path(tempdir), args.calls, args.items, args.concurrency))
+            elapsed = time.perf_counter() - start
+        print(f"{name:>14} {args.calls / elapsed:>8.1f}/sec {args.calls * args.items / elapsed:>10.0f}/sec")
+
+
+if __name__ == "__main__":
+    main()
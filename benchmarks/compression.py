@@ -0,0 +1,113 @@
+"""Measure compression ratio against throughput of CompressedStorage codecs.
+
+Artifacts typical for cached functions are written and read through the cache:
+a list of records, a long text, a list of floats and a stream of records.
+Codecs whose library is not installed are skipped.
+
+Usage:
+    python benchmarks/compression.py [--size N] [--repeat N] [--threads N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import pickle
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from cachestore import Cache, CompressedStorage, LocalStorage, Storage
+from cachestore.common import compression
+
+CODECS = [
+    ("none", None),
+    ("gzip", 1),
+    ("gzip", 6),
+    ("bz2", 9),
+    ("lzma", 6),
+    ("zstd", 1),
+    ("zstd", 3),
+    ("zstd", 19),
+    ("lz4", 0),
+]
+
+
+def make_artifacts(size: int) -> dict[str, Callable[[], Any]]:
+    rng = random.Random(0)
+    words = ["cache", "store", "function", "artifact", "storage", "hash", "value", "key"]
+    records = [{"id": i, "name": f"user-{i}", "score": rng.random(), "tags": rng.sample(words, 3)} for i in range(size)]
+    text = " ".join(rng.choice(words) for _ in range(size * 10))
+    floats = [rng.gauss(0.0, 1.0) for _ in range(size * 4)]
+
+    def stream() -> Iterator[Any]:
+        yield from records
+
+    return {"records": lambda: records, "text": lambda: text, "floats": lambda: floats, "stream": stream}
+
+
+def make_storage(root: Path, codec: str, level: int | None, threads: int) -> Storage:
+    storage = LocalStorage(root, fsync=False)
+    if codec == "none":
+        return storage
+    return CompressedStorage(storage, codec=codec, level=level, threads=threads if codec == "zstd" else 0)
+
+
+def run(storage: Storage, artifact: Callable[[], Any], repeat: int) -> tuple[float, float, int]:
+    cache = Cache("benchmark", storage=storage)
+
+    @cache(stream=True)
+    def produce(i: int) -> Any:
+        return artifact()
+
+    start = time.perf_counter()
+    for i in range(repeat):
+        result = produce(i)
+        if hasattr(result, "__next__"):
+            for _ in result:
+                pass
+    write_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(repeat):
+        result = produce(i)
+        if hasattr(result, "__next__"):
+            for _ in result:
+                pass
+    read_time = time.perf_counter() - start
+
+    stored = sum(storage.size(key) for key in storage.all() if not key.startswith("metadata-")) // repeat
+    return write_time, read_time, stored
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=0)
+    args = parser.parse_args()
+
+    artifacts = make_artifacts(args.size)
+    print(f"{'artifact':>8} {'codec':>8} {'level':>5} {'ratio':>7} {'write':>12} {'read':>12}")
+    for name, artifact in artifacts.items():
+        value = artifact()
+        if hasattr(value, "__next__"):
+            raw_size = sum(len(pickle.dumps(item)) for item in value)
+        else:
+            raw_size = len(pickle.dumps(value))
+        for codec, level in CODECS:
+            if (codec == "zstd" and compression.zstandard is None) or (codec == "lz4" and compression.lz4frame is None):
+                continue
+            with tempfile.TemporaryDirectory() as tempdir:
+                storage = make_storage(Path(tempdir), codec, level, args.threads)
+                write_time, read_time, stored = run(storage, artifact, args.repeat)
+            megabytes = raw_size * args.repeat / 2**20
+            print(
+                f"{name:>8} {codec:>8} {'' if level is None else level:>5} {raw_size / stored:>7.2f}"
+                f" {megabytes / write_time:>7.1f} MB/s {megabytes / read_time:>7.1f} MB/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Compare the throughput of hashers on typical arguments.
+
+Usage:
+    python benchmarks/hashers.py [--repeat N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import timeit
+from typing import Any
+
+from cachestore import PickleHasher, StructuralHasher
+from cachestore.hashers import Hasher
+
+
+def build_cases() -> dict[str, Any]:
+    cases: dict[str, Any] = {
+        "small args": ((1, "foo", 3.14), {"flag": True}),
+        "bytes 64MB": b"x" * (64 * 1024 * 1024),
+        "nested dict": {f"key{i}": {"values": list(range(100)), "name": str(i)} for i in range(1000)},
+        "list of str": [f"item-{i}" for i in range(100000)],
+    }
+    try:
+        import numpy
+    except ModuleNotFoundError:
+        pass
+    else:
+        cases["ndarray 64MB"] = numpy.random.rand(8 * 1024 * 1024)
+        cases["ndarray 64MB (strided)"] = numpy.random.rand(16 * 1024 * 1024)[::2]
+    try:
+        import pandas
+    except ModuleNotFoundError:
+        pass
+    else:
+        cases["DataFrame 1M rows"] = pandas.DataFrame({"a": range(1000000), "b": ["x"] * 1000000})
+    return cases
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    hashers: dict[str, Hasher] = {"pickle": PickleHasher(), "structural": StructuralHasher()}
+
+    print(f"{'case':<24} " + " ".join(f"{name:>12}" for name in hashers) + "     speedup")
+    for name, value in build_cases().items():
+        timings = [
+            min(timeit.repeat(lambda: hasher(value), number=1, repeat=args.repeat)) for hasher in hashers.values()
+        ]
+        print(
+            f"{name:<24} "
+            + " ".join(f"{timing * 1000:>10.2f}ms" for timing in timings)
+            + f"  {timings[0] / timings[1]:>9.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
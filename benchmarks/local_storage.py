@@ -0,0 +1,62 @@
+"""Measure read throughput of a hot key in LocalStorage with multiple processes.
+
+Lock-free reads are compared with reads taking an exclusive file lock, which is
+how every access used to be done.
+
+Usage:
+    python benchmarks/local_storage.py [--reads N] [--size BYTES]
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+
+from cachestore import LocalStorage
+
+
+def read(root: Path, num_reads: int, locked: bool) -> None:
+    storage = LocalStorage(root)
+    for _ in range(num_reads):
+        if locked:
+            with storage._open_in_place(root / "key", "rb") as file:
+                file.read()
+        else:
+            with storage.open("key", "rb") as file:
+                file.read()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=4096)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("fork")
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = Path(tempdir)
+        with LocalStorage(root).open("key", "wb") as file:
+            file.write(b"x" * args.size)
+
+        print(f"{'processes':>9} {'locked':>14} {'lock-free':>14}")
+        for num_processes in (1, 2, 4, 8):
+            throughputs = []
+            for locked in (True, False):
+                processes = [
+                    context.Process(target=read, args=(root, args.reads, locked)) for _ in range(num_processes)
+                ]
+                start = time.perf_counter()
+                for process in processes:
+                    process.start()
+                for process in processes:
+                    process.join()
+                elapsed = time.perf_counter() - start
+                throughputs.append(num_processes * args.reads / elapsed)
+            print(f"{num_processes:>9} " + " ".join(f"{throughput:>10.0f}/sec" for throughput in throughputs))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,18 @@ from __future__ import annotations
 from importlib.metadata import version
 
 from cachestore.cache import Cache  # noqa: F401
-from cachestore.formatters import Formatter, PickleFormatter  # noqa: F401
-from cachestore.hashers import Hasher, PickleHasher  # noqa: F401
-from cachestore.storages import LocalStorage, Storage  # noqa: F401
+from cachestore.formatters import Formatter, NumpyFormatter, PickleFormatter  # noqa: F401
+from cachestore.hashers import Hasher, PickleHasher, StructuralHasher  # noqa: F401
+from cachestore.policies import EvictionPolicy, GreedyDualSizePolicy, LFUPolicy, LRUPolicy  # noqa: F401
+from cachestore.storages import (  # noqa: F401
+    CompressedStorage,
+    ContentAddressedStorage,
+    LocalStorage,
+    S3Storage,
+    SQLiteStorage,
+    Storage,
+    TieredStorage,
+)
 
 __version__ = version("cachestore")
 __all__ = [
@@ -13,8 +22,19 @@ __all__ = [
     "Cache",
     "Formatter",
     "PickleFormatter",
+    "NumpyFormatter",
     "Hasher",
     "PickleHasher",
+    "StructuralHasher",
+    "EvictionPolicy",
+    "LRUPolicy",
+    "LFUPolicy",
+    "GreedyDualSizePolicy",
     "Storage",
     "LocalStorage",
+    "CompressedStorage",
+    "ContentAddressedStorage",
+    "S3Storage",
+    "SQLiteStorage",
+    "TieredStorage",
 ]
@@ -3,24 +3,75 @@ from __future__ import annotations
 import asyncio
 import datetime
 import inspect
-import json
+import threading
+import time
 import types
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, as_completed
+from contextlib import suppress
 from functools import wraps
+from itertools import islice
 from logging import getLogger
-from typing import Any, Callable, Iterable, Iterator, TypeVar, cast
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Generator,
+    Iterable,
+    Iterator,
+    Optional,
+    Tuple,
+    TypeVar,
+    cast,
+)
 
+from cachestore.common import ExpiryView, Lease, LRUCache, PrefetchIterator, SingleFlight
+from cachestore.common.aio import DEFAULT_MAX_WORKERS, iterate_blocking, run_blocking
 from cachestore.config import CacheSettings, Config
 from cachestore.formatters import Formatter
 from cachestore.hashers import Hasher
-from cachestore.metadata import CacheInfo, ExecutionInfo, FunctionInfo
+from cachestore.indexes import FileMetadataIndex, MetadataIndex, Usage
+from cachestore.metadata import CacheInfo, ExecutionInfo, ExecutionInfoBuilder, FunctionInfo
+from cachestore.policies import EvictionPolicy
 from cachestore.storages import Storage
-from cachestore.util import async_to_sync_iterator, find_variable_path
+from cachestore.util import estimate_size, find_variable_path, read_keeping_open, stack_batch, take_batch
 
 logger = getLogger(__name__)
 
 T = TypeVar("T")
 F = TypeVar("F", bound=Callable)
 
+DEFAULT_MEMORY_MAXSIZE = 128
+# maximum number of entries evicted when storing a new artifact
+EVICTION_BATCH_SIZE = 16
+# number of items of an async generator written to the storage at once
+STREAM_BATCH_SIZE = 64
+
+# number of calls of `Cache.map()` looked up and written back at once
+MAP_BATCH_SIZE = 1024
+# seconds between batches of hits served from the memory tier recorded in the index
+MEMORY_HIT_INTERVAL = 1.0
+
+# in-memory entry: (artifact, expired_at)
+MemoryEntry = Tuple[Any, Optional[datetime.datetime]]
+
+
+def _call_wrapped(wrapper: Callable[..., Any], args: tuple[Any, ...], kwargs: dict[str, Any]) -> tuple[Any, float]:
+    """Call the original function of a cached one, and return its result and duration.
+
+    This is a module-level function taking the cached function, which is picklable
+    by reference, so that misses of `Cache.map()` can be computed in other processes.
+    """
+    started = time.perf_counter()
+    result = wrapper.__wrapped__(*args, **kwargs)  # type: ignore[attr-defined]
+    return result, time.perf_counter() - started
+
+
+def _batched(iterable: Iterable[T], size: int) -> Iterator[list[T]]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
 
 class Cache:
     _cache_registry: list["Cache"] = []
@@ -33,6 +84,15 @@ class Cache:
         formatter: Formatter | None = None,
         hasher: Hasher | None = None,
         disable: bool | None = None,
+        memory_maxsize: int | None = None,
+        memory_maxbytes: int | None = None,
+        lease: bool | None = None,
+        lease_timeout: float | None = None,
+        max_bytes: int | None = None,
+        max_entries: int | None = None,
+        eviction: EvictionPolicy | None = None,
+        sweep_interval: float | None = None,
+        prefetch_executor: Executor | None = None,
         config: Config | None = None,
     ) -> None:
         self.config = config or Config()
@@ -42,9 +102,25 @@ class Cache:
         self._formatter = formatter
         self._hasher = hasher
         self._disable = disable
+        self._memory_maxsize = memory_maxsize
+        self._memory_maxbytes = memory_maxbytes
+        self._lease = lease
+        self._lease_timeout = lease_timeout
+        self._max_bytes = max_bytes
+        self._max_entries = max_entries
+        self._eviction = eviction
+        self._sweep_interval = sweep_interval
+        self._prefetch_executor = prefetch_executor
 
         self._settings: CacheSettings | None = None
+        self._memory: LRUCache[str, MemoryEntry] | None = None
+        self._index: MetadataIndex | None = None
+        self._expiry = ExpiryView()
+        self._sweeper: threading.Thread | None = None
+        self._sweeper_stopped = threading.Event()
         self._function_registry: dict[str, FunctionInfo] = {}
+        # concurrent misses of the same key are computed only once
+        self._singleflight = SingleFlight()
 
         self._cache_registry.append(self)
 
@@ -75,6 +151,24 @@ class Cache:
                 self._settings.hasher = self._hasher
             if self._disable is not None:
                 self._settings.disable = self._disable
+            if self._memory_maxsize is not None:
+                self._settings.memory_maxsize = self._memory_maxsize
+            if self._memory_maxbytes is not None:
+                self._settings.memory_maxbytes = self._memory_maxbytes
+            if self._lease is not None:
+                self._settings.lease = self._lease
+            if self._lease_timeout is not None:
+                self._settings.lease_timeout = self._lease_timeout
+            if self._max_bytes is not None:
+                self._settings.max_bytes = self._max_bytes
+            if self._max_entries is not None:
+                self._settings.max_entries = self._max_entries
+            if self._eviction is not None:
+                self._settings.eviction = self._eviction
+            if self._sweep_interval is not None:
+                self._settings.sweep_interval = self._sweep_interval
+            if self._prefetch_executor is not None:
+                self._settings.prefetch_executor = self._prefetch_executor
         return self._settings
 
     @property
@@ -93,14 +187,63 @@ class Cache:
     def disable(self) -> bool:
         return self.settings.disable
 
-    def _get_key(self, funcinfo: FunctionInfo, execinfo: ExecutionInfo) -> str:
-        return ".".join((funcinfo.hash(self.hasher), execinfo.hash(self.hasher)))
+    @property
+    def eviction(self) -> EvictionPolicy:
+        return self.settings.eviction
+
+    @property
+    def budget_enabled(self) -> bool:
+        return self.settings.max_bytes is not None or self.settings.max_entries is not None
+
+    def _over_budget(self, index: MetadataIndex) -> bool:
+        num_entries, num_bytes = index.totals()
+        max_bytes, max_entries = self.settings.max_bytes, self.settings.max_entries
+        return (max_bytes is not None and num_bytes > max_bytes) or (
+            max_entries is not None and num_entries > max_entries
+        )
+
+    def _get_lease(self, key: str) -> Lease | None:
+        """Lease to compute the key if leases are enabled and supported by the storage."""
+        return self.storage.lease(key) if self.settings.lease else None
+
+    @property
+    def index(self) -> MetadataIndex:
+        if self._index is None:
+            self._index = self.storage.metadata_index or FileMetadataIndex(self.storage)
+        return self._index
+
+    @property
+    def expiry(self) -> ExpiryView:
+        """In-process view of expiry times, which saves reading metadata on each call."""
+        return self._expiry
+
+    @property
+    def memory_enabled(self) -> bool:
+        return self.settings.memory_maxsize > 0 or self.settings.memory_maxbytes is not None
+
+    @property
+    def memory(self) -> LRUCache[str, MemoryEntry]:
+        """In-process LRU tier kept in front of the storage.
+
+        It is bounded by `memory_maxsize` entries and `memory_maxbytes` estimated bytes.
+        If neither is configured but a function opts in, `DEFAULT_MEMORY_MAXSIZE` is used.
+        """
+        if self._memory is None:
+            maxsize = self.settings.memory_maxsize or None
+            maxbytes = self.settings.memory_maxbytes
+            if maxsize is None and maxbytes is None:
+                maxsize = DEFAULT_MEMORY_MAXSIZE
+            self._memory = LRUCache(maxsize=maxsize, maxbytes=maxbytes)
+        return self._memory
+
+    def _get_key(self, funchash: str, execinfo: ExecutionInfo) -> str:
+        return ".".join((funchash, execinfo.hash(self.hasher)))
 
     def _get_metakey(self, key: str) -> str:
-        return f"metadata-{key}"
+        return f"{FileMetadataIndex.PREFIX}{key}"
 
     def _is_metakey(self, key: str) -> bool:
-        return key.startswith("metadata-")
+        return key.startswith(FileMetadataIndex.PREFIX)
 
     def __call__(
         self,
@@ -109,10 +252,14 @@ class Cache:
         expire: int | datetime.timedelta | datetime.date | datetime.datetime | None = None,
         formatter: Formatter | None = None,
         disable: bool | None = None,
+        memory: bool | None = None,
+        stream: bool | None = None,
+        prefetch: int | None = None,
     ) -> Callable[[F], F]:
         def decorator(func: F) -> F:
             funcinfo = FunctionInfo.build(func)
-            self._function_registry[funcinfo.hash(self.hasher)] = funcinfo
+            funchash = funcinfo.hash(self.hasher)
+            self._function_registry[funchash] = funcinfo
 
             function_settings = self.config.function_settings(f"{self.name} {funcinfo.name}")
             if ignore is not None:
@@ -123,102 +270,705 @@ class Cache:
                 function_settings.disable = disable
             if formatter is not None:
                 function_settings.formatter = formatter
+            if memory is not None:
+                function_settings.memory = memory
+            if stream is not None:
+                function_settings.stream = stream
+            if prefetch is not None:
+                function_settings.prefetch = prefetch
+
+            if self.budget_enabled and not self.index.TRACKS_USAGE:
+                raise ValueError(f"{self.storage} does not track usage of entries, so its size cannot be bounded.")
+
+            if self.settings.sweep_interval is not None:
+                self.start_sweeper(self.settings.sweep_interval)
+
+            # everything derived from the function itself is computed once here,
+            # so that only arguments are bound and hashed on each call.
+            build_execinfo = ExecutionInfoBuilder(func, ignore=function_settings.ignore)
+            is_coroutine_function = asyncio.iscoroutinefunction(func)
 
             empty = object()
 
+            def _use_memory() -> bool:
+                return self.memory_enabled if function_settings.memory is None else function_settings.memory
+
             def _cache_exists(key: str) -> bool:
                 expired_at = function_settings.expired_at
                 executed_at = datetime.datetime.now()
                 return self.storage.exists(key) and (expired_at is None or expired_at > executed_at)
 
+            def _find_entry(key: str, executed_at: datetime.datetime) -> tuple[bool, datetime.datetime | None]:
+                """Return whether a live entry of the key exists and when it expires.
+
+                Metadata is read only for keys which are not in the expiry view yet.
+                """
+                known, expired_at = self.expiry.lookup(key)
+                if not known:
+                    cacheinfo = self.index.get(key)
+                    if cacheinfo is None:
+                        return False, None
+                    expired_at = cacheinfo.expired_at
+                    self.expiry.set(key, expired_at)
+
+                if expired_at is not None and expired_at <= executed_at:
+                    logger.info("[%s] Cache was expired, so remove existing artifact.", funcinfo.name)
+                    self._remove_entry(key)
+                    return False, None
+                if not _cache_exists(key):
+                    self.expiry.discard(key)
+                    return False, None
+                return True, expired_at
+
+            def _blocking(fn: Callable[..., T], *args: Any) -> Awaitable[T]:
+                return run_blocking(self.storage.executor, fn, *args)
+
+            async def _acache_exists(key: str) -> bool:
+                expired_at = function_settings.expired_at
+                return await self.storage.aexists(key) and (expired_at is None or expired_at > datetime.datetime.now())
+
+            async def _afind_entry(key: str, executed_at: datetime.datetime) -> tuple[bool, datetime.datetime | None]:
+                known, expired_at = self.expiry.lookup(key)
+                if not known:
+                    cacheinfo = await _blocking(self.index.get, key)
+                    if cacheinfo is None:
+                        return False, None
+                    expired_at = cacheinfo.expired_at
+                    self.expiry.set(key, expired_at)
+
+                if expired_at is not None and expired_at <= executed_at:
+                    logger.info("[%s] Cache was expired, so remove existing artifact.", funcinfo.name)
+                    await _blocking(self._remove_entry, key)
+                    return False, None
+                if not await _acache_exists(key):
+                    self.expiry.discard(key)
+                    return False, None
+                return True, expired_at
+
+            def _load_memory(key: str, executed_at: datetime.datetime) -> Any:
+                entry = self.memory.get(key)
+                if entry is None:
+                    return empty
+                artifact, expired_at = entry
+                if expired_at is not None and expired_at <= executed_at:
+                    self.memory.pop(key)
+                    return empty
+                return artifact
+
+            def _save_memory(key: str, artifact: Any, expired_at: datetime.datetime | None) -> None:
+                # iterators are consumed by callers, so they cannot be shared
+                if hasattr(artifact, "__next__"):
+                    return
+                self.memory.put(key, (artifact, expired_at), estimate_size(artifact))
+
+            def _build_cacheinfo(
+                execinfo: ExecutionInfo,
+                executed_at: datetime.datetime,
+                duration: float,
+            ) -> CacheInfo:
+                return CacheInfo(
+                    function=funcinfo,
+                    parameters=execinfo.params,
+                    expired_at=function_settings.expired_at,
+                    executed_at=executed_at,
+                    duration=duration,
+                )
+
+            def _save_metadata(
+                key: str,
+                execinfo: ExecutionInfo,
+                executed_at: datetime.datetime,
+                started: float,
+            ) -> CacheInfo:
+                logger.info("[%s] Export metadata.", funcinfo.name)
+                cacheinfo = _build_cacheinfo(execinfo, executed_at, time.perf_counter() - started)
+                index = self.index
+                size = None if isinstance(index, FileMetadataIndex) else self.storage.size(key)
+                if self.budget_enabled:
+                    usage = Usage(size or 0, executed_at, 0, cacheinfo.duration)
+                    index.put(key, cacheinfo, size, self.eviction.priority(usage, index.floor()))
+                    # the new artifact is kept since it is about to be returned
+                    self._evict(EVICTION_BATCH_SIZE, keep=key)
+                else:
+                    index.put(key, cacheinfo, size)
+                self.expiry.set(key, cacheinfo.expired_at)
+                return cacheinfo
+
+            def _track_hit(key: str, accessed_at: datetime.datetime) -> None:
+                if not self.budget_enabled:
+                    return
+                index = self.index
+                usage = index.usage(key)
+                if usage is not None:
+                    usage = usage._replace(accessed_at=accessed_at, hits=usage.hits + 1)
+                    index.touch(key, accessed_at, self.eviction.priority(usage, index.floor()))
+
+            memory_hits: dict[str, datetime.datetime] = {}
+            memory_hits_lock = threading.Lock()
+            memory_hits_recorded_at = float("-inf")
+
+            def _take_memory_hits(keys: Iterable[str], accessed_at: datetime.datetime) -> dict[str, datetime.datetime]:
+                """Add hits served from the memory tier, and return the ones due to be recorded in the index.
+
+                These are the most frequent hits, so they are recorded in batches at
+                most every `MEMORY_HIT_INTERVAL` seconds rather than one by one.
+                """
+                nonlocal memory_hits_recorded_at
+                if not self.budget_enabled:
+                    return {}
+                with memory_hits_lock:
+                    memory_hits.update((key, accessed_at) for key in keys)
+                    now = time.monotonic()
+                    if not memory_hits or now - memory_hits_recorded_at < MEMORY_HIT_INTERVAL:
+                        return {}
+                    memory_hits_recorded_at = now
+                    hits = dict(memory_hits)
+                    memory_hits.clear()
+                return hits
+
+            def _track_hits(hits: dict[str, datetime.datetime]) -> None:
+                for key, accessed_at in hits.items():
+                    _track_hit(key, accessed_at)
+
             def _save_cache(
                 key: str,
-                metakey: str,
                 execinfo: ExecutionInfo,
                 executed_at: datetime.datetime,
                 artifact: Any,
-            ) -> None:
-                expired_at = function_settings.expired_at
+                started: float,
+            ) -> CacheInfo:
                 formatter = function_settings.formatter or self.formatter
 
                 logger.info("[%s] Store new artifact.", funcinfo.name)
-                with self.storage.open(key, formatter.WRITE_MODE) as file:
-                    formatter.write(file, artifact)
+                # the artifact and its metadata file are committed together by transactional storages
+                with self.storage.batch():
+                    with self.storage.open(key, formatter.WRITE_MODE) as file:
+                        formatter.write(file, artifact)
+                    return _save_metadata(key, execinfo, executed_at, started)
 
-                logger.info("[%s] Export metadata.", funcinfo.name)
-                cacheinfo = CacheInfo(
-                    function=funcinfo,
-                    parameters=execinfo.params,
-                    expired_at=expired_at,
-                    executed_at=executed_at,
-                )
-                with self.storage.open(metakey, "wt") as file:
-                    json.dump(cacheinfo.to_dict(), file)
+            async def _asave_cache(
+                key: str,
+                execinfo: ExecutionInfo,
+                executed_at: datetime.datetime,
+                artifact: Any,
+                started: float,
+            ) -> CacheInfo:
+                formatter = function_settings.formatter or self.formatter
 
-            def _load_cache(key: str) -> Any:
+                logger.info("[%s] Store new artifact.", funcinfo.name)
+                async with self.storage.aopen(key, formatter.WRITE_MODE) as file:
+                    await formatter.awrite(file, artifact)
+
+                return await _blocking(_save_metadata, key, execinfo, executed_at, started)
+
+            def _is_streaming(artifact: Any) -> bool:
                 formatter = function_settings.formatter or self.formatter
-                with self.storage.open(key, formatter.READ_MODE) as file:
-                    artifact = formatter.read(file)
-                return artifact
+                return function_settings.stream and formatter.STREAMING and hasattr(artifact, "__next__")
+
+            def _discard_cache(key: str) -> None:
+                # metadata is written only after the whole stream is stored,
+                # so a partially written artifact is never treated as a hit.
+                logger.info("[%s] Stream was not completed, so discard the artifact.", funcinfo.name)
+                if self.storage.exists(key):
+                    self.storage.remove(key)
+
+            def _stream_cache(
+                key: str,
+                execinfo: ExecutionInfo,
+                executed_at: datetime.datetime,
+                artifact: Iterator[Any],
+            ) -> Iterator[Any]:
+                formatter = function_settings.formatter or self.formatter
+                logger.info("[%s] Stream new artifact.", funcinfo.name)
+                started = time.perf_counter()
+                try:
+                    with self.storage.open(key, formatter.WRITE_MODE) as file:
+                        write = formatter.iterwriter(file)
+                        for item in artifact:
+                            write(item)
+                            yield item
+                        close = getattr(write, "close", None)
+                        if close is not None:
+                            close()
+                except BaseException:
+                    _discard_cache(key)
+                    raise
+                _save_metadata(key, execinfo, executed_at, started)
+
+            async def _astream_cache(
+                key: str,
+                execinfo: ExecutionInfo,
+                executed_at: datetime.datetime,
+                artifact: AsyncIterator[Any],
+            ) -> AsyncIterator[Any]:
+                formatter = function_settings.formatter or self.formatter
+                logger.info("[%s] Stream new artifact.", funcinfo.name)
+                started = time.perf_counter()
+                try:
+                    async with self.storage.aopen(key, formatter.WRITE_MODE) as file:
+                        write = await formatter.aiterwriter(file)
+                        # items are written in batches to save round trips to the executor
+                        buffer: list[Any] = []
+                        async for item in artifact:
+                            buffer.append(item)
+                            yield item
+                            if len(buffer) >= STREAM_BATCH_SIZE:
+                                await write(buffer)
+                                buffer = []
+                        if buffer:
+                            await write(buffer)
+                        await write.close()
+                except BaseException:
+                    _discard_cache(key)
+                    raise
+                await _blocking(_save_metadata, key, execinfo, executed_at, started)
+
+            def _prefetch(artifact: Any) -> Any:
+                depth = function_settings.prefetch
+                if not depth or not hasattr(artifact, "__next__"):
+                    return artifact
+                # chunked iterators read whole chunks ahead, possibly in the executor
+                if hasattr(artifact, "prefetch"):
+                    return artifact.prefetch(depth, self.settings.prefetch_executor)
+                return PrefetchIterator(artifact, depth)
+
+            def _read_cache(key: str) -> Any:
+                formatter = function_settings.formatter or self.formatter
+                # resolving the path may query or copy between storages, so it is storage I/O too
+                path = self.storage.path(key) if formatter.MAPPABLE else None
+                if path is not None:
+                    return formatter.read_path(path)
+                return read_keeping_open(self.storage.open(key, formatter.READ_MODE), formatter.read)
+
+            def _load_cache(key: str, expired_at: datetime.datetime | None = None) -> Any:
+                artifact = _read_cache(key)
+                if _use_memory():
+                    _save_memory(key, artifact, expired_at)
+                return _prefetch(artifact)
+
+            async def _aload_cache(key: str, expired_at: datetime.datetime | None = None) -> Any:
+                # iterator artifacts keep the file open in the executor while they are read
+                artifact = await _blocking(_read_cache, key)
+                if _use_memory():
+                    _save_memory(key, artifact, expired_at)
+                return _prefetch(artifact)
+
+            async def _aiterate(artifact: Iterable[Any]) -> AsyncIterator[Any]:
+                if hasattr(artifact, "__next__"):
+                    # items of iterator artifacts are read from the file while iterating
+                    async for item in iterate_blocking(self.storage.executor, cast(Iterator[Any], artifact)):
+                        yield item
+                else:
+                    for item in artifact:
+                        yield item
+
+            async def _alookup(key: str, executed_at: datetime.datetime) -> Any:
+                if _use_memory():
+                    artifact = _load_memory(key, executed_at)
+                    if artifact is not empty:
+                        logger.info("[%s] Memory cache exists", funcinfo.name)
+                        hits = _take_memory_hits([key], executed_at)
+                        if hits:
+                            await _blocking(_track_hits, hits)
+                        return artifact
+
+                exists, expired_at = await _afind_entry(key, executed_at)
+                if not exists:
+                    return empty
+
+                logger.info("[%s] Cache exists", funcinfo.name)
+                if self.budget_enabled:
+                    await _blocking(_track_hit, key, executed_at)
+                return await _aload_cache(key, expired_at)
+
+            def _lookup(key: str, executed_at: datetime.datetime) -> Any:
+                if _use_memory():
+                    artifact = _load_memory(key, executed_at)
+                    if artifact is not empty:
+                        logger.info("[%s] Memory cache exists", funcinfo.name)
+                        _track_hits(_take_memory_hits([key], executed_at))
+                        return artifact
+
+                exists, expired_at = _find_entry(key, executed_at)
+                if not exists:
+                    return empty
+
+                logger.info("[%s] Cache exists", funcinfo.name)
+                _track_hit(key, executed_at)
+                return _load_cache(key, expired_at)
+
+            def _compute(
+                key: str,
+                execinfo: ExecutionInfo,
+                executed_at: datetime.datetime,
+                args: tuple[Any, ...],
+                kwargs: dict[str, Any],
+            ) -> Any:
+                started = time.perf_counter()
+                artifact = func(*args, **kwargs)
+                if isinstance(artifact, types.CoroutineType):
+                    return _coro_save(key, execinfo, executed_at, artifact)
+
+                if _is_streaming(artifact):
+                    return _stream_cache(key, execinfo, executed_at, artifact)
+
+                cacheinfo = _save_cache(key, execinfo, executed_at, artifact, started)
+                return _load_cache(key, cacheinfo.expired_at)
+
+            def _compute_with_lease(
+                key: str,
+                execinfo: ExecutionInfo,
+                executed_at: datetime.datetime,
+                args: tuple[Any, ...],
+                kwargs: dict[str, Any],
+            ) -> Any:
+                lease = self._get_lease(key)
+                if lease is None:
+                    return _compute(key, execinfo, executed_at, args, kwargs)
+                if not lease.acquire(self.settings.lease_timeout):
+                    logger.warning("[%s] Lease was not acquired in time, so compute without it.", funcinfo.name)
+                    return _compute(key, execinfo, executed_at, args, kwargs)
+                try:
+                    # another process may have stored the artifact while waiting for the lease
+                    artifact = _lookup(key, executed_at)
+                    if artifact is empty:
+                        artifact = _compute(key, execinfo, executed_at, args, kwargs)
+                    return artifact
+                finally:
+                    lease.release()
+
+            async def _coro_compute(
+                key: str,
+                execinfo: ExecutionInfo,
+                executed_at: datetime.datetime,
+                args: tuple[Any, ...],
+                kwargs: dict[str, Any],
+            ) -> Any:
+                lease = self._get_lease(key)
+                if lease is None:
+                    return await _coro_save(key, execinfo, executed_at, func(*args, **kwargs))
+                if not await lease.aacquire(self.settings.lease_timeout):
+                    logger.warning("[%s] Lease was not acquired in time, so compute without it.", funcinfo.name)
+                    return await _coro_save(key, execinfo, executed_at, func(*args, **kwargs))
+                try:
+                    artifact = await _alookup(key, executed_at)
+                    if artifact is empty:
+                        artifact = await _coro_save(key, execinfo, executed_at, func(*args, **kwargs))
+                    return artifact
+                finally:
+                    lease.release()
+
+            async def _coro_save(
+                key: str,
+                execinfo: ExecutionInfo,
+                executed_at: datetime.datetime,
+                coroutine: Any,
+            ) -> Any:
+                started = time.perf_counter()
+                value = await coroutine
+                cacheinfo = await _asave_cache(key, execinfo, executed_at, value, started)
+                if _use_memory():
+                    _save_memory(key, value, cacheinfo.expired_at)
+                return value
 
             async def _coro_wrapper(
                 key: str,
-                metakey: str,
                 execinfo: ExecutionInfo,
                 executed_at: datetime.datetime,
-                value: Any = empty,
+                args: tuple[Any, ...],
+                kwargs: dict[str, Any],
             ) -> Any:
-                if value is empty:
-                    value = _load_cache(key)
+                artifact = await _alookup(key, executed_at)
+                if artifact is not empty:
+                    return artifact
+
+                logger.info("[%s] Cache does not exists.", funcinfo.name)
+                value, computed = await self._singleflight.ado(
+                    key, lambda: _coro_compute(key, execinfo, executed_at, args, kwargs)
+                )
+                if computed:
+                    return value
+
+                # the artifact stored by the concurrent caller is loaded like a hit
+                artifact = await _alookup(key, executed_at)
+                return value if artifact is empty else artifact
+
+            def _find_entries(keys: list[str], executed_at: datetime.datetime) -> dict[str, datetime.datetime | None]:
+                """Bulk version of `_find_entry()`, returning live entries among the keys and their expiry."""
+                found: dict[str, datetime.datetime | None] = {}
+                unknown: list[str] = []
+                for key in keys:
+                    known, expired_at = self.expiry.lookup(key)
+                    if known:
+                        found[key] = expired_at
+                    else:
+                        unknown.append(key)
+                for key, cacheinfo in self.index.get_many(unknown).items():
+                    self.expiry.set(key, cacheinfo.expired_at)
+                    found[key] = cacheinfo.expired_at
+
+                live: dict[str, datetime.datetime | None] = {}
+                for key, expired_at in found.items():
+                    if expired_at is not None and expired_at <= executed_at:
+                        self._remove_entry(key)
+                    else:
+                        live[key] = expired_at
+                if function_settings.expired_at is not None and function_settings.expired_at <= executed_at:
+                    return {}
+
+                existing = self.storage.exists_many(live)
+                for key in live.keys() - existing:
+                    self.expiry.discard(key)
+                return {key: expired_at for key, expired_at in live.items() if key in existing}
+
+            def _load_hit(key: str, expired_at: datetime.datetime | None, executed_at: datetime.datetime) -> Any:
+                _track_hit(key, executed_at)
+                return _load_cache(key, expired_at)
+
+            def _store(
+                key: str,
+                execinfo: ExecutionInfo,
+                executed_at: datetime.datetime,
+                artifact: Any,
+                duration: float,
+            ) -> tuple[Any, tuple[str, CacheInfo, int | None]]:
+                """Write an artifact computed by `Cache.map()`, leaving its metadata to be saved in bulk."""
+                formatter = function_settings.formatter or self.formatter
+                with self.storage.open(key, formatter.WRITE_MODE) as file:
+                    formatter.write(file, artifact)
+                size = None if isinstance(self.index, FileMetadataIndex) else self.storage.size(key)
+                cacheinfo = _build_cacheinfo(execinfo, executed_at, duration)
+                # iterators are consumed by writing them, so they are played back from the storage
+                if hasattr(artifact, "__next__"):
+                    artifact = _load_cache(key, cacheinfo.expired_at)
+                elif _use_memory():
+                    _save_memory(key, artifact, cacheinfo.expired_at)
+                return artifact, (key, cacheinfo, size)
+
+            def _on_stored(writing: Future[Any], store: Future[Any], result: Future[Any]) -> None:
+                try:
+                    artifact, entry = writing.result()
+                except BaseException as error:
+                    store.set_exception(error)
+                    result.set_exception(error)
+                    return
+                store.set_result((artifact, entry))
+                result.set_result(artifact)
+
+            def _save_metadata_many(entries: list[tuple[str, CacheInfo, int | None]]) -> None:
+                if not entries:
+                    return
+                logger.info("[%s] Export metadata of %d entries.", funcinfo.name, len(entries))
+                index = self.index
+                if self.budget_enabled:
+                    for key, cacheinfo, size in entries:
+                        usage = Usage(size or 0, cacheinfo.executed_at, 0, cacheinfo.duration)
+                        index.put(key, cacheinfo, size, self.eviction.priority(usage, index.floor()))
+                    self._evict(EVICTION_BATCH_SIZE)
                 else:
-                    value = await value
-                    _save_cache(key, metakey, execinfo, executed_at, value)
-                return value
+                    # metadata files of the batch are committed at once by transactional storages
+                    with self.storage.batch():
+                        index.put_many(entries)
+                for key, cacheinfo, _ in entries:
+                    self.expiry.set(key, cacheinfo.expired_at)
+
+            def _submit_hits(keys: list[str], executed_at: datetime.datetime) -> dict[str, Future[Any]]:
+                """Look up the keys in bulk, and load the hits concurrently in the executor of the storage."""
+                hits: dict[str, Future[Any]] = {}
+                if _use_memory():
+                    for key in keys:
+                        artifact = _load_memory(key, executed_at)
+                        if artifact is not empty:
+                            hits[key] = Future()
+                            hits[key].set_result(artifact)
+                    _track_hits(_take_memory_hits(hits, executed_at))
+
+                lookup = list(dict.fromkeys(key for key in keys if key not in hits))
+                for key, expired_at in _find_entries(lookup, executed_at).items():
+                    hits[key] = self.storage.executor.submit(_load_hit, key, expired_at, executed_at)
+                return hits
+
+            def _call_batch(bound: inspect.BoundArguments, argument: str) -> Any:
+                """Call the function with the elements of a batch argument whose results are not cached.
+
+                Each element is cached as a call with the element in place of the batch.
+                """
+                batch = bound.arguments[argument]
+                elements = list(batch)
+                disable = self.disable if function_settings.disable is None else function_settings.disable
+                if disable or not elements:
+                    return func(*bound.args, **bound.kwargs)
+
+                executed_at = datetime.datetime.now()
+                execinfos: list[ExecutionInfo] = []
+                for element in elements:
+                    bound.arguments[argument] = element
+                    execinfos.append(build_execinfo(*bound.args, **bound.kwargs))
+                keys = [self._get_key(funchash, execinfo) for execinfo in execinfos]
+                results = _submit_hits(keys, executed_at)
+
+                # each missing element is passed once, in the order of the batch
+                first_positions: dict[str, int] = {}
+                for position, key in enumerate(keys):
+                    if key not in results:
+                        first_positions.setdefault(key, position)
+                misses = list(first_positions.items())
+                if misses:
+                    logger.info("[%s] Compute %d of %d elements.", funcinfo.name, len(misses), len(elements))
+                    bound.arguments[argument] = take_batch(batch, elements, [position for _, position in misses])
+                    started = time.perf_counter()
+                    outputs = list(func(*bound.args, **bound.kwargs))
+                    duration = time.perf_counter() - started
+                    if len(outputs) != len(misses):
+                        raise ValueError(
+                            f"{funcinfo.name} returned {len(outputs)} results for a batch of {len(misses)} elements."
+                        )
+
+                    storing = [
+                        self.storage.executor.submit(
+                            _store, key, execinfos[position], executed_at, output, duration / len(misses)
+                        )
+                        for (key, position), output in zip(misses, outputs)
+                    ]
+                    entries = []
+                    try:
+                        for (key, _), future in zip(misses, storing):
+                            artifact, entry = future.result()
+                            results[key] = Future()
+                            results[key].set_result(artifact)
+                            entries.append(entry)
+                    finally:
+                        _save_metadata_many(entries)
+
+                return stack_batch([results[key].result() for key in keys])
+
+            def _map_batch(
+                calls: list[tuple[tuple[Any, ...], dict[str, Any]]],
+                executor: Executor,
+                ordered: bool,
+            ) -> Iterator[Any]:
+                executed_at = datetime.datetime.now()
+                disable = self.disable if function_settings.disable is None else function_settings.disable
+                if disable:
+                    computed = [executor.submit(_call_wrapped, wrapper, args, kwargs) for args, kwargs in calls]
+                    if ordered:
+                        for future in computed:
+                            yield future.result()[0]
+                    else:
+                        positions = {future: position for position, future in enumerate(computed)}
+                        for future in as_completed(computed):
+                            yield positions[future], future.result()[0]
+                    return
+
+                execinfos = [build_execinfo(*args, **kwargs) for args, kwargs in calls]
+                keys = [self._get_key(funchash, execinfo) for execinfo in execinfos]
+                results = _submit_hits(keys, executed_at)
+
+                # each missing key is computed once in the executor and then written concurrently
+                stored: list[Future[tuple[Any, tuple[str, CacheInfo, int | None]]]] = []
+                computing: list[Future[tuple[Any, float]]] = []
+                for position, key in enumerate(keys):
+                    if key in results:
+                        continue
+                    args, kwargs = calls[position]
+                    compute = executor.submit(_call_wrapped, wrapper, args, kwargs)
+                    store: Future[tuple[Any, tuple[str, CacheInfo, int | None]]] = Future()
+                    result: Future[Any] = Future()
+
+                    def on_computed(
+                        compute: Future[tuple[Any, float]],
+                        key: str = key,
+                        execinfo: ExecutionInfo = execinfos[position],
+                        store: Future[Any] = store,
+                        result: Future[Any] = result,
+                    ) -> None:
+                        try:
+                            value, duration = compute.result()
+                        except BaseException as error:
+                            store.set_exception(error)
+                            result.set_exception(error)
+                            return
+                        writing = self.storage.executor.submit(_store, key, execinfo, executed_at, value, duration)
+                        writing.add_done_callback(lambda writing: _on_stored(writing, store, result))
+
+                    compute.add_done_callback(on_computed)
+                    computing.append(compute)
+                    stored.append(store)
+                    results[key] = result
+
+                try:
+                    if ordered:
+                        for key in keys:
+                            yield results[key].result()
+                    else:
+                        slots: dict[Future[Any], list[int]] = {}
+                        for position, key in enumerate(keys):
+                            slots.setdefault(results[key], []).append(position)
+                        for future in as_completed(slots):
+                            value = future.result()
+                            for position in slots[future]:
+                                yield position, value
+                finally:
+                    # metadata of all stored artifacts is saved at once, even if the caller stopped early
+                    for compute in computing:
+                        compute.cancel()
+                    entries = []
+                    for store in stored:
+                        with suppress(BaseException):
+                            entries.append(store.result()[1])
+                    _save_metadata_many(entries)
+
+            def _map(
+                iterable: Iterable[tuple[tuple[Any, ...], dict[str, Any]]],
+                executor: Executor | None,
+                ordered: bool,
+                batch_size: int,
+            ) -> Iterator[Any]:
+                if executor is None:
+                    with ThreadPoolExecutor(max_workers=DEFAULT_MAX_WORKERS) as pool:
+                        yield from _map(iterable, pool, ordered, batch_size)
+                    return
+                offset = 0
+                for calls in _batched(iterable, batch_size):
+                    if ordered:
+                        yield from _map_batch(calls, executor, ordered)
+                    else:
+                        for position, value in _map_batch(calls, executor, ordered):
+                            yield offset + position, value
+                    offset += len(calls)
 
             @wraps(func)
             def wrapper(*args: Any, **kwargs: Any) -> Any:
                 executed_at = datetime.datetime.now()
                 disable = self.disable if function_settings.disable is None else function_settings.disable
 
-                storage = self.storage
-
                 if disable:
                     logger.info("[%s] Disable cache.", funcinfo.name)
                     return func(*args, **kwargs)
 
-                execinfo = ExecutionInfo.build(func, *args, **kwargs)
-                for paramname in function_settings.ignore:
-                    del execinfo.params[paramname]
-
-                key = self._get_key(funcinfo, execinfo)
-                metakey = self._get_metakey(key)
-
-                if storage.exists(metakey):
-                    with storage.open(metakey, "rt") as file:
-                        cacheinfo = CacheInfo.from_dict(json.load(file))
-                    if cacheinfo.expired_at is not None and cacheinfo.expired_at <= executed_at:
-                        logger.info("[%s] Cache was expired, so remove existing artifact.", funcinfo.name)
-                        storage.remove(key)
-                        storage.remove(metakey)
-
-                if _cache_exists(key):
-                    logger.info("[%s] Cache exists", funcinfo.name)
-                    if asyncio.iscoroutinefunction(func):
-                        return _coro_wrapper(key, metakey, execinfo, executed_at)
-                    else:
-                        return _load_cache(key)
-                else:
-                    logger.info("[%s] Cache does not exists.", funcinfo.name)
-                    artifact = func(*args, **kwargs)
-                    if isinstance(artifact, types.CoroutineType):
-                        return _coro_wrapper(key, metakey, execinfo, executed_at, artifact)
+                execinfo = build_execinfo(*args, **kwargs)
+                key = self._get_key(funchash, execinfo)
 
-                    _save_cache(key, metakey, execinfo, executed_at, artifact)
+                if is_coroutine_function:
+                    return _coro_wrapper(key, execinfo, executed_at, args, kwargs)
 
-                    if asyncio.iscoroutinefunction(artifact):
-                        return _coro_wrapper(key, metakey, execinfo, executed_at, artifact)
+                artifact = _lookup(key, executed_at)
+                if artifact is not empty:
+                    return artifact
 
-                    return _load_cache(key)
+                logger.info("[%s] Cache does not exists.", funcinfo.name)
+                artifact, computed = self._singleflight.do(
+                    key, lambda: _compute_with_lease(key, execinfo, executed_at, args, kwargs)
+                )
+                if computed:
+                    return artifact
+
+                # Load an own copy of the artifact stored by the concurrent caller.  If
+                # nothing was stored yet, e.g. the result is being streamed, compute it.
+                artifact = _lookup(key, executed_at)
+                if artifact is empty:
+                    return _compute(key, execinfo, executed_at, args, kwargs)
+                return artifact
 
             @wraps(func)
             async def asyncgen_wrapper(*args: Any, **kwargs: Any) -> Any:
@@ -226,56 +976,196 @@ class Cache:
                 executed_at = datetime.datetime.now()
                 disable = self.disable if function_settings.disable is None else function_settings.disable
 
-                storage = self.storage
-
                 if disable:
                     logger.info("[%s] Disable cache.", funcinfo.name)
                     async for value in func(*args, **kwargs):
                         yield value
                 else:
-                    execinfo = ExecutionInfo.build(func, *args, **kwargs)
-                    for paramname in function_settings.ignore:
-                        del execinfo.params[paramname]
-
-                    key = self._get_key(funcinfo, execinfo)
-                    metakey = self._get_metakey(key)
-
-                    if storage.exists(metakey):
-                        with storage.open(metakey, "rt") as file:
-                            cacheinfo = CacheInfo.from_dict(json.load(file))
-                        if cacheinfo.expired_at is not None and cacheinfo.expired_at <= executed_at:
-                            logger.info("[%s] Cache was expired, so remove existing artifact.", funcinfo.name)
-                            storage.remove(key)
-                            storage.remove(metakey)
-
-                    if _cache_exists(key):
+                    execinfo = build_execinfo(*args, **kwargs)
+                    key = self._get_key(funchash, execinfo)
+
+                    exists, _ = await _afind_entry(key, executed_at)
+
+                    if exists:
                         logger.info("[%s] Cache exists", funcinfo.name)
-                        artifact = _load_cache(key)
+                        if self.budget_enabled:
+                            await _blocking(_track_hit, key, executed_at)
+                        artifact = await _aload_cache(key)
+                    elif function_settings.stream and (function_settings.formatter or self.formatter).STREAMING:
+                        logger.info("[%s] Cache does not exists.", funcinfo.name)
+                        stream = _astream_cache(key, execinfo, executed_at, func(*args, **kwargs))
+                        try:
+                            async for result in stream:
+                                yield result
+                        finally:
+                            await stream.aclose()  # type: ignore[attr-defined]
+                        return
                     else:
                         logger.info("[%s] Cache does not exists.", funcinfo.name)
-                        results = async_to_sync_iterator(func(*args, **kwargs))
+                        # The generator runs on the caller's loop and is stored as a
+                        # whole before its items are played back from the storage.
+                        formatter = function_settings.formatter or self.formatter
+                        if formatter.STREAMING:
+                            stream = _astream_cache(key, execinfo, executed_at, func(*args, **kwargs))
+                            try:
+                                async for _ in stream:
+                                    pass
+                            finally:
+                                await stream.aclose()  # type: ignore[attr-defined]
+                        else:
+                            started = time.perf_counter()
+                            results = [result async for result in func(*args, **kwargs)]
+                            await _asave_cache(key, execinfo, executed_at, iter(results), started)
 
-                        _save_cache(key, metakey, execinfo, executed_at, results)  # type: ignore[arg-type]
-
-                        # reopen artifact beacause if artifact is iterator,
-                        # it is consumed when saving cache.
-                        artifact = _load_cache(key)
+                        artifact = await _aload_cache(key)
 
                     assert isinstance(artifact, Iterable)
-                    for result in artifact:
+                    async for result in _aiterate(artifact):
                         yield result
 
             setattr(wrapper, "__signature__", inspect.signature(func))
             setattr(wrapper, "__annotations__", func.__annotations__)
             setattr(wrapper, "__cachesore_funcinfo", funcinfo)
+            setattr(wrapper, "__cachestore_map", _map)
+            setattr(wrapper, "__cachestore_batch", _call_batch)
 
             if inspect.isasyncgenfunction(func):
+                setattr(asyncgen_wrapper, "__cachesore_funcinfo", funcinfo)
                 return cast(F, asyncgen_wrapper)
 
             return cast(F, wrapper)
 
         return cast(Callable[[F], F], decorator)
 
+    def batched(
+        self,
+        argument: str | None = None,
+        *,
+        ignore: set[str] | None = None,
+        expire: int | datetime.timedelta | datetime.date | datetime.datetime | None = None,
+        formatter: Formatter | None = None,
+        disable: bool | None = None,
+        memory: bool | None = None,
+    ) -> Callable[[F], F]:
+        """Cache a function taking a batch of inputs and returning aligned outputs per element.
+
+        `argument` names the batch parameter, which is the first one by default.  Each
+        element is cached like a call with the element in place of the batch, so a new
+        element does not invalidate the others.  All elements are looked up at once,
+        and the function is called once with the missing ones only, in a container of
+        the same kind as the batch.  Results are returned in the order of the batch,
+        as an array if they are NumPy arrays or scalars and as a list otherwise.
+        """
+
+        def decorator(func: F) -> F:
+            if not callable(func) or inspect.iscoroutinefunction(func) or inspect.isasyncgenfunction(func):
+                raise ValueError("Cache.batched() supports only plain functions.")
+            signature = inspect.signature(func)
+            name = argument or next(iter(signature.parameters), None)
+            if name is None or name not in signature.parameters:
+                raise ValueError(f"{func.__qualname__} has no batch argument {argument}.")
+
+            cached = self(ignore=ignore, expire=expire, formatter=formatter, disable=disable, memory=memory)(func)
+            call_batch = getattr(cached, "__cachestore_batch")
+
+            @wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                return call_batch(signature.bind(*args, **kwargs), name)
+
+            setattr(wrapper, "__cachesore_funcinfo", getattr(cached, "__cachesore_funcinfo"))
+            return cast(F, wrapper)
+
+        return cast(Callable[[F], F], decorator)
+
+    def _get_map(self, func: Callable[..., Any]) -> Callable[..., Iterator[Any]]:
+        funcinfo = getattr(func, "__cachesore_funcinfo", None)
+        map_fn = getattr(func, "__cachestore_map", None)
+        if map_fn is None or funcinfo is None or self._function_registry.get(funcinfo.hash(self.hasher)) is None:
+            raise ValueError(f"{func} is not a function cached by {self}.")
+        return cast(Callable[..., Iterator[Any]], map_fn)
+
+    def map(
+        self,
+        func: Callable[..., T],
+        *iterables: Iterable[Any],
+        executor: Executor | None = None,
+        ordered: bool = True,
+        batch_size: int = MAP_BATCH_SIZE,
+    ) -> Iterator[Any]:
+        """Call a cached function on each item of the iterables, like `map()`.
+
+        Calls are taken in batches of `batch_size`.  Keys of a whole batch are looked
+        up at once, hits are loaded concurrently in the executor of the storage, and
+        only misses are computed in `executor`, which is a new thread pool by default.
+        Each missing key is computed once, and metadata of the batch is saved at once.
+        A `ProcessPoolExecutor` computes misses in other processes if arguments and
+        results are picklable.
+
+        Results are yielded in the order of the items.  If `ordered` is false,
+        `(index, result)` pairs are yielded as soon as each result is ready instead.
+        """
+        original = inspect.unwrap(func)
+        if asyncio.iscoroutinefunction(original) or inspect.isasyncgenfunction(original):
+            raise ValueError("Cache.map() does not support async functions, use Cache.amap() instead.")
+        map_fn = self._get_map(func)
+        calls: Iterator[tuple[tuple[Any, ...], dict[str, Any]]] = ((args, {}) for args in zip(*iterables))
+        return map_fn(calls, executor, ordered, batch_size)
+
+    async def amap(
+        self,
+        func: Callable[..., Any],
+        *iterables: Iterable[Any],
+        executor: Executor | None = None,
+        ordered: bool = True,
+        batch_size: int = MAP_BATCH_SIZE,
+        concurrency: int = DEFAULT_MAX_WORKERS,
+    ) -> AsyncIterator[Any]:
+        """Async version of `map()`.
+
+        Cached coroutine functions are awaited on the running loop, at most
+        `concurrency` at once, so they take no `executor`.  Other functions are
+        mapped by `map()` in a thread of its own, so the loop is never blocked.
+        """
+        original = inspect.unwrap(func)
+        if inspect.isasyncgenfunction(original):
+            raise ValueError("Cache.amap() does not support async generator functions.")
+        if asyncio.iscoroutinefunction(original) and executor is not None:
+            raise ValueError("Cache.amap() runs coroutine functions on the running loop without an executor.")
+        self._get_map(func)
+
+        if not asyncio.iscoroutinefunction(original):
+            results = self.map(func, *iterables, executor=executor, ordered=ordered, batch_size=batch_size)
+            # `map()` waits for loads submitted to the executor of the storage, so
+            # iterating it in the same executor could wait for itself
+            thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cachestore-amap")
+            try:
+                async for result in iterate_blocking(thread, results):
+                    yield result
+            finally:
+                # queued behind a chunk which may still be read, so that the loop does not wait for it
+                thread.submit(cast(Generator[Any, None, None], results).close)
+                thread.shutdown(wait=False)
+            return
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(position: int, args: tuple[Any, ...]) -> tuple[int, Any]:
+            async with semaphore:
+                return position, await func(*args)
+
+        for batch in _batched(enumerate(zip(*iterables)), batch_size):
+            tasks = [asyncio.ensure_future(call(position, args)) for position, args in batch]
+            try:
+                if ordered:
+                    for task in tasks:
+                        yield (await task)[1]
+                else:
+                    for completed in asyncio.as_completed(tasks):
+                        yield await completed
+            finally:
+                for task in tasks:
+                    task.cancel()
+
     def exists(self, func: Callable[..., Any] | FunctionInfo) -> bool:
         current = datetime.datetime.now()
         exists = False
@@ -290,11 +1180,12 @@ class Cache:
     ) -> None:
         if not isinstance(func, FunctionInfo):
             func = FunctionInfo.build(func)
-        prefix = func.hash(self.hasher)
-        if execution_prefix is not None:
-            prefix = f"{prefix}.{execution_prefix}"
-        for key in self.storage.filter(prefix=prefix):
-            self.storage.remove(key)
+        prefix = f"{func.hash(self.hasher)}.{execution_prefix or ''}"
+        if self._memory is not None:
+            self._memory.remove_prefix(prefix)
+        self.expiry.discard_prefix(prefix)
+        self.index.remove_many([key for key, _ in self.index.filter(prefix)])
+        self.storage.remove_many(list(self.storage.filter(prefix=prefix)))
 
     def funcinfos(self) -> list[FunctionInfo]:
         return list(self._function_registry.values())
@@ -302,14 +1193,109 @@ class Cache:
     def info(self, func: Callable[..., Any] | FunctionInfo) -> Iterator[tuple[str, CacheInfo]]:
         if not isinstance(func, FunctionInfo):
             func = FunctionInfo.build(func)
-        prefix = func.hash(self.hasher)
-        for key in self.storage.filter(prefix=prefix):
-            metakey = self._get_metakey(key)
-            with self.storage.open(metakey, "rt") as file:
-                yield key, CacheInfo.from_dict(json.load(file))
+        prefix = f"{func.hash(self.hasher)}."
+        yield from self.index.filter(prefix)
 
     def prune(self) -> None:
-        for key in self.storage.all():
-            if not any(key.startswith((funchash, self._get_metakey(funchash))) for funchash in self._function_registry):
-                logger.info("remove %s", key)
-                self.storage.remove(key)
+        funchashes = tuple(self._function_registry)
+        keys = [
+            key
+            for key in self.storage.all()
+            if not any(key.startswith((funchash, self._get_metakey(funchash))) for funchash in funchashes)
+        ]
+        for key in keys:
+            logger.info("remove %s", key)
+            if self._memory is not None:
+                self._memory.pop(key)
+            self.expiry.discard(key)
+        self.storage.remove_many(keys)
+        if not isinstance(self.index, FileMetadataIndex):
+            self.index.remove_many([key for key in self.index.keys() if not key.startswith(funchashes)])
+        self.storage.collect()
+
+    def evict(self, limit: int | None = None) -> int:
+        """Evict entries in the order of the eviction policy until the cache fits in its budget.
+
+        At most `limit` entries are evicted.  Returns the number of evicted entries.
+        """
+        return self._evict(limit)
+
+    def _evict(self, limit: int | None = None, keep: str | None = None) -> int:
+        if not self.budget_enabled:
+            return 0
+        index = self.index
+        if not index.TRACKS_USAGE:
+            raise ValueError(f"{self.storage} does not track usage of entries, so its size cannot be bounded.")
+
+        num_evicted = 0
+        while self._over_budget(index) and (limit is None or num_evicted < limit):
+            batch_size = EVICTION_BATCH_SIZE if limit is None else min(limit - num_evicted, EVICTION_BATCH_SIZE)
+            keys = [key for key in index.lowest(batch_size + 1) if key != keep][:batch_size]
+            if not keys:
+                break
+            for key in keys:
+                if not self._over_budget(index):
+                    break
+                logger.info("evict %s", key)
+                self._remove_entry(key)
+                num_evicted += 1
+        return num_evicted
+
+    def _remove_entry(self, key: str) -> None:
+        # metadata goes first, so that the entry is no longer a hit while its artifact is removed
+        if self._memory is not None:
+            self._memory.pop(key)
+        self.expiry.discard(key)
+        self.index.remove(key)
+        with suppress(FileNotFoundError):
+            self.storage.remove(key)
+
+    def sweep(self, at: datetime.datetime | None = None) -> int:
+        """Remove all entries expired at the given time, and return the number of removed entries."""
+        at = at or datetime.datetime.now()
+        keys = set(self.index.expired(at))
+        keys.update(key for key in self.expiry.pop_expired(at) if self.index.get(key) is not None)
+        if not keys:
+            return 0
+        logger.info("sweep %d expired entries", len(keys))
+        for key in keys:
+            if self._memory is not None:
+                self._memory.pop(key)
+            self.expiry.discard(key)
+        # metadata is removed in bulk before artifacts, so that no entry is a hit halfway
+        self.index.remove_many(keys)
+        self.storage.remove_many(keys)
+        return len(keys)
+
+    def start_sweeper(self, interval: float) -> None:
+        """Run `sweep()` every `interval` seconds in a daemon thread until `stop_sweeper()` is called."""
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        self._sweeper_stopped.clear()
+        self._sweeper = threading.Thread(target=self._run_sweeper, args=(interval,), daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        self._sweeper_stopped.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
+
+    def _run_sweeper(self, interval: float) -> None:
+        while not self._sweeper_stopped.wait(interval):
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Failed to sweep expired entries.")
+
+    def migrate_metadata(self) -> int:
+        """Import per-file metadata into the index of the storage and return the number of entries."""
+        index = self.index
+        if isinstance(index, FileMetadataIndex):
+            raise ValueError(f"{self.storage} does not maintain its own metadata index.")
+        source = FileMetadataIndex(self.storage)
+        entries = [(key, cacheinfo, self.storage.size(key)) for key, cacheinfo in source.filter("")]
+        index.put_many(entries)
+        for key, _, _ in entries:
+            source.remove(key)
+        return len(entries)
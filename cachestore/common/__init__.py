@@ -1,4 +1,11 @@
+from cachestore.common.aio import AsyncFile  # noqa: F401
 from cachestore.common.astnorm import ASTNormalizer  # noqa: F401
+from cachestore.common.compression import Codec  # noqa: F401
+from cachestore.common.expiry import ExpiryView  # noqa: F401
 from cachestore.common.filelock import FileLock  # noqa: F401
+from cachestore.common.lease import Lease  # noqa: F401
+from cachestore.common.lrucache import LRUCache  # noqa: F401
+from cachestore.common.prefetch import PrefetchIterator  # noqa: F401
 from cachestore.common.selector import Selector  # noqa: F401
+from cachestore.common.singleflight import SingleFlight  # noqa: F401
 from cachestore.common.table import Table  # noqa: F401
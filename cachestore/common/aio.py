@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from itertools import islice
+from typing import IO, Any, AsyncIterator, Callable, ContextManager, Iterator, TypeVar
+
+T = TypeVar("T")
+
+# same as the default of ThreadPoolExecutor, but shared by all storages
+DEFAULT_MAX_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+DEFAULT_CHUNK_SIZE = 64
+
+_default_executor: Executor | None = None
+_default_executor_lock = threading.Lock()
+
+
+def default_executor() -> Executor:
+    """Return the bounded thread pool used to run blocking storage operations from coroutines."""
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = ThreadPoolExecutor(max_workers=DEFAULT_MAX_WORKERS, thread_name_prefix="cachestore")
+        return _default_executor
+
+
+async def run_blocking(executor: Executor, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(fn, *args, **kwargs))
+
+
+@asynccontextmanager
+async def enter_blocking(executor: Executor, manager: ContextManager[T]) -> AsyncIterator[T]:
+    """Enter and exit a blocking context manager in the executor."""
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(executor, manager.__enter__)
+    try:
+        value = await asyncio.shield(future)
+    except asyncio.CancelledError:
+        # the manager is still entered in the executor, so exit it once it is done
+        future.add_done_callback(
+            lambda f: None if f.cancelled() or f.exception() else manager.__exit__(None, None, None)
+        )
+        raise
+
+    try:
+        yield value
+    except BaseException:
+        if not await run_blocking(executor, manager.__exit__, *sys.exc_info()):
+            raise
+    else:
+        await run_blocking(executor, manager.__exit__, None, None, None)
+
+
+async def iterate_blocking(
+    executor: Executor,
+    iterator: Iterator[T],
+    chunksize: int = DEFAULT_CHUNK_SIZE,
+) -> AsyncIterator[T]:
+    """Iterate over a blocking iterator, reading `chunksize` items per call into the executor."""
+    while True:
+        chunk = await run_blocking(executor, lambda: list(islice(iterator, chunksize)))
+        for item in chunk:
+            yield item
+        if len(chunk) < chunksize:
+            break
+
+
+class AsyncFile:
+    """File opened by a blocking storage, whose operations run in an executor."""
+
+    def __init__(self, file: IO[Any], executor: Executor) -> None:
+        self._file = file
+        self._executor = executor
+
+    @property
+    def raw(self) -> IO[Any]:
+        return self._file
+
+    @property
+    def executor(self) -> Executor:
+        return self._executor
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Call `fn(file, *args)` in the executor."""
+        return await run_blocking(self._executor, fn, self._file, *args)
+
+    async def read(self, size: int = -1) -> Any:
+        return await run_blocking(self._executor, self._file.read, size)
+
+    async def write(self, data: Any) -> int:
+        return await run_blocking(self._executor, self._file.write, data)
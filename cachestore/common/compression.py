@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import abc
+import bz2
+import gzip
+import io
+import lzma
+from logging import getLogger
+from typing import IO, Any, ClassVar, Iterable, cast
+
+try:
+    import zstandard
+except ModuleNotFoundError:
+    zstandard = None  # type: ignore[assignment]
+
+try:
+    import lz4.frame as lz4frame
+except ModuleNotFoundError:
+    lz4frame = None
+
+logger = getLogger(__name__)
+
+# codecs of optional libraries, and levels of gzip used instead when they are missing
+FALLBACK_LEVELS: dict[str, int | None] = {"zstd": None, "lz4": 1}
+
+
+class Codec(abc.ABC):
+    """Compression algorithm wrapping files into compressing and decompressing streams.
+
+    Closing a stream finishes it but leaves the wrapped file open.
+    """
+
+    NAME: ClassVar[str]
+    ID: ClassVar[int]
+
+    @abc.abstractmethod
+    def writer(self, file: IO[bytes]) -> IO[bytes]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def reader(self, file: IO[bytes]) -> IO[bytes]:
+        raise NotImplementedError
+
+
+class GzipCodec(Codec):
+    NAME: ClassVar = "gzip"
+    ID: ClassVar = 1
+
+    def __init__(self, level: int | None = None) -> None:
+        self._level = 6 if level is None else level
+
+    def writer(self, file: IO[bytes]) -> IO[bytes]:
+        return cast(IO[bytes], gzip.GzipFile(fileobj=file, mode="wb", compresslevel=self._level, mtime=0))
+
+    def reader(self, file: IO[bytes]) -> IO[bytes]:
+        return cast(IO[bytes], gzip.GzipFile(fileobj=file, mode="rb"))
+
+
+class BZ2Codec(Codec):
+    NAME: ClassVar = "bz2"
+    ID: ClassVar = 2
+
+    def __init__(self, level: int | None = None) -> None:
+        self._level = 9 if level is None else level
+
+    def writer(self, file: IO[bytes]) -> IO[bytes]:
+        return bz2.BZ2File(file, mode="wb", compresslevel=self._level)
+
+    def reader(self, file: IO[bytes]) -> IO[bytes]:
+        return bz2.BZ2File(file, mode="rb")
+
+
+class LZMACodec(Codec):
+    NAME: ClassVar = "lzma"
+    ID: ClassVar = 3
+
+    def __init__(self, level: int | None = None) -> None:
+        self._level = 6 if level is None else level
+
+    def writer(self, file: IO[bytes]) -> IO[bytes]:
+        return lzma.LZMAFile(file, mode="wb", preset=self._level)
+
+    def reader(self, file: IO[bytes]) -> IO[bytes]:
+        return lzma.LZMAFile(file, mode="rb")
+
+
+class ZstdCodec(Codec):
+    """Zstandard, compressing in `threads` worker threads when it is positive.
+
+    A dictionary trained by `train_dictionary()` on samples of similar artifacts
+    improves the ratio of small artifacts a lot.  The same dictionary must be given
+    to read artifacts written with it.
+    """
+
+    NAME: ClassVar = "zstd"
+    ID: ClassVar = 4
+
+    def __init__(self, level: int | None = None, threads: int = 0, dictionary: bytes | None = None) -> None:
+        if zstandard is None:
+            raise ModuleNotFoundError("ZstdCodec requires zstandard. Please install it by `pip install zstandard`.")
+        self._level = 3 if level is None else level
+        self._threads = threads
+        self._dictionary = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+
+    def writer(self, file: IO[bytes]) -> IO[bytes]:
+        compressor = zstandard.ZstdCompressor(level=self._level, threads=self._threads, dict_data=self._dictionary)
+        return compressor.stream_writer(file, closefd=False)  # type: ignore[no-any-return]
+
+    def reader(self, file: IO[bytes]) -> IO[bytes]:
+        decompressor = zstandard.ZstdDecompressor(dict_data=self._dictionary)
+        # formatters like pickle issue many small reads, so buffer them
+        return io.BufferedReader(cast(io.RawIOBase, decompressor.stream_reader(file, closefd=False)))
+
+
+class LZ4Codec(Codec):
+    NAME: ClassVar = "lz4"
+    ID: ClassVar = 5
+
+    def __init__(self, level: int | None = None) -> None:
+        if lz4frame is None:
+            raise ModuleNotFoundError("LZ4Codec requires lz4. Please install it by `pip install lz4`.")
+        self._level = 0 if level is None else level
+
+    def writer(self, file: IO[bytes]) -> IO[bytes]:
+        # each write compresses a block, so small writes are buffered into large ones
+        return io.BufferedWriter(lz4frame.LZ4FrameFile(file, mode="wb", compression_level=self._level))
+
+    def reader(self, file: IO[bytes]) -> IO[bytes]:
+        return io.BufferedReader(lz4frame.LZ4FrameFile(file, mode="rb"))
+
+
+CODECS: dict[str, type[Codec]] = {
+    codec.NAME: codec for codec in (GzipCodec, BZ2Codec, LZMACodec, ZstdCodec, LZ4Codec)  # type: ignore[type-abstract]
+}
+
+
+def get_codec(
+    name: str,
+    level: int | None = None,
+    threads: int = 0,
+    dictionary: bytes | None = None,
+) -> Codec:
+    """Create a codec by name, falling back to gzip when the library of zstd or lz4 is missing.
+
+    Levels of zstd and lz4 mean other ratios than the ones of gzip, so the level
+    is ignored when falling back.
+    """
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec: {name}")
+    if name in FALLBACK_LEVELS and not _is_installed(name):
+        ignored = f", ignoring level {level}" if level is not None else ""
+        logger.warning("The library of %s is not installed, so gzip is used instead%s.", name, ignored)
+        return GzipCodec(FALLBACK_LEVELS[name])
+    if name == "zstd":
+        return ZstdCodec(level, threads, dictionary)
+    return CODECS[name](level)  # type: ignore[call-arg]
+
+
+def _is_installed(name: str) -> bool:
+    libraries: dict[str, Any] = {"zstd": zstandard, "lz4": lz4frame}
+    return libraries.get(name, gzip) is not None
+
+
+def train_dictionary(samples: Iterable[bytes], size: int = 112_640) -> bytes:
+    """Train a zstd dictionary of at most `size` bytes on samples of artifacts."""
+    if zstandard is None:
+        raise ModuleNotFoundError(
+            "Training dictionaries requires zstandard. Please install it by `pip install zstandard`."
+        )
+    return zstandard.train_dictionary(size, list(samples)).as_bytes()  # type: ignore[no-any-return]
+
+
+class PrefixedReader(io.RawIOBase):
+    """Raw stream reading `prefix` already consumed from `file` and then the rest of `file`."""
+
+    def __init__(self, prefix: bytes, file: IO[bytes]) -> None:
+        self._prefix = memoryview(prefix)
+        self._file = file
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        if self._prefix:
+            size = min(len(buffer), len(self._prefix))
+            buffer[:size] = self._prefix[:size]
+            self._prefix = self._prefix[size:]
+            return size
+        data = self._file.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
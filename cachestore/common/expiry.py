@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import datetime
+import heapq
+import threading
+
+DEFAULT_MAXSIZE = 100_000
+
+_MISSING = object()
+
+
+class ExpiryView:
+    """Thread-safe in-process view of when cache entries expire.
+
+    Expiry times are kept in a dictionary for lookups and in a heap ordered by
+    time, so that expired keys are found without scanning all of them.  Keys which
+    never expire are kept with `None`.  When the view grows beyond `maxsize`, the
+    oldest keys are forgotten and looked up in the metadata index again.
+    """
+
+    def __init__(self, maxsize: int | None = DEFAULT_MAXSIZE) -> None:
+        self._maxsize = maxsize
+        self._expiry: dict[str, datetime.datetime | None] = {}
+        self._heap: list[tuple[datetime.datetime, str]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._expiry
+
+    def lookup(self, key: str) -> tuple[bool, datetime.datetime | None]:
+        """Return whether the key is known and its expiry time."""
+        expired_at = self._expiry.get(key, _MISSING)
+        if expired_at is _MISSING:
+            return False, None
+        return True, expired_at  # type: ignore[return-value]
+
+    def set(self, key: str, expired_at: datetime.datetime | None) -> None:
+        with self._lock:
+            self._expiry.pop(key, None)
+            self._expiry[key] = expired_at
+            if expired_at is not None:
+                heapq.heappush(self._heap, (expired_at, key))
+            if self._maxsize is not None:
+                while len(self._expiry) > self._maxsize:
+                    del self._expiry[next(iter(self._expiry))]
+            # drop heap items of forgotten or updated keys once they dominate the heap
+            if len(self._heap) > 2 * len(self._expiry) + 64:
+                self._heap = [(t, k) for t, k in self._heap if self._expiry.get(k) == t]
+                heapq.heapify(self._heap)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._expiry.pop(key, None)
+
+    def discard_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [key for key in self._expiry if key.startswith(prefix)]:
+                del self._expiry[key]
+
+    def pop_expired(self, at: datetime.datetime) -> list[str]:
+        """Forget keys expired at the given time and return them in order of expiry."""
+        expired: list[str] = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= at:
+                expired_at, key = heapq.heappop(self._heap)
+                if key in self._expiry and self._expiry[key] == expired_at:
+                    del self._expiry[key]
+                    expired.append(key)
+        return expired
+
+    def clear(self) -> None:
+        with self._lock:
+            self._expiry.clear()
+            self._heap.clear()
@@ -5,16 +5,46 @@ from pathlib import Path
 from types import TracebackType
 from typing import IO, Any, Type
 
+from cachestore.common.lease import Lease
+
+
+class FileLock(Lease):
+    """Exclusive `flock` on a file.
+
+    The lock is released by the OS when its owner exits, so a lock left by a
+    crashed process never needs to be broken by others.
+    """
 
-class FileLock:
     def __init__(self, lockfile: str | Path) -> None:
         self._file_path = lockfile
         self._lockfile: IO[Any] | None = None
 
-    def acquire(self) -> None:
+    @property
+    def locked(self) -> bool:
+        return self._lockfile is not None
+
+    def try_acquire(self) -> bool:
+        if self._lockfile is not None:
+            return True
+        lockfile = open(self._file_path, "w")
+        try:
+            fcntl.flock(lockfile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lockfile.close()
+            return False
+        except BaseException:
+            lockfile.close()
+            raise
+        self._lockfile = lockfile
+        return True
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        if timeout is not None:
+            return super().acquire(timeout)
         if self._lockfile is None:
             self._lockfile = open(self._file_path, "w")
             fcntl.flock(self._lockfile, fcntl.LOCK_EX)
+        return True
 
     def release(self) -> None:
         if self._lockfile is not None:
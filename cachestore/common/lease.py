@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import abc
+import asyncio
+import time
+
+
+class Lease(abc.ABC):
+    """Exclusive right to compute a key, shared by processes using the same storage.
+
+    Subclasses implement a non-blocking `try_acquire()`, and waiting with a timeout
+    is done by polling it.  A lease must be released by its owner, and a lease
+    left by a crashed owner must be recovered by the implementation.
+    """
+
+    POLL_INTERVAL = 0.05
+
+    @abc.abstractmethod
+    def try_acquire(self) -> bool:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def release(self) -> None:
+        raise NotImplementedError
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.try_acquire():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(self.POLL_INTERVAL)
+        return True
+
+    async def aacquire(self, timeout: float | None = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.try_acquire():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(self.POLL_INTERVAL)
+        return True
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Generic, Hashable, Iterator, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """Thread-safe LRU mapping bounded by the number of entries and their total size.
+
+    The size of each entry is given by the caller when it is stored, so this class
+    does not try to guess how large a value is.
+    """
+
+    def __init__(self, maxsize: int | None = None, maxbytes: int | None = None) -> None:
+        self._maxsize = maxsize
+        self._maxbytes = maxbytes
+        self._items: OrderedDict[K, tuple[V, int]] = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._items
+
+    def __iter__(self) -> Iterator[K]:
+        with self._lock:
+            return iter(list(self._items))
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def get(self, key: K) -> V | None:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key: K, value: V, size: int = 0) -> None:
+        with self._lock:
+            self._discard(key)
+            if self._maxsize is not None and self._maxsize <= 0:
+                return
+            if self._maxbytes is not None and size > self._maxbytes:
+                return
+            self._items[key] = (value, size)
+            self._nbytes += size
+            while (self._maxsize is not None and len(self._items) > self._maxsize) or (
+                self._maxbytes is not None and self._nbytes > self._maxbytes
+            ):
+                _, (_, evicted_size) = self._items.popitem(last=False)
+                self._nbytes -= evicted_size
+
+    def pop(self, key: K) -> V | None:
+        with self._lock:
+            return self._discard(key)
+
+    def remove_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [key for key in self._items if str(key).startswith(prefix)]:
+                self._discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._nbytes = 0
+
+    def _discard(self, key: K) -> V | None:
+        item = self._items.pop(key, None)
+        if item is None:
+            return None
+        self._nbytes -= item[1]
+        return item[0]
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import queue
+import threading
+import weakref
+from typing import Any, Generic, Iterator, TypeVar
+
+T = TypeVar("T")
+
+# interval to check whether the consumer is gone while the queue is full
+POLL_INTERVAL = 0.1
+
+
+class _End:
+    def __init__(self, error: BaseException | None = None) -> None:
+        self.error = error
+
+
+def _produce(source: Iterator[Any], buffer: queue.Queue, stopped: threading.Event) -> None:
+    def put(value: Any) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(value, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for item in source:
+            if not put(item):
+                return
+    except BaseException as error:
+        put(_End(error))
+    else:
+        put(_End())
+
+
+class PrefetchIterator(Generic[T]):
+    """Iterator reading up to `depth` items of another iterator ahead in a background thread.
+
+    Reading and deserializing items overlaps with the work of the consumer.  Errors
+    raised by the source are raised by `next()` in order.  The thread stops once
+    the source is exhausted, or once this iterator is closed or garbage collected.
+    """
+
+    def __init__(self, source: Iterator[T], depth: int) -> None:
+        if depth < 1:
+            raise ValueError("depth must be positive.")
+        self._buffer: queue.Queue = queue.Queue(maxsize=depth)
+        self._stopped = threading.Event()
+        self._done = False
+        self._thread = threading.Thread(
+            target=_produce,
+            args=(source, self._buffer, self._stopped),
+            name="cachestore-prefetch",
+            daemon=True,
+        )
+        # the thread holds no reference to this iterator, so it can be collected while running
+        self._finalizer = weakref.finalize(self, self._stopped.set)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._done = True
+        self._finalizer()
+
+    def __iter__(self) -> Iterator[T]:
+        return self
+
+    def __next__(self) -> T:
+        if self._done:
+            raise StopIteration
+        value = self._buffer.get()
+        if isinstance(value, _End):
+            self.close()
+            if value.error is not None:
+                raise value.error
+            raise StopIteration
+        return value  # type: ignore[no-any-return]
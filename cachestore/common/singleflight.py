@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call(Generic[T]):
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result: T | None = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Run at most one computation per key at a time and share its outcome with concurrent callers.
+
+    `do()` is for threads, where waiters block on an event, and `ado()` is for
+    coroutines, where waiters await a future shared on the same event loop.  Both
+    return the result together with a flag telling whether the caller computed it
+    by itself.  Exceptions raised by the computation are raised for all callers.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self._futures: dict[tuple[int, Hashable], asyncio.Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> tuple[T, bool]:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if call is None:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, False  # type: ignore[return-value]
+
+        try:
+            call.result = fn()
+        except BaseException as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result, True
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        loop = asyncio.get_running_loop()
+        flight = (id(loop), key)
+        while True:
+            with self._lock:
+                future = self._futures.get(flight)
+                if future is None:
+                    future = self._futures[flight] = loop.create_future()
+                    break
+            try:
+                return await asyncio.shield(future), False
+            except asyncio.CancelledError:
+                # retry only if the leader was cancelled, not the waiter itself
+                if not future.cancelled():
+                    raise
+
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as err:
+            future.set_exception(err)
+            # mark the exception as retrieved even if nobody is waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, True
+        finally:
+            with self._lock:
+                del self._futures[flight]
+
+    def __len__(self) -> int:
+        return len(self._calls) + len(self._futures)
@@ -4,6 +4,7 @@ import configparser
 import dataclasses
 import datetime
 import os
+from concurrent.futures import Executor, ProcessPoolExecutor
 from logging import getLogger
 from os import PathLike
 from pathlib import Path
@@ -11,10 +12,12 @@ from typing import TypeVar
 
 from cachestore.formatters import Formatter, PickleFormatter
 from cachestore.hashers import Hasher, PickleHasher
+from cachestore.policies import EvictionPolicy, LRUPolicy
 from cachestore.storages import LocalStorage, Storage
 from cachestore.util import safe_import_object
 
 DISABLE_CACHE = os.environ.get("CACHESTORE_DISABLE", "0").lower() in ("1", "true")
+DEFAULT_LEASE_TIMEOUT = 600.0
 
 logger = getLogger(__name__)
 
@@ -28,6 +31,15 @@ class CacheSettings:
     formatter: Formatter = dataclasses.field(default_factory=PickleFormatter)
     hasher: Hasher = dataclasses.field(default_factory=PickleHasher)
     disable: bool = DISABLE_CACHE
+    memory_maxsize: int = 0
+    memory_maxbytes: int | None = None
+    lease: bool = False
+    lease_timeout: float = DEFAULT_LEASE_TIMEOUT
+    max_bytes: int | None = None
+    max_entries: int | None = None
+    eviction: EvictionPolicy = dataclasses.field(default_factory=LRUPolicy)
+    sweep_interval: float | None = None
+    prefetch_executor: Executor | None = None
 
 
 @dataclasses.dataclass
@@ -36,6 +48,9 @@ class FunctionSettings:
     expire: int | datetime.timedelta | datetime.date | datetime.datetime | None = None
     formatter: Formatter | None = None
     disable: bool | None = None
+    memory: bool | None = None
+    stream: bool = False
+    prefetch: int = 0
 
     @property
     def expired_at(self) -> datetime.datetime | None:
@@ -78,6 +93,9 @@ class Config:
         for section in self._parser.sections():
             if self._is_function_section(section):
                 self._function_settings[section] = self._load_function_settings(self._parser[section])
+            elif self._is_storage_section(section):
+                # storages defined by name are built by the storages referring to them
+                continue
             else:
                 self._cache_settings[section] = self._load_cache_settings(self._parser[section])
 
@@ -94,6 +112,9 @@ class Config:
     def _is_function_section(self, name: str) -> bool:
         return " " in name
 
+    def _is_storage_section(self, name: str) -> bool:
+        return name.startswith("storage:")
+
     def _load_cache_settings(self, config: configparser.SectionProxy) -> CacheSettings:
         settings = CacheSettings()
         if "storage" in config:
@@ -109,6 +130,23 @@ class Config:
             assert issubclass(hashercls, Hasher)
             settings.hasher = hashercls.from_config(config)
         settings.disable = config.getboolean("disable", settings.disable)
+        settings.memory_maxsize = config.getint("memory.maxsize", settings.memory_maxsize)
+        if "memory.maxbytes" in config:
+            settings.memory_maxbytes = config.getint("memory.maxbytes")
+        settings.lease = config.getboolean("lease", settings.lease)
+        settings.lease_timeout = config.getfloat("lease.timeout", settings.lease_timeout)
+        if "eviction" in config:
+            policycls = safe_import_object(config["eviction"])
+            assert issubclass(policycls, EvictionPolicy)
+            settings.eviction = policycls.from_config(config)
+        if "eviction.maxbytes" in config:
+            settings.max_bytes = config.getint("eviction.maxbytes")
+        if "eviction.maxentries" in config:
+            settings.max_entries = config.getint("eviction.maxentries")
+        if "sweep.interval" in config:
+            settings.sweep_interval = config.getfloat("sweep.interval")
+        if "prefetch.processes" in config:
+            settings.prefetch_executor = ProcessPoolExecutor(config.getint("prefetch.processes"))
         return settings
 
     def _load_function_settings(self, config: configparser.SectionProxy) -> FunctionSettings:
@@ -123,4 +161,8 @@ class Config:
             settings.formatter = formattercls.from_config(config)
         if "disable" in config:
             settings.disable = config.getboolean("disable", settings.disable)
+        if "memory" in config:
+            settings.memory = config.getboolean("memory")
+        settings.stream = config.getboolean("stream", settings.stream)
+        settings.prefetch = config.getint("prefetch", settings.prefetch)
         return settings
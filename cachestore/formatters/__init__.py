@@ -1,2 +1,3 @@
 from cachestore.formatters.formatter import Formatter  # noqa: F401
+from cachestore.formatters.numpy_formatter import NumpyFormatter  # noqa: F401
 from cachestore.formatters.pickle_formatter import PickleFormatter  # noqa: F401
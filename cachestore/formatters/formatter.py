@@ -1,13 +1,42 @@
 import abc
+from concurrent.futures import Executor
 from configparser import SectionProxy
-from typing import IO, Any, ClassVar, Type, TypeVar
+from pathlib import Path
+from typing import IO, Any, Callable, ClassVar, List, Type, TypeVar
+
+from cachestore.common import AsyncFile
+from cachestore.common.aio import run_blocking
+from cachestore.util import read_keeping_open
 
 Self = TypeVar("Self", bound="Formatter")
 
 
+class AsyncIterWriter:
+    """Write function returned by `Formatter.aiterwriter()`, taking a batch of items."""
+
+    def __init__(self, write: Callable[[Any], None], executor: Executor) -> None:
+        self._write = write
+        self._executor = executor
+
+    def _write_all(self, items: List[Any]) -> None:
+        for item in items:
+            self._write(item)
+
+    async def __call__(self, items: List[Any]) -> None:
+        await run_blocking(self._executor, self._write_all, items)
+
+    async def close(self) -> None:
+        close = getattr(self._write, "close", None)
+        if close is not None:
+            await run_blocking(self._executor, close)
+
+
 class Formatter(abc.ABC):
     READ_MODE: ClassVar[str]
     WRITE_MODE: ClassVar[str]
+    STREAMING: ClassVar[bool] = False
+    # may depend on the options of an instance
+    MAPPABLE: bool = False
 
     @abc.abstractmethod
     def write(self, file: IO[Any], obj: Any) -> None:
@@ -15,8 +44,51 @@ class Formatter(abc.ABC):
 
     @abc.abstractmethod
     def read(self, file: IO[Any]) -> Any:
+        """Read an artifact from `file`.
+
+        Iterator artifacts may read their items lazily from `file`, which callers
+        keep open until the iterator is exhausted.
+        """
+        raise NotImplementedError
+
+    def read_path(self, path: Path) -> Any:
+        """Read an artifact from a plain file given by `Storage.path()`.
+
+        Formatters which can map files into memory set `MAPPABLE = True` and
+        override this.
+        """
+        return read_keeping_open(open(path, self.READ_MODE), self.read)
+
+    def iterwriter(self, file: IO[Any]) -> Callable[[Any], None]:
+        """Start writing an iterator artifact and return a function writing its items one by one.
+
+        Formatters supporting this set `STREAMING = True`.  The written file must be
+        readable by `read()` in the same way as one written by `write()`.  Formatters
+        which write something after the last item return a callable with a `close()`
+        method, which callers call once all items are written.
+        """
         raise NotImplementedError
 
+    async def awrite(self, file: AsyncFile, obj: Any) -> None:
+        await file.run(self.write, obj)
+
+    async def aread(self, file: AsyncFile) -> Any:
+        """Read an artifact without blocking the event loop.
+
+        Iterator artifacts are returned as blocking iterators, which callers iterate
+        with `cachestore.common.aio.iterate_blocking()`.
+        """
+        return await file.run(self.read)
+
+    async def aiterwriter(self, file: AsyncFile) -> AsyncIterWriter:
+        """Async version of `iterwriter()`, whose write function takes a batch of items.
+
+        Items are written in one call into the executor per batch, so callers should
+        buffer them instead of writing each one separately.  Callers await `close()`
+        of the returned writer once all items are written.
+        """
+        return AsyncIterWriter(await file.run(self.iterwriter), file.executor)
+
     @classmethod
     def from_config(cls: Type[Self], config: SectionProxy) -> Self:
         raise NotImplementedError
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import ast
+import mmap
+import struct
+from configparser import SectionProxy
+from pathlib import Path
+from typing import IO, Any, ClassVar, Type, TypeVar
+
+try:
+    import dill as pickle
+except ModuleNotFoundError:
+    import pickle  # type: ignore[no-redef]
+
+try:
+    import numpy
+except ModuleNotFoundError:
+    numpy = None  # type: ignore[assignment]
+
+from cachestore.formatters.formatter import Formatter
+
+Self = TypeVar("Self", bound="NumpyFormatter")
+
+MAGIC = b"\x93CSNPY\x01\x00"
+ALIGNMENT = 64
+
+_LENGTH = struct.Struct("<Q")
+
+# A node of the structure of an artifact is one of:
+#   ("array", index)          a region holding raw data of an array
+#   ("pickle", index)         a region holding any other value pickled
+#   ("tuple", [node, ...]), ("list", [node, ...]), ("dict", [(key, node), ...])
+#   ("iter", node)            an iterator stored as the list of its items
+Node = Any
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class NumpyFormatter(Formatter):
+    """Formatter storing NumPy arrays as raw data which can be mapped into memory.
+
+    Arrays, and tuples, lists and dicts of them, are stored like `.npy` files: a
+    header describing dtypes, shapes and the structure is followed by the raw data
+    of each array aligned to 64 bytes.  Other values in the structure are pickled.
+
+    When the storage exposes artifacts as plain files, arrays are returned as
+    read-only views of a memory-mapped file.  Pages are loaded lazily and shared
+    through the page cache by all processes reading the same artifact.  Otherwise
+    arrays are read into fresh memory.
+    """
+
+    READ_MODE: ClassVar = "rb"
+    WRITE_MODE: ClassVar = "wb"
+    MAPPABLE = True
+
+    def __init__(self) -> None:
+        if numpy is None:
+            raise ModuleNotFoundError("NumpyFormatter requires numpy. Please install it by `pip install numpy`.")
+
+    def _encode(self, obj: Any, regions: list[tuple[str, Any]]) -> Node:
+        if isinstance(obj, numpy.ndarray) and not obj.dtype.hasobject:
+            regions.append(("array", obj))
+            return ("array", len(regions) - 1)
+        if type(obj) is tuple:
+            return ("tuple", [self._encode(item, regions) for item in obj])
+        if type(obj) is list:
+            return ("list", [self._encode(item, regions) for item in obj])
+        if type(obj) is dict and all(type(key) in (str, int) for key in obj):
+            return ("dict", [(key, self._encode(value, regions)) for key, value in obj.items()])
+        if hasattr(obj, "__next__"):
+            return ("iter", self._encode(list(obj), regions))
+        regions.append(("pickle", pickle.dumps(obj)))
+        return ("pickle", len(regions) - 1)
+
+    @staticmethod
+    def _describe_array(array: Any) -> tuple[Any, bool]:
+        """Return the array to write as is and whether it is stored in Fortran order."""
+        if array.flags.c_contiguous:
+            return array, False
+        if array.flags.f_contiguous:
+            return array.T, True
+        return numpy.ascontiguousarray(array), False
+
+    def write(self, file: IO[Any], obj: Any) -> None:
+        regions: list[tuple[str, Any]] = []
+        tree = self._encode(obj, regions)
+
+        descriptions: list[dict[str, Any]] = []
+        payloads: list[Any] = []
+        offset = 0
+        for kind, value in regions:
+            if kind == "array":
+                data, fortran_order = self._describe_array(value)
+                payload = data.reshape(-1).view(numpy.uint8)
+                descriptions.append(
+                    {
+                        "descr": numpy.lib.format.dtype_to_descr(value.dtype),
+                        "shape": value.shape,
+                        "fortran_order": fortran_order,
+                        "offset": offset,
+                        "nbytes": payload.nbytes,
+                    }
+                )
+            else:
+                payload = value
+                descriptions.append({"offset": offset, "nbytes": len(payload)})
+            payloads.append(payload)
+            offset = _align(offset + descriptions[-1]["nbytes"])
+
+        header = repr({"tree": tree, "regions": descriptions}).encode("utf-8")
+        prefix_length = len(MAGIC) + _LENGTH.size + len(header)
+        header += b" " * (_align(prefix_length) - prefix_length)
+
+        file.write(MAGIC)
+        file.write(_LENGTH.pack(len(header)))
+        file.write(header)
+        position = 0
+        for description, payload in zip(descriptions, payloads):
+            file.write(b"\0" * (description["offset"] - position))
+            file.write(payload)
+            position = description["offset"] + description["nbytes"]
+
+    @staticmethod
+    def _parse_header(data: bytes) -> dict[str, Any]:
+        if data[: len(MAGIC)] != MAGIC:
+            raise ValueError("File is not written by NumpyFormatter.")
+        (length,) = _LENGTH.unpack_from(data, len(MAGIC))
+        header = data[len(MAGIC) + _LENGTH.size : len(MAGIC) + _LENGTH.size + length]
+        parsed: dict[str, Any] = ast.literal_eval(header.decode("utf-8"))
+        parsed["data_offset"] = len(MAGIC) + _LENGTH.size + length
+        return parsed
+
+    def _decode(self, node: Node, regions: list[Any]) -> Any:
+        kind, value = node
+        if kind in ("array", "pickle"):
+            return regions[value]
+        if kind == "tuple":
+            return tuple(self._decode(item, regions) for item in value)
+        if kind == "list":
+            return [self._decode(item, regions) for item in value]
+        if kind == "dict":
+            return {key: self._decode(item, regions) for key, item in value}
+        if kind == "iter":
+            return iter(self._decode(value, regions))
+        raise ValueError(f"Unknown node: {kind}")
+
+    @staticmethod
+    def _build_array(data: Any, description: dict[str, Any]) -> Any:
+        dtype = numpy.lib.format.descr_to_dtype(description["descr"])
+        shape = description["shape"]
+        if description["fortran_order"]:
+            return data.view(dtype).reshape(shape[::-1]).T
+        return data.view(dtype).reshape(shape)
+
+    def read(self, file: IO[Any]) -> Any:
+        prefix = file.read(len(MAGIC) + _LENGTH.size)
+        (length,) = _LENGTH.unpack_from(prefix, len(MAGIC))
+        header = self._parse_header(prefix + file.read(length))
+
+        regions: list[Any] = []
+        position = header["data_offset"]
+        for description in header["regions"]:
+            start = header["data_offset"] + description["offset"]
+            file.read(start - position)
+            if "descr" in description:
+                data = numpy.empty(description["nbytes"], dtype=numpy.uint8)
+                view = data.data
+                while view.nbytes:
+                    num_read = file.readinto(view)  # type: ignore[attr-defined]
+                    if not num_read:
+                        raise EOFError("File is truncated.")
+                    view = view[num_read:]
+                regions.append(self._build_array(data, description))
+            else:
+                regions.append(pickle.loads(file.read(description["nbytes"])))
+            position = start + description["nbytes"]
+        return self._decode(header["tree"], regions)
+
+    def read_path(self, path: Path) -> Any:
+        with open(path, "rb") as file:
+            # the mapping stays valid after the file is closed, and even after the
+            # storage atomically replaces the file with a new one
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (length,) = _LENGTH.unpack_from(buffer, len(MAGIC))
+        header = self._parse_header(buffer[: len(MAGIC) + _LENGTH.size + length])
+
+        regions: list[Any] = []
+        for description in header["regions"]:
+            start = header["data_offset"] + description["offset"]
+            if "descr" in description:
+                data = numpy.frombuffer(buffer, dtype=numpy.uint8, count=description["nbytes"], offset=start)
+                regions.append(self._build_array(data, description))
+            else:
+                regions.append(pickle.loads(buffer[start : start + description["nbytes"]]))
+        return self._decode(header["tree"], regions)
+
+    @classmethod
+    def from_config(cls: Type[Self], config: SectionProxy) -> Self:
+        return cls()
@@ -1,33 +1,52 @@
 from __future__ import annotations
 
+import bisect
+import collections
+import io
+import itertools
+import mmap
+import struct
+import threading
+import weakref
+from concurrent.futures import Executor, Future
 from configparser import SectionProxy
-from typing import IO, Any, ClassVar, Iterator, Type, TypeVar
+from pathlib import Path
+from typing import IO, Any, Callable, ClassVar, Iterator, Type, TypeVar, overload
 
 try:
     import dill as pickle
 except ModuleNotFoundError:
     import pickle  # type: ignore[no-redef]
 
+from cachestore.common.prefetch import PrefetchIterator
 from cachestore.formatters.formatter import Formatter
-from cachestore.util import detect_open_fn
+from cachestore.util import read_keeping_open
 
 Self = TypeVar("Self", bound="PickleFormatter")
 
+# Files with out-of-band buffers start with this magic, which never starts a pickle
+# stream, followed by the length of the pickle stream, the number of buffers, the
+# offset and length of each buffer, the pickle stream and the aligned buffers.
+OUT_OF_BAND_MAGIC = b"\x93CSPKL5\x00"
+# Files of chunked iterators start with this magic, followed by chunks, each pickled
+# as a list of items, then the index pickled as a tuple of the offsets and lengths
+# of chunks, and finally the offset of the index.
+CHUNKED_MAGIC = b"\x93CSPKLC\x00"
+ALIGNMENT = 64
+DEFAULT_MIN_BUFFER_SIZE = 64 * 1024
 
-class PickleFormatIterator:
-    def __init__(self, file: IO[Any]):
-        self.file: IO[Any] | None = None
+_UINT64 = struct.Struct("<Q")
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
 
-        # Reopen file by detecting the open function.  This is workaround
-        # for the fact that the file is closed. Be aware that this may not
-        # work for all file-like objects.
-        open_fn = detect_open_fn(file)
-        self.file = open_fn(file.name, file.mode)
 
-        # Validate that the file is an iterator.
-        is_iterator = pickle.load(self.file)
-        if not is_iterator:
-            raise ValueError(f"File is not an iterator: {file.name}")
+class PickleFormatIterator:
+    """Iterator unpickling items one by one from a file positioned after the iterator flag."""
+
+    def __init__(self, file: IO[Any]):
+        self.file: IO[Any] | None = file
 
     def __iter__(self) -> Iterator[Any]:
         return self
@@ -38,30 +57,366 @@ class PickleFormatIterator:
         try:
             return pickle.load(self.file)
         except EOFError:
-            self.file.close()
             self.file = None
             raise StopIteration
 
 
+def _iterate_chunks(file: IO[Any]) -> Iterator[Any]:
+    while True:
+        chunk = pickle.load(file)
+        # the index follows the last chunk
+        if not isinstance(chunk, list):
+            return
+        yield from chunk
+
+
+def _load_chunk_at(path: Path, offset: int) -> list[Any]:
+    with open(path, "rb") as file:
+        file.seek(offset)
+        chunk: list[Any] = pickle.load(file)
+        return chunk
+
+
+class PickleChunkedSequence:
+    """Iterator over items of a chunked file, which also supports `len()`, indexing and slicing.
+
+    Items are read chunk by chunk, so accessing an item unpickles only its own chunk.
+    `iterate()` starts iteration at any position, so that workers can read their own
+    shards of a long iterator.
+    """
+
+    def __init__(self, file: IO[Any], offsets: list[int], lengths: list[int], path: Path | None = None) -> None:
+        self._file = file
+        self._path = path
+        self._offsets = offsets
+        self._starts = [0]
+        for length in lengths:
+            self._starts.append(self._starts[-1] + length)
+        self._position = 0
+        self._chunk: tuple[int, list[Any]] | None = None
+        self._lock = threading.Lock()
+        self._finalizer: weakref.finalize | None = None
+
+    def on_close(self, close: Callable[[], Any]) -> None:
+        """Call `close` once this sequence is closed or garbage collected."""
+        self._finalizer = weakref.finalize(self, close)
+
+    def close(self) -> None:
+        if self._finalizer is not None:
+            self._finalizer()
+
+    def __len__(self) -> int:
+        return self._starts[-1]
+
+    def _load_chunk(self, index: int) -> list[Any]:
+        with self._lock:
+            if self._chunk is None or self._chunk[0] != index:
+                self._file.seek(self._offsets[index])
+                self._chunk = (index, pickle.load(self._file))
+            return self._chunk[1]
+
+    @overload
+    def __getitem__(self, index: int) -> Any: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Any]: ...
+
+    def __getitem__(self, index: int | slice) -> Any:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return list(self.iterate(start, stop))
+            return [self[i] for i in range(start, stop, step)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("index out of range")
+        chunk_index = bisect.bisect_right(self._starts, index) - 1
+        return self._load_chunk(chunk_index)[index - self._starts[chunk_index]]
+
+    def iterate(self, start: int = 0, stop: int | None = None) -> Iterator[Any]:
+        """Iterate over items from `start` to `stop` without affecting `next()`."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        position = max(start, 0)
+        while position < stop:
+            chunk_index = bisect.bisect_right(self._starts, position) - 1
+            chunk = self._load_chunk(chunk_index)
+            end = min(self._starts[chunk_index + 1], stop)
+            yield from chunk[position - self._starts[chunk_index] : end - self._starts[chunk_index]]
+            position = end
+
+    def prefetch(self, depth: int, executor: Executor | None = None) -> Iterator[Any]:
+        """Iterate over the remaining items, reading up to `depth` chunks ahead.
+
+        Chunks are read and unpickled in `executor` when the file was read from a
+        path, so that a process pool can share the work.  Otherwise they are read
+        in a background thread.
+        """
+        if executor is None or self._path is None:
+            chunks: Iterator[list[Any]] = PrefetchIterator(self._remaining_chunks(), depth)
+        else:
+            chunks = self._prefetch_chunks(executor, self._path, depth)
+        return itertools.chain.from_iterable(chunks)
+
+    def _remaining_chunks(self) -> Iterator[list[Any]]:
+        position, self._position = self._position, len(self)
+        while position < len(self):
+            index = bisect.bisect_right(self._starts, position) - 1
+            yield self._load_chunk(index)[position - self._starts[index] :]
+            position = self._starts[index + 1]
+
+    def _prefetch_chunks(self, executor: Executor, path: Path, depth: int) -> Iterator[list[Any]]:
+        position, self._position = self._position, len(self)
+        if position >= len(self):
+            return
+        first = bisect.bisect_right(self._starts, position) - 1
+        # only the first chunk may be read from its middle
+        skip = position - self._starts[first]
+        futures: collections.deque[Future[list[Any]]] = collections.deque()
+        try:
+            for index in range(first, len(self._offsets)):
+                futures.append(executor.submit(_load_chunk_at, path, self._offsets[index]))
+                if len(futures) >= depth:
+                    yield futures.popleft().result()[skip:]
+                    skip = 0
+            while futures:
+                yield futures.popleft().result()[skip:]
+                skip = 0
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def __iter__(self) -> Iterator[Any]:
+        return self
+
+    def __next__(self) -> Any:
+        if self._position >= len(self):
+            raise StopIteration
+        item = self[self._position]
+        self._position += 1
+        return item
+
+
+class _ChunkWriter:
+    def __init__(self, file: IO[Any], chunk_size: int, protocol: int | None) -> None:
+        self._file = file
+        self._chunk_size = chunk_size
+        self._protocol = protocol
+        self._buffer: list[Any] = []
+        self._offsets: list[int] = []
+        self._lengths: list[int] = []
+        # offsets are counted instead of told, since compressing streams may not tell them
+        self._position = len(CHUNKED_MAGIC)
+        file.write(CHUNKED_MAGIC)
+
+    def __call__(self, item: Any) -> None:
+        self._buffer.append(item)
+        if len(self._buffer) >= self._chunk_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        data = pickle.dumps(self._buffer, protocol=self._protocol)
+        self._file.write(data)
+        self._offsets.append(self._position)
+        self._lengths.append(len(self._buffer))
+        self._position += len(data)
+        self._buffer = []
+
+    def close(self) -> None:
+        if self._buffer:
+            self._flush()
+        self._file.write(pickle.dumps((self._offsets, self._lengths), protocol=self._protocol))
+        self._file.write(_UINT64.pack(self._position))
+
+
 class PickleFormatter(Formatter):
+    """Formatter pickling artifacts.
+
+    With `out_of_band=True`, artifacts are pickled with protocol 5, and buffers
+    of objects supporting PEP 574 such as NumPy arrays are written aside of the
+    pickle stream instead of being copied into it.  Buffers smaller than
+    `min_buffer_size` bytes stay in the stream.  When the storage exposes the
+    file, buffers are restored as views of a read-only memory map without any
+    copy.  Files in both layouts are readable regardless of the mode.
+
+    Iterators are written as a sequence of pickles, so that they can be streamed.
+    With `chunk_size`, items are pickled in chunks of that many items followed by
+    an index of chunks.  Such iterators are read back as `PickleChunkedSequence`,
+    which supports `len()` and random access when the file is seekable.
+    """
+
     READ_MODE: ClassVar = "rb"
     WRITE_MODE: ClassVar = "wb"
+    STREAMING: ClassVar = True
+
+    def __init__(
+        self,
+        protocol: int | None = None,
+        out_of_band: bool = False,
+        min_buffer_size: int = DEFAULT_MIN_BUFFER_SIZE,
+        chunk_size: int | None = None,
+    ) -> None:
+        if out_of_band and protocol is not None and protocol < 5:
+            raise ValueError("Out-of-band buffers require pickle protocol 5 or later.")
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError("chunk_size must be positive.")
+        self._protocol = 5 if out_of_band and protocol is None else protocol
+        self._out_of_band = out_of_band
+        self._min_buffer_size = min_buffer_size
+        self._chunk_size = chunk_size
+        # only these layouts are read from paths, which costs another open otherwise
+        self.MAPPABLE = out_of_band or chunk_size is not None
 
     def write(self, file: IO[Any], obj: Any) -> None:
-        if hasattr(obj, "__next__"):
-            pickle.dump(True, file)
+        if hasattr(obj, "__next__") and self._chunk_size is not None:
+            write = _ChunkWriter(file, self._chunk_size, self._protocol)
+            for item in obj:
+                write(item)
+            write.close()
+        elif hasattr(obj, "__next__"):
+            pickle.dump(True, file, protocol=self._protocol)
             for item in obj:
-                pickle.dump(item, file)
+                pickle.dump(item, file, protocol=self._protocol)
+        elif self._out_of_band:
+            self._write_out_of_band(file, obj)
         else:
-            pickle.dump(False, file)
-            pickle.dump(obj, file)
+            pickle.dump(False, file, protocol=self._protocol)
+            pickle.dump(obj, file, protocol=self._protocol)
+
+    def _write_out_of_band(self, file: IO[Any], obj: Any) -> None:
+        buffers: list[memoryview] = []
+
+        def buffer_callback(buffer: pickle.PickleBuffer) -> bool:
+            try:
+                raw = buffer.raw()
+            except BufferError:
+                # non-contiguous buffers are copied into the stream
+                return True
+            if raw.nbytes < self._min_buffer_size:
+                return True
+            buffers.append(raw)
+            return False
+
+        data = pickle.dumps(obj, protocol=self._protocol, buffer_callback=buffer_callback)
+
+        offset = _align(len(OUT_OF_BAND_MAGIC) + _UINT64.size * (2 + 2 * len(buffers)) + len(data))
+        locations: list[tuple[int, int]] = []
+        for buffer in buffers:
+            locations.append((offset, buffer.nbytes))
+            offset = _align(offset + buffer.nbytes)
+
+        file.write(OUT_OF_BAND_MAGIC)
+        file.write(_UINT64.pack(len(data)))
+        file.write(_UINT64.pack(len(buffers)))
+        for location in locations:
+            file.write(struct.pack("<QQ", *location))
+        file.write(data)
+        position = len(OUT_OF_BAND_MAGIC) + _UINT64.size * (2 + 2 * len(buffers)) + len(data)
+        for (offset, nbytes), buffer in zip(locations, buffers):
+            file.write(b"\0" * (offset - position))
+            file.write(buffer)
+            position = offset + nbytes
+
+    def iterwriter(self, file: IO[Any]) -> Callable[[Any], None]:
+        if self._chunk_size is not None:
+            return _ChunkWriter(file, self._chunk_size, self._protocol)
+
+        pickle.dump(True, file, protocol=self._protocol)
+
+        def write(item: Any) -> None:
+            pickle.dump(item, file, protocol=self._protocol)
+
+        return write
 
     def read(self, file: IO[Any]) -> Any:
-        is_iterator = pickle.load(file)
+        # Files may be streams which cannot seek back, like decompressing ones, so
+        # the layout is told by the first byte without reading further than needed.
+        head = file.read(1)
+        if head == OUT_OF_BAND_MAGIC[:1]:
+            head += file.read(len(OUT_OF_BAND_MAGIC) - 1)
+            if head == OUT_OF_BAND_MAGIC:
+                return self._read_out_of_band(file)
+            if head == CHUNKED_MAGIC:
+                return self._read_chunked(file)
+            raise ValueError("File is not written by PickleFormatter.")
+        # Other files start with a pickled flag telling whether the artifact is an
+        # iterator, which is `\x80<protocol>\x88.` or `I01\n.` with protocols < 2.
+        is_iterator = pickle.loads(head + file.read(3 if head == b"\x80" else 4))
         if is_iterator:
             return PickleFormatIterator(file)
         return pickle.load(file)
 
+    def _read_chunked(self, file: IO[Any], path: Path | None = None) -> Iterator[Any]:
+        if file.seekable():
+            try:
+                file.seek(-_UINT64.size, io.SEEK_END)
+            except OSError:
+                # some decompressing streams cannot seek from the end
+                pass
+            else:
+                (index_offset,) = _UINT64.unpack(file.read(_UINT64.size))
+                file.seek(index_offset)
+                offsets, lengths = pickle.load(file)
+                return PickleChunkedSequence(file, offsets, lengths, path)
+        return _iterate_chunks(file)
+
+    def _read_out_of_band(self, file: IO[Any]) -> Any:
+        (data_length,) = _UINT64.unpack(file.read(_UINT64.size))
+        (num_buffers,) = _UINT64.unpack(file.read(_UINT64.size))
+        locations = [struct.unpack("<QQ", file.read(2 * _UINT64.size)) for _ in range(num_buffers)]
+        data = file.read(data_length)
+        position = len(OUT_OF_BAND_MAGIC) + _UINT64.size * (2 + 2 * num_buffers) + data_length
+
+        buffers: list[bytearray] = []
+        for offset, nbytes in locations:
+            file.read(offset - position)
+            buffer = bytearray(nbytes)
+            view = memoryview(buffer)
+            while view.nbytes:
+                num_read = file.readinto(view)  # type: ignore[attr-defined]
+                if not num_read:
+                    raise EOFError("File is truncated.")
+                view = view[num_read:]
+            buffers.append(buffer)
+            position = offset + nbytes
+        return pickle.loads(data, buffers=buffers)
+
+    def read_path(self, path: Path) -> Any:
+        # other layouts are read from the file opened to tell the layout
+        file = open(path, self.READ_MODE)
+        try:
+            head = file.read(len(OUT_OF_BAND_MAGIC))
+            if head == CHUNKED_MAGIC:
+                # the path lets chunks be read in other processes
+                return read_keeping_open(file, lambda file: self._read_chunked(file, path))
+            if head != OUT_OF_BAND_MAGIC:
+                file.seek(0)
+                return read_keeping_open(file, self.read)
+            # the mapping stays valid after the file is closed or atomically replaced
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            file.close()
+            raise
+        file.close()
+
+        view = memoryview(buffer)
+        position = len(OUT_OF_BAND_MAGIC)
+        (data_length,) = _UINT64.unpack_from(view, position)
+        (num_buffers,) = _UINT64.unpack_from(view, position + _UINT64.size)
+        position += 2 * _UINT64.size
+        buffers: list[memoryview] = []
+        for _ in range(num_buffers):
+            offset, nbytes = struct.unpack_from("<QQ", view, position)
+            buffers.append(view[offset : offset + nbytes])
+            position += 2 * _UINT64.size
+        return pickle.loads(view[position : position + data_length], buffers=buffers)
+
     @classmethod
     def from_config(cls: Type[Self], config: SectionProxy) -> Self:
-        return cls()
+        protocol = config.getint("formatter.protocol") if "formatter.protocol" in config else None
+        return cls(
+            protocol=protocol,
+            out_of_band=config.getboolean("formatter.out_of_band", False),
+            min_buffer_size=config.getint("formatter.min_buffer_size", DEFAULT_MIN_BUFFER_SIZE),
+            chunk_size=config.getint("formatter.chunk_size") if "formatter.chunk_size" in config else None,
+        )
@@ -1,2 +1,3 @@
 from cachestore.hashers.hasher import Hasher  # noqa: F401
 from cachestore.hashers.pickle_hasher import PickleHasher  # noqa: F401
+from cachestore.hashers.structural_hasher import StructuralHasher  # noqa: F401
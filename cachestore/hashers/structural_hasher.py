@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import decimal
+import enum
+import hashlib
+import struct
+import sys
+import uuid
+from array import array
+from configparser import SectionProxy
+from pathlib import PurePath
+from typing import Any, Callable, ClassVar, Dict, Iterable, Type, TypeVar
+
+try:
+    import dill as pickle
+except ModuleNotFoundError:
+    import pickle  # type: ignore[no-redef]
+
+from cachestore.hashers.hasher import Hasher
+from cachestore.util import b62encode
+
+Self = TypeVar("Self", bound="StructuralHasher")
+Reducer = Callable[[Any], Any]
+Update = Callable[[Any], None]
+
+_LENGTH = struct.Struct("<Q")
+_FLOAT = struct.Struct("<d")
+
+
+class StructuralHasher(Hasher):
+    """Hasher walking values by their types instead of pickling them.
+
+    Buffers such as `bytes`, `memoryview` and `numpy.ndarray` are fed to the digest
+    without being copied, and primitives and containers are encoded directly.
+    Dictionaries and sets are hashed regardless of their ordering.
+
+    Other types can be supported by registering a function which reduces a value into
+    something this hasher already knows:
+
+        @StructuralHasher.register(Point)
+        def _reduce_point(point: Point) -> tuple[float, float]:
+            return (point.x, point.y)
+
+    Values of unknown types are hashed by pickling them.
+    """
+
+    _registry: ClassVar[Dict[type, Reducer]] = {}
+
+    @classmethod
+    def register(cls, *types: type) -> Callable[[Reducer], Reducer]:
+        def decorator(reducer: Reducer) -> Reducer:
+            for t in types:
+                cls._registry[t] = reducer
+            return reducer
+
+        return decorator
+
+    def __init__(self) -> None:
+        self._dispatch: dict[type, Callable[[Any, Update, list[int]], None]] = {
+            type(None): self._update_none,
+            bool: self._update_bool,
+            int: self._update_int,
+            float: self._update_float,
+            complex: self._update_complex,
+            str: self._update_str,
+            bytes: self._update_bytes,
+            bytearray: self._update_bytes,
+            memoryview: self._update_memoryview,
+            tuple: self._update_sequence,
+            list: self._update_sequence,
+            dict: self._update_dict,
+            set: self._update_set,
+            frozenset: self._update_set,
+        }
+
+    def __call__(self, obj: Any) -> str:
+        m = hashlib.blake2b()
+        self._update(obj, m.update, [])
+        return b62encode(m.digest())
+
+    def _update(self, obj: Any, update: Update, stack: list[int]) -> None:
+        cls = type(obj)
+        handler = self._dispatch.get(cls)
+        if handler is not None:
+            handler(obj, update, stack)
+            return
+
+        for base in cls.__mro__:
+            if base in self._registry:
+                self._update_reduced(obj, self._registry[base](obj), update, stack)
+                return
+
+        if isinstance(obj, tuple) and hasattr(obj, "_fields"):
+            # NamedTuple such as ExecutionInfo
+            self._update_reduced(obj, tuple(obj), update, stack)
+        elif dataclasses.is_dataclass(cls):
+            values = {field.name: getattr(obj, field.name) for field in dataclasses.fields(obj)}
+            self._update_reduced(obj, values, update, stack)
+        elif isinstance(obj, enum.Enum):
+            self._update_reduced(obj, obj.name, update, stack)
+        elif isinstance(obj, (PurePath, datetime.date, datetime.time, datetime.timedelta, decimal.Decimal, uuid.UUID)):
+            self._update_reduced(obj, repr(obj), update, stack)
+        elif self._is_numpy_array(obj):
+            self._update_ndarray(obj, update, stack)
+        elif self._is_numpy_scalar(obj):
+            self._update_reduced(obj, (obj.dtype.str, obj.tobytes()), update, stack)
+        elif self._is_pandas_object(obj):
+            self._update_pandas(obj, update, stack)
+        else:
+            self._update_pickle(obj, update)
+
+    @staticmethod
+    def _typename(obj: Any) -> str:
+        cls = type(obj)
+        return f"{cls.__module__}.{cls.__qualname__}"
+
+    @staticmethod
+    def _update_tag(tag: bytes, update: Update, length: int | None = None) -> None:
+        update(tag)
+        if length is not None:
+            update(_LENGTH.pack(length))
+
+    def _update_reduced(self, obj: Any, reduced: Any, update: Update, stack: list[int]) -> None:
+        typename = self._typename(obj).encode()
+        self._update_tag(b"R", update, len(typename))
+        update(typename)
+        self._update(reduced, update, stack)
+
+    def _update_none(self, obj: None, update: Update, stack: list[int]) -> None:
+        update(b"N")
+
+    def _update_bool(self, obj: bool, update: Update, stack: list[int]) -> None:
+        update(b"T" if obj else b"F")
+
+    def _update_int(self, obj: int, update: Update, stack: list[int]) -> None:
+        data = obj.to_bytes(obj.bit_length() // 8 + 1, "little", signed=True)
+        self._update_tag(b"I", update, len(data))
+        update(data)
+
+    def _update_float(self, obj: float, update: Update, stack: list[int]) -> None:
+        update(b"D")
+        update(_FLOAT.pack(obj))
+
+    def _update_complex(self, obj: complex, update: Update, stack: list[int]) -> None:
+        update(b"C")
+        update(_FLOAT.pack(obj.real))
+        update(_FLOAT.pack(obj.imag))
+
+    def _update_str(self, obj: str, update: Update, stack: list[int]) -> None:
+        data = obj.encode("utf-8", "surrogatepass")
+        self._update_tag(b"S", update, len(data))
+        update(data)
+
+    def _update_bytes(self, obj: bytes | bytearray, update: Update, stack: list[int]) -> None:
+        self._update_tag(b"B", update, len(obj))
+        update(obj)
+
+    def _update_memoryview(self, obj: memoryview, update: Update, stack: list[int]) -> None:
+        self._update_tag(b"M", update, obj.nbytes)
+        self._update((obj.format, obj.shape), update, stack)
+        update(obj if obj.c_contiguous else obj.tobytes())
+
+    def _update_sequence(self, obj: tuple | list, update: Update, stack: list[int]) -> None:
+        if self._enter(obj, update, stack):
+            self._update_tag(b"(" if isinstance(obj, tuple) else b"[", update, len(obj))
+            if not self._update_homogeneous(obj, update):
+                for item in obj:
+                    self._update(item, update, stack)
+            stack.pop()
+
+    def _update_homogeneous(self, obj: tuple | list, update: Update) -> bool:
+        """Encode a sequence of only str, int or float values in bulk, which is much faster than walking it.
+
+        Packed sequences have their own tags followed by the number and width of their
+        items, so that they never encode like a walked sequence of other values.
+        """
+        itemtypes = set(map(type, obj))
+        if len(itemtypes) != 1:
+            return False
+        itemtype = itemtypes.pop()
+        if itemtype is str:
+            lengths = self._pack("Q", map(len, obj))
+            data = "".join(obj).encode("utf-8", "surrogatepass")
+            self._update_packed(b"s", lengths, update)
+            update(_LENGTH.pack(len(data)))
+            update(data)
+            return True
+        if itemtype is int:
+            try:
+                packed = self._pack("q", obj)
+            except OverflowError:
+                return False
+            self._update_packed(b"i", packed, update)
+            return True
+        if itemtype is float:
+            self._update_packed(b"d", self._pack("d", obj), update)
+            return True
+        return False
+
+    def _update_packed(self, tag: bytes, packed: array, update: Update) -> None:
+        self._update_tag(tag, update, len(packed))
+        update(_LENGTH.pack(packed.itemsize))
+        update(packed)
+
+    @staticmethod
+    def _pack(typecode: str, values: Iterable[Any]) -> array:
+        packed = array(typecode, values)
+        if sys.byteorder == "big":
+            packed.byteswap()
+        return packed
+
+    def _update_dict(self, obj: dict, update: Update, stack: list[int]) -> None:
+        if self._enter(obj, update, stack):
+            self._update_tag(b"{", update, len(obj))
+            if all(type(key) is str for key in obj):
+                for key in sorted(obj):
+                    self._update_str(key, update, stack)
+                    self._update(obj[key], update, stack)
+            else:
+                for digest in sorted(self._digest(item, stack) for item in obj.items()):
+                    update(digest)
+            stack.pop()
+
+    def _update_set(self, obj: set | frozenset, update: Update, stack: list[int]) -> None:
+        self._update_tag(b"<", update, len(obj))
+        for digest in sorted(self._digest(item, stack) for item in obj):
+            update(digest)
+
+    def _update_ndarray(self, obj: Any, update: Update, stack: list[int]) -> None:
+        if obj.dtype.hasobject:
+            self._update_reduced(obj, obj.tolist(), update, stack)
+            return
+        dtype = obj.dtype.str.encode()
+        self._update_tag(b"A", update, len(dtype))
+        update(dtype)
+        self._update(obj.shape, update, stack)
+        if not obj.flags.c_contiguous:
+            obj = sys.modules["numpy"].ascontiguousarray(obj)
+        update(obj.data)
+
+    def _update_pandas(self, obj: Any, update: Update, stack: list[int]) -> None:
+        pandas = sys.modules["pandas"]
+        self._update_reduced(obj, getattr(obj, "shape", ()), update, stack)
+        if isinstance(obj, pandas.DataFrame):
+            self._update([str(column) for column in obj.columns], update, stack)
+            self._update([str(dtype) for dtype in obj.dtypes], update, stack)
+        self._update_ndarray(pandas.util.hash_pandas_object(obj, index=True).to_numpy(), update, stack)
+
+    def _update_pickle(self, obj: Any, update: Update) -> None:
+        data = pickle.dumps(obj)
+        self._update_tag(b"P", update, len(data))
+        update(data)
+
+    def _enter(self, obj: Any, update: Update, stack: list[int]) -> bool:
+        """Push a container onto the stack unless it refers to one of its ancestors."""
+        if id(obj) in stack:
+            self._update_tag(b"@", update, stack.index(id(obj)))
+            return False
+        stack.append(id(obj))
+        return True
+
+    def _digest(self, obj: Any, stack: list[int]) -> bytes:
+        m = hashlib.blake2b(digest_size=32)
+        self._update(obj, m.update, stack)
+        return m.digest()
+
+    @staticmethod
+    def _is_numpy_array(obj: Any) -> bool:
+        numpy = sys.modules.get("numpy")
+        return numpy is not None and isinstance(obj, numpy.ndarray)
+
+    @staticmethod
+    def _is_numpy_scalar(obj: Any) -> bool:
+        numpy = sys.modules.get("numpy")
+        return numpy is not None and isinstance(obj, numpy.generic)
+
+    @staticmethod
+    def _is_pandas_object(obj: Any) -> bool:
+        pandas = sys.modules.get("pandas")
+        return pandas is not None and isinstance(obj, (pandas.DataFrame, pandas.Series, pandas.Index))
+
+    @classmethod
+    def from_config(cls: Type[Self], config: SectionProxy) -> Self:
+        return cls()
@@ -0,0 +1,3 @@
+from cachestore.indexes.file_index import FileMetadataIndex  # noqa: F401
+from cachestore.indexes.index import MetadataIndex, Usage  # noqa: F401
+from cachestore.indexes.sqlite_index import SQLiteMetadataIndex  # noqa: F401
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+from cachestore.indexes.index import MetadataIndex
+from cachestore.metadata import CacheInfo
+
+if TYPE_CHECKING:
+    from cachestore.storages import Storage
+
+
+class FileMetadataIndex(MetadataIndex):
+    """Keep metadata of each artifact as a JSON file named `metadata-<key>` in the storage itself."""
+
+    PREFIX = "metadata-"
+
+    def __init__(self, storage: Storage) -> None:
+        self._storage = storage
+
+    def _get_metakey(self, key: str) -> str:
+        return f"{self.PREFIX}{key}"
+
+    def get(self, key: str) -> CacheInfo | None:
+        metakey = self._get_metakey(key)
+        if not self._storage.exists(metakey):
+            return None
+        with self._storage.open(metakey, "rt") as file:
+            return CacheInfo.from_dict(json.load(file))
+
+    def put(self, key: str, cacheinfo: CacheInfo, size: int | None = None, priority: float | None = None) -> None:
+        with self._storage.open(self._get_metakey(key), "wt") as file:
+            json.dump(cacheinfo.to_dict(), file)
+
+    def remove(self, key: str) -> None:
+        metakey = self._get_metakey(key)
+        if self._storage.exists(metakey):
+            self._storage.remove(metakey)
+
+    def remove_many(self, keys: Iterable[str]) -> None:
+        self._storage.remove_many(self._get_metakey(key) for key in keys)
+
+    def filter(self, prefix: str) -> Iterator[tuple[str, CacheInfo]]:
+        for key in self._storage.filter(prefix=prefix):
+            if key.startswith(self.PREFIX):
+                continue
+            # artifacts still being written have no metadata yet
+            cacheinfo = self.get(key)
+            if cacheinfo is not None:
+                yield key, cacheinfo
+
+    def keys(self) -> Iterator[str]:
+        for metakey in self._storage.filter(prefix=self.PREFIX):
+            yield metakey[len(self.PREFIX) :]
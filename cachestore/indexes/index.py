@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import abc
+import datetime
+from typing import ClassVar, Iterable, Iterator, NamedTuple
+
+from cachestore.metadata import CacheInfo
+
+
+class Usage(NamedTuple):
+    """How an entry has been used, which eviction policies rank entries by."""
+
+    size: int
+    accessed_at: datetime.datetime
+    hits: int
+    duration: float | None
+
+
+class MetadataIndex(abc.ABC):
+    """Store of `CacheInfo` for each artifact key of a storage.
+
+    Indexes with `TRACKS_USAGE` also keep the `Usage` and eviction priority of each
+    entry, which is required to bound the size of a cache.
+    """
+
+    TRACKS_USAGE: ClassVar[bool] = False
+
+    @abc.abstractmethod
+    def get(self, key: str) -> CacheInfo | None:
+        raise NotImplementedError
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, CacheInfo]:
+        """Return metadata of the given keys which have one."""
+        entries: dict[str, CacheInfo] = {}
+        for key in keys:
+            cacheinfo = self.get(key)
+            if cacheinfo is not None:
+                entries[key] = cacheinfo
+        return entries
+
+    @abc.abstractmethod
+    def put(self, key: str, cacheinfo: CacheInfo, size: int | None = None, priority: float | None = None) -> None:
+        raise NotImplementedError
+
+    def put_many(self, entries: Iterable[tuple[str, CacheInfo, int | None]]) -> None:
+        for key, cacheinfo, size in entries:
+            self.put(key, cacheinfo, size)
+
+    @abc.abstractmethod
+    def remove(self, key: str) -> None:
+        """Remove metadata of the given key.  Missing keys are ignored."""
+        raise NotImplementedError
+
+    def remove_many(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self.remove(key)
+
+    @abc.abstractmethod
+    def filter(self, prefix: str) -> Iterator[tuple[str, CacheInfo]]:
+        raise NotImplementedError
+
+    def keys(self) -> Iterator[str]:
+        for key, _ in self.filter(""):
+            yield key
+
+    def expired(self, at: datetime.datetime) -> Iterator[str]:
+        """Yield keys of entries expired at the given time."""
+        for key, cacheinfo in self.filter(""):
+            if cacheinfo.expired_at is not None and cacheinfo.expired_at <= at:
+                yield key
+
+    def usage(self, key: str) -> Usage | None:
+        raise NotImplementedError
+
+    def touch(self, key: str, accessed_at: datetime.datetime, priority: float | None = None) -> None:
+        """Record a hit of the given entry.  Missing keys are ignored."""
+        raise NotImplementedError
+
+    def totals(self) -> tuple[int, int]:
+        """Return the number of entries and their total size in bytes."""
+        raise NotImplementedError
+
+    def floor(self) -> float:
+        """Return the lowest eviction priority of entries, or zero if there is none."""
+        raise NotImplementedError
+
+    def lowest(self, limit: int) -> Iterator[str]:
+        """Yield up to `limit` keys in ascending order of eviction priority."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
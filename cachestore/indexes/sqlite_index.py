@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import datetime
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from os import PathLike
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from cachestore.indexes.index import MetadataIndex, Usage
+from cachestore.metadata import CacheInfo
+
+TABLES = """
+CREATE TABLE IF NOT EXISTS functions (
+    hash TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    source TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    function TEXT NOT NULL,
+    parameters TEXT NOT NULL,
+    executed_at TEXT NOT NULL,
+    expired_at TEXT,
+    size INTEGER,
+    accessed_at TEXT,
+    hits INTEGER NOT NULL DEFAULT 0,
+    duration REAL,
+    priority REAL
+);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+"""
+
+# columns added to the entries table after its first version
+COLUMNS = {
+    "accessed_at": "TEXT",
+    "hits": "INTEGER NOT NULL DEFAULT 0",
+    "duration": "REAL",
+    "priority": "REAL",
+}
+
+# totals are maintained by triggers, so that checking the size of a cache does not
+# scan all entries.  `recursive_triggers` makes replacements fire the delete trigger.
+INDEXES = """
+CREATE INDEX IF NOT EXISTS entries_function ON entries (function);
+CREATE INDEX IF NOT EXISTS entries_expired_at ON entries (expired_at) WHERE expired_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS entries_priority ON entries (priority) WHERE priority IS NOT NULL;
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    UPDATE totals SET entries = entries + 1, bytes = bytes + COALESCE(NEW.size, 0);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE totals SET entries = entries - 1, bytes = bytes - COALESCE(OLD.size, 0);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_update_size AFTER UPDATE OF size ON entries BEGIN
+    UPDATE totals SET bytes = bytes - COALESCE(OLD.size, 0) + COALESCE(NEW.size, 0);
+END;
+INSERT OR IGNORE INTO totals (id, entries, bytes) SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM entries;
+"""
+
+MAX_PARAMETERS = 999
+
+SELECT_ENTRIES = """
+SELECT e.key, f.name, f.filename, f.source, e.parameters, e.executed_at, e.expired_at, e.duration
+FROM entries AS e JOIN functions AS f ON e.function = f.hash
+"""
+
+
+class SQLiteMetadataIndex(MetadataIndex):
+    """Metadata index kept in a single SQLite database.
+
+    Entries are indexed by key, function hash and expiry time, so that lookups by
+    prefix, by function and of expired entries do not scan all of them.  Function
+    information is stored once per function instead of once per entry.
+
+    Usage of entries is tracked as well, so this index can be used to bound the
+    size of a cache.
+    """
+
+    TRACKS_USAGE = True
+
+    def __init__(self, path: str | PathLike, timeout: float = 30.0) -> None:
+        self._path = Path(path)
+        self._timeout = timeout
+        self._local = threading.local()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection: sqlite3.Connection | None = getattr(self._local, "connection", None)
+        if connection is None:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self._path, timeout=self._timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA recursive_triggers=ON")
+            connection.executescript(TABLES)
+            self._local.connection = connection
+            self._migrate()
+            connection.executescript(INDEXES)
+        return connection
+
+    def _migrate(self) -> None:
+        with self.transaction() as connection:
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(entries)")}
+            for name, definition in COLUMNS.items():
+                if name not in columns:
+                    connection.execute(f"ALTER TABLE entries ADD COLUMN {name} {definition}")
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    @staticmethod
+    def _get_funchash(key: str) -> str:
+        return key.split(".", 1)[0]
+
+    @staticmethod
+    def _format_datetime(value: datetime.datetime | None) -> str | None:
+        return value.isoformat(timespec="microseconds") if value is not None else None
+
+    @staticmethod
+    def _prefix_range(prefix: str) -> tuple[str, str]:
+        return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+    @staticmethod
+    def _build_cacheinfo(row: tuple[Any, ...]) -> CacheInfo:
+        _, name, filename, source, parameters, executed_at, expired_at, duration = row
+        return CacheInfo.from_dict(
+            {
+                "function": {"name": name, "filename": filename, "source": source},
+                "parameters": json.loads(parameters),
+                "executed_at": executed_at,
+                "expired_at": expired_at,
+                "duration": duration,
+            }
+        )
+
+    def get(self, key: str) -> CacheInfo | None:
+        row = self.connection.execute(f"{SELECT_ENTRIES} WHERE e.key = ?", (key,)).fetchone()
+        return self._build_cacheinfo(row) if row is not None else None
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, CacheInfo]:
+        keys = list(keys)
+        entries: dict[str, CacheInfo] = {}
+        # stay below the limit of host parameters of old SQLite versions
+        for start in range(0, len(keys), MAX_PARAMETERS):
+            batch = keys[start : start + MAX_PARAMETERS]
+            placeholders = ", ".join("?" * len(batch))
+            for row in self.connection.execute(f"{SELECT_ENTRIES} WHERE e.key IN ({placeholders})", batch):
+                entries[row[0]] = self._build_cacheinfo(row)
+        return entries
+
+    def put(self, key: str, cacheinfo: CacheInfo, size: int | None = None, priority: float | None = None) -> None:
+        with self.transaction() as connection:
+            self._insert(connection, key, cacheinfo, size, priority)
+
+    def put_many(self, entries: Iterable[tuple[str, CacheInfo, int | None]]) -> None:
+        with self.transaction() as connection:
+            for key, cacheinfo, size in entries:
+                self._insert(connection, key, cacheinfo, size)
+
+    def _insert(
+        self,
+        connection: sqlite3.Connection,
+        key: str,
+        cacheinfo: CacheInfo,
+        size: int | None,
+        priority: float | None = None,
+    ) -> None:
+        d = cacheinfo.to_dict()
+        funchash = self._get_funchash(key)
+        connection.execute(
+            "INSERT OR IGNORE INTO functions (hash, name, filename, source) VALUES (?, ?, ?, ?)",
+            (funchash, d["function"]["name"], d["function"]["filename"], d["function"]["source"]),
+        )
+        executed_at = self._format_datetime(cacheinfo.executed_at)
+        connection.execute(
+            "INSERT OR REPLACE INTO entries"
+            " (key, function, parameters, executed_at, expired_at, size, accessed_at, hits, duration, priority)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?, ?)",
+            (
+                key,
+                funchash,
+                json.dumps(d["parameters"]),
+                executed_at,
+                self._format_datetime(cacheinfo.expired_at),
+                size,
+                executed_at,
+                cacheinfo.duration,
+                priority,
+            ),
+        )
+
+    def remove(self, key: str) -> None:
+        self.connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def remove_many(self, keys: Iterable[str]) -> None:
+        with self.transaction() as connection:
+            connection.executemany("DELETE FROM entries WHERE key = ?", ((key,) for key in keys))
+
+    def filter(self, prefix: str) -> Iterator[tuple[str, CacheInfo]]:
+        if prefix:
+            rows = self.connection.execute(
+                f"{SELECT_ENTRIES} WHERE e.key >= ? AND e.key < ? ORDER BY e.key", self._prefix_range(prefix)
+            ).fetchall()
+        else:
+            rows = self.connection.execute(f"{SELECT_ENTRIES} ORDER BY e.key").fetchall()
+        for row in rows:
+            yield row[0], self._build_cacheinfo(row)
+
+    def function(self, funchash: str) -> Iterator[tuple[str, CacheInfo]]:
+        rows = self.connection.execute(f"{SELECT_ENTRIES} WHERE e.function = ? ORDER BY e.key", (funchash,))
+        for row in rows.fetchall():
+            yield row[0], self._build_cacheinfo(row)
+
+    def keys(self) -> Iterator[str]:
+        for (key,) in self.connection.execute("SELECT key FROM entries ORDER BY key").fetchall():
+            yield key
+
+    def expired(self, at: datetime.datetime) -> Iterator[str]:
+        rows = self.connection.execute(
+            "SELECT key FROM entries WHERE expired_at IS NOT NULL AND expired_at <= ? ORDER BY expired_at",
+            (self._format_datetime(at),),
+        )
+        for (key,) in rows.fetchall():
+            yield key
+
+    def size(self, key: str) -> int | None:
+        row = self.connection.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def usage(self, key: str) -> Usage | None:
+        row = self.connection.execute(
+            "SELECT size, COALESCE(accessed_at, executed_at), hits, duration FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        size, accessed_at, hits, duration = row
+        return Usage(size or 0, datetime.datetime.fromisoformat(accessed_at), hits, duration)
+
+    def touch(self, key: str, accessed_at: datetime.datetime, priority: float | None = None) -> None:
+        self.connection.execute(
+            "UPDATE entries SET accessed_at = ?, hits = hits + 1, priority = COALESCE(?, priority) WHERE key = ?",
+            (self._format_datetime(accessed_at), priority, key),
+        )
+
+    def totals(self) -> tuple[int, int]:
+        row = self.connection.execute("SELECT entries, bytes FROM totals").fetchone()
+        return (row[0], row[1]) if row is not None else (0, 0)
+
+    def floor(self) -> float:
+        row = self.connection.execute("SELECT MIN(priority) FROM entries WHERE priority IS NOT NULL").fetchone()
+        return float(row[0]) if row[0] is not None else 0.0
+
+    def lowest(self, limit: int) -> Iterator[str]:
+        # entries stored before a budget was configured have no priority and go first
+        rows = self.connection.execute("SELECT key FROM entries WHERE priority IS NULL LIMIT ?", (limit,)).fetchall()
+        if len(rows) < limit:
+            rows += self.connection.execute(
+                "SELECT key FROM entries WHERE priority IS NOT NULL ORDER BY priority LIMIT ?", (limit - len(rows),)
+            ).fetchall()
+        for (key,) in rows:
+            yield key
+
+    def close(self) -> None:
+        connection: sqlite3.Connection | None = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
@@ -5,7 +5,7 @@ import datetime
 import inspect
 from contextlib import suppress
 from pathlib import Path
-from typing import Any, Callable, NamedTuple
+from typing import Any, Callable, Iterable, NamedTuple
 
 from cachestore.common import ASTNormalizer
 from cachestore.hashers import Hasher
@@ -60,25 +60,85 @@ class ExecutionInfo(NamedTuple):
         *args: Any,
         **kwargs: Any,
     ) -> "ExecutionInfo":
-        signature = inspect.signature(func)
-        arguments: list[tuple[str | None, Any]] = [(None, v) for v in args]
-        arguments += list(kwargs.items())
+        return ExecutionInfoBuilder(func)(*args, **kwargs)
 
+    def hash(self, hasher: Hasher) -> str:
+        return hasher(self)
+
+
+class ExecutionInfoBuilder:
+    """Build `ExecutionInfo` of calls to a function whose signature is resolved only once.
+
+    Functions without `*args` / `**kwargs` are bound by a plain loop over the
+    precomputed parameter layout.  The other ones fall back to `inspect.Signature.bind`.
+    Either way, the parameters are ordered as in the signature, so keys stay the same.
+    """
+
+    def __init__(self, func: Callable[..., Any], ignore: Iterable[str] = ()) -> None:
+        self._func = func
+        self._signature = inspect.signature(func)
+        self._ignore = set(ignore)
+
+        parameters = list(self._signature.parameters.values())
+        self._names = [p.name for p in parameters]
+        self._positional_names = [p.name for p in parameters if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)]
+        self._keyword_names = {p.name for p in parameters if p.kind in (p.POSITIONAL_OR_KEYWORD, p.KEYWORD_ONLY)}
+        self._defaults = {p.name: p.default for p in parameters if p.default is not p.empty}
+        self._is_simple = all(p.kind not in (p.VAR_POSITIONAL, p.VAR_KEYWORD) for p in parameters) and (
+            self._ignore <= set(self._names)
+        )
+
+    def __call__(self, *args: Any, **kwargs: Any) -> ExecutionInfo:
+        if self._is_simple:
+            params = self._bind(args, kwargs)
+            if params is not None:
+                return ExecutionInfo(params)
+        return self._bind_with_signature(args, kwargs)
+
+    def _bind(self, args: tuple[Any, ...], kwargs: dict[str, Any]) -> dict[str, Any] | None:
+        if len(args) > len(self._positional_names):
+            return None
+        values = dict(zip(self._positional_names, args))
+        for name, value in kwargs.items():
+            if name in values or name not in self._keyword_names:
+                return None
+            values[name] = value
+
+        params: dict[str, Any] = {}
+        for name in self._names:
+            if name in values:
+                value = values[name]
+            elif name in self._defaults:
+                value = self._defaults[name]
+            else:
+                return None
+            if name not in self._ignore:
+                params[name] = value
+        return params
+
+    def _bind_with_signature(self, args: tuple[Any, ...], kwargs: dict[str, Any]) -> ExecutionInfo:
         try:
-            bound_args = signature.bind(*args, **kwargs)
+            bound_args = self._signature.bind(*args, **kwargs)
             bound_args.apply_defaults()
-            params = bound_args.arguments
+            params = dict(bound_args.arguments)
         except TypeError as err:
             raise ValueError(
-                f"Invalid arguments of {func.__module__}.{func.__name__}:\n\t"
-                f"Signature : {signature}\n\t"
+                f"Invalid arguments of {self._func.__module__}.{self._func.__name__}:\n\t"
+                f"Signature : {self._signature}\n\t"
                 f"Given args: {args=}, {kwargs=}"
             ) from err
 
-        return cls(params)
+        for paramname in self._ignore:
+            del params[paramname]
 
-    def hash(self, hasher: Hasher) -> str:
-        return hasher(self)
+        return ExecutionInfo(params)
+
+
+class ParameterRepr(str):
+    """Parameter value restored from metadata, which is already formatted with `repr()`."""
+
+    def __repr__(self) -> str:
+        return str(self)
 
 
 class CacheInfo(NamedTuple):
@@ -86,6 +146,8 @@ class CacheInfo(NamedTuple):
     parameters: dict[str, Any]
     executed_at: datetime.datetime
     expired_at: datetime.datetime | None
+    # seconds taken to compute the artifact
+    duration: float | None = None
 
     def to_dict(self) -> dict[str, Any]:
         return {
@@ -93,13 +155,15 @@ class CacheInfo(NamedTuple):
             "parameters": {k: repr(v) for k, v in self.parameters.items()},
             "executed_at": self.executed_at.isoformat(),
             "expired_at": self.expired_at.isoformat() if self.expired_at else None,
+            "duration": self.duration,
         }
 
     @classmethod
     def from_dict(cls, d: dict[str, Any]) -> "CacheInfo":
         return cls(
             function=FunctionInfo.from_dict(d["function"]),
-            parameters=d["parameters"],
+            parameters={k: ParameterRepr(v) for k, v in d["parameters"].items()},
             executed_at=datetime.datetime.fromisoformat(d["executed_at"]),
             expired_at=datetime.datetime.fromisoformat(d["expired_at"]) if d["expired_at"] else None,
+            duration=d.get("duration"),
         )
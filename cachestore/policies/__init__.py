@@ -0,0 +1,4 @@
+from cachestore.policies.greedy_dual_size_policy import GreedyDualSizePolicy  # noqa: F401
+from cachestore.policies.lfu_policy import LFUPolicy  # noqa: F401
+from cachestore.policies.lru_policy import LRUPolicy  # noqa: F401
+from cachestore.policies.policy import EvictionPolicy  # noqa: F401
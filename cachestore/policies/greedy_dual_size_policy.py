@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from configparser import SectionProxy
+from typing import Type, TypeVar
+
+from cachestore.indexes import Usage
+from cachestore.policies.policy import EvictionPolicy
+
+Self = TypeVar("Self", bound="GreedyDualSizePolicy")
+
+
+class GreedyDualSizePolicy(EvictionPolicy):
+    """Evict entries which are cheap to recompute per byte first.
+
+    The cost of an entry is the time it took to compute, and its priority is
+    `floor + cost / size` as in GreedyDual-Size.  Entries whose duration is
+    unknown cost `default_cost` seconds.
+    """
+
+    def __init__(self, default_cost: float = 1.0) -> None:
+        self._default_cost = default_cost
+
+    def priority(self, usage: Usage, floor: float) -> float:
+        cost = usage.duration if usage.duration is not None else self._default_cost
+        return floor + cost / max(usage.size, 1)
+
+    @classmethod
+    def from_config(cls: Type[Self], config: SectionProxy) -> Self:
+        return cls(default_cost=config.getfloat("eviction.default_cost", 1.0))
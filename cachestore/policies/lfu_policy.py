@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+from cachestore.indexes import Usage
+from cachestore.policies.policy import EvictionPolicy
+
+
+class LFUPolicy(EvictionPolicy):
+    """Evict the least frequently used entries first.
+
+    Priorities are aged by the floor, so that entries which were popular long ago
+    do not stay forever while new entries are evicted right after being stored.
+    """
+
+    def priority(self, usage: Usage, floor: float) -> float:
+        return floor + usage.hits + 1
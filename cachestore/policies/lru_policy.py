@@ -0,0 +1,11 @@
+from __future__ import annotations
+
+from cachestore.indexes import Usage
+from cachestore.policies.policy import EvictionPolicy
+
+
+class LRUPolicy(EvictionPolicy):
+    """Evict the least recently used entries first."""
+
+    def priority(self, usage: Usage, floor: float) -> float:
+        return usage.accessed_at.timestamp()
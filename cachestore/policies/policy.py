@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import abc
+from configparser import SectionProxy
+from typing import Type, TypeVar
+
+from cachestore.indexes import Usage
+
+Self = TypeVar("Self", bound="EvictionPolicy")
+
+
+class EvictionPolicy(abc.ABC):
+    """Rank cache entries to decide which ones are evicted when a cache exceeds its budget.
+
+    The priority of an entry is computed when it is stored and whenever it is hit,
+    and entries with the lowest priority are evicted first.  `floor` is the lowest
+    priority among stored entries, which lets policies age out old entries.
+    """
+
+    @abc.abstractmethod
+    def priority(self, usage: Usage, floor: float) -> float:
+        raise NotImplementedError
+
+    @classmethod
+    def from_config(cls: Type[Self], config: SectionProxy) -> Self:
+        return cls()
@@ -1,2 +1,7 @@
+from cachestore.storages.compressed_storage import CompressedStorage  # noqa: F401
+from cachestore.storages.content_addressed_storage import ContentAddressedStorage  # noqa: F401
 from cachestore.storages.local_storage import LocalStorage  # noqa: F401
+from cachestore.storages.s3_storage import S3Storage  # noqa: F401
+from cachestore.storages.sqlite_storage import SQLiteStorage  # noqa: F401
 from cachestore.storages.storage import Storage  # noqa: F401
+from cachestore.storages.tiered_storage import TieredStorage  # noqa: F401
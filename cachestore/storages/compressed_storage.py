@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import io
+from concurrent.futures import Executor
+from configparser import SectionProxy
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator, Type, TypeVar
+
+from cachestore.common import Lease
+from cachestore.common.compression import CODECS, Codec, PrefixedReader, get_codec
+from cachestore.indexes import MetadataIndex
+from cachestore.storages.storage import Storage
+from cachestore.util import safe_import_object
+
+Self = TypeVar("Self", bound="CompressedStorage")
+
+# Compressed files start with this magic followed by the ID of the codec.
+MAGIC = b"\x93CSZ"
+
+
+class CompressedStorage(Storage):
+    """Storage compressing artifacts of another storage.
+
+    Every formatter works on top of it, including streaming of iterators.  Each file
+    records its codec, so files written with another codec, or without compression
+    before the storage was wrapped, remain readable.
+
+    Codecs are `zstd`, `lz4`, `gzip`, `bz2` and `lzma`.  zstd compresses in
+    `threads` worker threads when it is positive, and uses a dictionary trained by
+    `cachestore.common.compression.train_dictionary()` if given.  When zstandard or
+    lz4 is not installed, gzip is used instead.
+    """
+
+    def __init__(
+        self,
+        storage: Storage,
+        codec: str = "zstd",
+        level: int | None = None,
+        threads: int = 0,
+        dictionary: bytes | None = None,
+    ) -> None:
+        self._storage = storage
+        self._codec = get_codec(codec, level, threads, dictionary)
+        self._dictionary = dictionary
+
+    def __repr__(self) -> str:
+        return f"CompressedStorage({self._storage!r}, codec={self._codec.NAME})"
+
+    @property
+    def storage(self) -> Storage:
+        return self._storage
+
+    @property
+    def codec(self) -> Codec:
+        return self._codec
+
+    def _get_codec(self, codec_id: int) -> Codec:
+        if codec_id == self._codec.ID:
+            return self._codec
+        for codec in CODECS.values():
+            if codec.ID == codec_id:
+                if codec.NAME == "zstd":
+                    return codec(dictionary=self._dictionary)  # type: ignore[call-arg]
+                return codec()  # type: ignore[call-arg]
+        raise ValueError(f"Unknown codec ID: {codec_id}")
+
+    @contextmanager
+    def open(self, key: str, mode: str) -> Iterator[IO[Any]]:
+        if "+" in mode or "a" in mode:
+            raise ValueError(f"CompressedStorage does not support mode {mode}")
+        with self._storage.open(key, mode if "b" in mode else mode.replace("t", "") + "b") as file:
+            if "r" in mode:
+                head = file.read(len(MAGIC) + 1)
+                if head[: len(MAGIC)] == MAGIC:
+                    stream = self._get_codec(head[-1]).reader(file)
+                else:
+                    # written before compression was enabled
+                    stream = io.BufferedReader(PrefixedReader(head, file))
+            else:
+                file.write(MAGIC + bytes([self._codec.ID]))
+                stream = self._codec.writer(file)
+            with stream:
+                if "b" in mode:
+                    yield stream
+                else:
+                    with io.TextIOWrapper(stream, encoding="utf-8") as text:
+                        yield text
+
+    def exists(self, key: str) -> bool:
+        return self._storage.exists(key)
+
+    def remove(self, key: str) -> None:
+        self._storage.remove(key)
+
+    def exists_many(self, keys: Iterable[str]) -> set[str]:
+        return self._storage.exists_many(keys)
+
+    def remove_many(self, keys: Iterable[str]) -> int:
+        return self._storage.remove_many(keys)
+
+    def all(self) -> Iterator[str]:
+        return self._storage.all()
+
+    def filter(self, prefix: str) -> Iterator[str]:
+        return self._storage.filter(prefix)
+
+    def size(self, key: str) -> int:
+        # the compressed size is what counts towards the budget
+        return self._storage.size(key)
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        with self._storage.batch():
+            yield
+
+    def collect(self) -> int:
+        return self._storage.collect()
+
+    @property
+    def metadata_index(self) -> MetadataIndex | None:
+        return self._storage.metadata_index
+
+    def lease(self, key: str) -> Lease | None:
+        return self._storage.lease(key)
+
+    def path(self, key: str) -> Path | None:
+        # files are not raw artifacts, so they cannot be mapped
+        return None
+
+    @property
+    def executor(self) -> Executor:
+        return self._storage.executor
+
+    @classmethod
+    def from_config(cls: Type[Self], config: SectionProxy) -> Self:
+        storagecls = safe_import_object(config.get("compression.storage", "cachestore.LocalStorage"))
+        assert issubclass(storagecls, Storage)
+
+        dictionary = None
+        if "compression.dictionary" in config:
+            with open(config["compression.dictionary"], "rb") as file:
+                dictionary = file.read()
+
+        return cls(
+            storage=storagecls.from_config(config),
+            codec=config.get("compression.codec", "zstd"),
+            level=config.getint("compression.level") if "compression.level" in config else None,
+            threads=config.getint("compression.threads", 0),
+            dictionary=dictionary,
+        )
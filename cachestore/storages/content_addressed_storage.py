@@ -0,0 +1,327 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import shutil
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import Executor
+from configparser import SectionProxy
+from contextlib import contextmanager
+from os import PathLike
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator, Type, TypeVar
+
+from cachestore.common import Lease
+from cachestore.indexes import MetadataIndex
+from cachestore.storages.local_storage import LocalStorage
+from cachestore.storages.storage import Storage
+from cachestore.util import safe_import_object
+
+Self = TypeVar("Self", bound="ContentAddressedStorage")
+
+DATABASE_FILENAME = ".blobs.sqlite3"
+BLOB_PREFIX = "blob-"
+# artifacts are buffered in memory up to this size while their digest is computed
+SPOOL_SIZE = 16 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+# limit of host parameters of old SQLite versions
+MAX_PARAMETERS = 999
+
+TABLES = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    refcount INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS refs (
+    key TEXT PRIMARY KEY,
+    digest TEXT NOT NULL REFERENCES blobs (digest)
+);
+"""
+
+
+class _Spool(io.RawIOBase):
+    """Stream keeping written bytes in memory until they exceed `max_size`, and then in a temporary file.
+
+    Unlike `tempfile.SpooledTemporaryFile`, it is a complete `io.RawIOBase`, so that
+    it can be wrapped by buffered and text streams on all supported Python versions.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self._max_size = max_size
+        memory = io.BytesIO()
+        self._memory: io.BytesIO | None = memory
+        self._file: IO[bytes] = memory
+
+    def readable(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        view = memoryview(buffer).cast("B")
+        data = self._file.read(len(view))
+        view[: len(data)] = data
+        return len(data)
+
+    def write(self, data: Any) -> int:
+        if self._memory is not None and self._memory.tell() + len(memoryview(data).cast("B")) > self._max_size:
+            file = tempfile.TemporaryFile()
+            file.write(self._memory.getbuffer())
+            file.seek(self._memory.tell())
+            self._file = file
+            self._memory = None
+        return self._file.write(data)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def close(self) -> None:
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+
+class ContentAddressedStorage(Storage):
+    """Storage keeping identical artifacts once in another storage.
+
+    The content of each artifact is stored as a blob named after its SHA-256 digest,
+    and keys refer to blobs through entries of a SQLite database which count the
+    references of each blob.  An artifact whose content is already stored is not
+    written again, and a blob is removed as soon as its last key is removed or
+    overwritten.  Keys written before the storage was wrapped remain readable.
+
+    Each key reports the size of its blob, so a budget counts duplicates each time.
+    The database is kept in the root of a `LocalStorage`; other storages need an
+    explicit `database` path.
+    """
+
+    def __init__(
+        self,
+        storage: Storage,
+        database: str | PathLike | None = None,
+        timeout: float = 30.0,
+    ) -> None:
+        if database is None:
+            if not isinstance(storage, LocalStorage):
+                raise ValueError("ContentAddressedStorage needs a database path for storages other than LocalStorage.")
+            database = storage.root / DATABASE_FILENAME
+        self._storage = storage
+        self._database = Path(database)
+        self._timeout = timeout
+        self._local = threading.local()
+
+    def __repr__(self) -> str:
+        return f"ContentAddressedStorage({self._storage!r})"
+
+    @property
+    def storage(self) -> Storage:
+        return self._storage
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection: sqlite3.Connection | None = getattr(self._local, "connection", None)
+        if connection is None:
+            self._database.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self._database, timeout=self._timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(TABLES)
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    @staticmethod
+    def _get_blobkey(digest: str) -> str:
+        # formatted like `<function>.<execution>`, so that sharded layouts spread blobs
+        return f"{BLOB_PREFIX}{digest[:2]}.{digest}"
+
+    def _get_digest(self, key: str) -> str | None:
+        row = self.connection.execute("SELECT digest FROM refs WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    @contextmanager
+    def open(self, key: str, mode: str) -> Iterator[IO[Any]]:
+        if "+" in mode or "a" in mode:
+            raise ValueError(f"ContentAddressedStorage does not support mode {mode}")
+        if "r" in mode:
+            digest = self._get_digest(key)
+            with self._storage.open(self._get_blobkey(digest) if digest else key, mode) as file:
+                yield file
+            return
+
+        if "x" in mode and self.exists(key):
+            raise FileExistsError(key)
+        with io.BufferedRandom(_Spool(SPOOL_SIZE)) as spool:
+            if "b" in mode:
+                yield spool
+            else:
+                text = io.TextIOWrapper(spool, encoding="utf-8")
+                yield text
+                text.flush()
+                text.detach()
+            self._put(key, spool)
+
+    def _put(self, key: str, spool: IO[bytes]) -> None:
+        size = spool.seek(0, io.SEEK_END)
+        spool.seek(0)
+        digest = hashlib.sha256()
+        while chunk := spool.read(CHUNK_SIZE):
+            digest.update(chunk)
+        hexdigest = digest.hexdigest()
+        blobkey = self._get_blobkey(hexdigest)
+
+        # The blob is written out of the transaction, so that large writes do not
+        # block other processes.  It is checked again in the transaction, where
+        # blobs are never removed concurrently.
+        if not self._is_stored(hexdigest):
+            self._write_blob(blobkey, spool)
+        with self.transaction() as connection:
+            row = connection.execute("SELECT refcount FROM blobs WHERE digest = ?", (hexdigest,)).fetchone()
+            if row is None and not self._storage.exists(blobkey):
+                self._write_blob(blobkey, spool)
+            previous = connection.execute("SELECT digest FROM refs WHERE key = ?", (key,)).fetchone()
+            if previous is not None and previous[0] == hexdigest:
+                return
+            connection.execute(
+                "INSERT INTO blobs (digest, size, refcount) VALUES (?, ?, 1)"
+                " ON CONFLICT (digest) DO UPDATE SET refcount = refcount + 1",
+                (hexdigest, size),
+            )
+            connection.execute(
+                "INSERT INTO refs (key, digest) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET digest = excluded.digest",
+                (key, hexdigest),
+            )
+            if previous is not None:
+                self._release(connection, previous[0])
+            elif self._storage.exists(key):
+                # replaces a file written before the storage was wrapped
+                self._storage.remove(key)
+
+    def _is_stored(self, digest: str) -> bool:
+        row = self.connection.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        return row is not None
+
+    def _write_blob(self, blobkey: str, spool: IO[bytes]) -> None:
+        spool.seek(0)
+        with self._storage.open(blobkey, "wb") as file:
+            shutil.copyfileobj(spool, file, CHUNK_SIZE)
+
+    def _release(self, connection: sqlite3.Connection, digest: str) -> None:
+        connection.execute("UPDATE blobs SET refcount = refcount - 1 WHERE digest = ?", (digest,))
+        row = connection.execute("SELECT refcount FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        if row is not None and row[0] <= 0:
+            connection.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            try:
+                self._storage.remove(self._get_blobkey(digest))
+            except FileNotFoundError:
+                pass
+
+    def exists(self, key: str) -> bool:
+        return self._get_digest(key) is not None or self._storage.exists(key)
+
+    def exists_many(self, keys: Iterable[str]) -> set[str]:
+        keys = list(keys)
+        existing: set[str] = set()
+        for start in range(0, len(keys), MAX_PARAMETERS):
+            batch = keys[start : start + MAX_PARAMETERS]
+            placeholders = ", ".join("?" * len(batch))
+            rows = self.connection.execute(f"SELECT key FROM refs WHERE key IN ({placeholders})", batch)
+            existing.update(key for (key,) in rows)
+        # keys written before the storage was wrapped
+        return existing | self._storage.exists_many(key for key in keys if key not in existing)
+
+    def remove(self, key: str) -> None:
+        with self.transaction() as connection:
+            row = connection.execute("SELECT digest FROM refs WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                connection.execute("DELETE FROM refs WHERE key = ?", (key,))
+                self._release(connection, row[0])
+                return
+        self._storage.remove(key)
+
+    def all(self) -> Iterator[str]:
+        rows = self.connection.execute("SELECT key FROM refs ORDER BY key").fetchall()
+        for (key,) in rows:
+            yield key
+        for key in self._storage.all():
+            if not key.startswith(BLOB_PREFIX):
+                yield key
+
+    def filter(self, prefix: str) -> Iterator[str]:
+        if not prefix:
+            yield from self.all()
+            return
+        rows = self.connection.execute(
+            "SELECT key FROM refs WHERE key >= ? AND key < ? ORDER BY key",
+            (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)),
+        ).fetchall()
+        for (key,) in rows:
+            yield key
+        for key in self._storage.filter(prefix):
+            if not key.startswith(BLOB_PREFIX):
+                yield key
+
+    def size(self, key: str) -> int:
+        row = self.connection.execute(
+            "SELECT b.size FROM refs AS r JOIN blobs AS b ON r.digest = b.digest WHERE r.key = ?", (key,)
+        ).fetchone()
+        if row is not None:
+            return int(row[0])
+        return self._storage.size(key)
+
+    def collect(self) -> int:
+        """Remove blobs referenced by no key, like ones left by interrupted writes."""
+        num_removed = 0
+        with self.transaction() as connection:
+            digests = {row[0] for row in connection.execute("SELECT digest FROM blobs")}
+            for blobkey in list(self._storage.filter(BLOB_PREFIX)):
+                if blobkey.rpartition(".")[2] not in digests:
+                    self._storage.remove(blobkey)
+                    num_removed += 1
+        return num_removed
+
+    def usage(self) -> tuple[int, int]:
+        """Return the number of stored blobs and their total size in bytes."""
+        row = self.connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        return int(row[0]), int(row[1])
+
+    @property
+    def metadata_index(self) -> MetadataIndex | None:
+        return self._storage.metadata_index
+
+    def lease(self, key: str) -> Lease | None:
+        return self._storage.lease(key)
+
+    def path(self, key: str) -> Path | None:
+        digest = self._get_digest(key)
+        return self._storage.path(self._get_blobkey(digest) if digest else key)
+
+    @property
+    def executor(self) -> Executor:
+        return self._storage.executor
+
+    @classmethod
+    def from_config(cls: Type[Self], config: SectionProxy) -> Self:
+        storagecls = safe_import_object(config.get("dedup.storage", "cachestore.LocalStorage"))
+        assert issubclass(storagecls, Storage)
+        return cls(storage=storagecls.from_config(config), database=config.get("dedup.database"))
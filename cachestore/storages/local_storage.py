@@ -1,28 +1,59 @@
 from __future__ import annotations
 
+import os
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from configparser import SectionProxy
-from contextlib import contextmanager
+from contextlib import contextmanager, suppress
 from os import PathLike
 from pathlib import Path
-from typing import IO, Any, Callable, ContextManager, Iterator, Type, TypeVar
+from typing import IO, Any, Callable, ContextManager, Iterable, Iterator, Literal, Type, TypeVar, cast
 
-from cachestore.common import FileLock
+from cachestore.common import FileLock, Lease
+from cachestore.common.aio import DEFAULT_MAX_WORKERS
+from cachestore.indexes import MetadataIndex, SQLiteMetadataIndex
 from cachestore.storages.storage import Storage
 from cachestore.util import safe_import_object
 
 DEFAULT_ROOT_DIR = ".cachestore"
+INDEX_FILENAME = ".index.sqlite3"
+LOCK_SUFFIX = ".lock"
+LEASE_SUFFIX = ".lease"
+TEMP_SUFFIX = ".tmp"
+# directories with fewer keys to check than this are checked by `stat` instead of listing them
+SCAN_THRESHOLD = 16
 
 Self = TypeVar("Self", bound="LocalStorage")
+T = TypeVar("T")
+Layout = Literal["flat", "sharded"]
 
 
 class LocalStorage(Storage):
+    """Storage keeping each key as a file under the root directory.
+
+    With the `flat` layout, all files are placed directly in the root directory.
+    With the `sharded` layout, keys formatted like `[<namespace>-]<function>.<execution>`
+    are placed in `<root>/<function>/<first two characters of execution>/`, so that
+    listing entries of a function reads only its own directories.  Other keys stay
+    in the root directory.
+    """
+
     def __init__(
         self,
         root: str | PathLike | None = None,
         openfn: Callable[..., IO[Any]] | Callable[..., ContextManager[IO[Any]]] | None = None,
+        index: bool = False,
+        layout: Layout = "flat",
+        fsync: bool = True,
     ) -> None:
+        if layout not in ("flat", "sharded"):
+            raise ValueError(f"Unknown layout: {layout}")
         self._root = Path(root or DEFAULT_ROOT_DIR).absolute()
         self._openfn = openfn or open
+        self._index = SQLiteMetadataIndex(self._root / INDEX_FILENAME) if index else None
+        self._layout = layout
+        self._fsync = fsync
 
     def __str__(self) -> str:
         return f"LocalStorage(root={self._root.relative_to(Path.cwd())})"
@@ -30,10 +61,72 @@ class LocalStorage(Storage):
     def __repr__(self) -> str:
         return f"LocalStorage(root={self._root.relative_to(Path.cwd())})"
 
+    @property
+    def root(self) -> Path:
+        return self._root
+
+    @property
+    def layout(self) -> Layout:
+        return self._layout
+
+    def _get_path(self, key: str) -> Path:
+        if self._layout == "sharded":
+            funchash, sep, exechash = key.rsplit("-", 1)[-1].partition(".")
+            if sep and funchash and exechash:
+                return self._root / funchash / exechash[:2] / key
+        return self._root / key
+
     @contextmanager
     def open(self, key: str, mode: str) -> Iterator[IO[Any]]:
-        filename = self._root / key
-        lockfile = filename.parent / (filename.name + ".lock")
+        filename = self._get_path(key)
+        if "+" in mode or "a" in mode:
+            with self._open_in_place(filename, mode) as fp:
+                yield fp
+        elif "w" in mode or "x" in mode:
+            with self._open_atomic(filename, mode) as fp:
+                yield fp
+        else:
+            # files are only ever replaced as a whole, so readers need no lock
+            with self._openfn(filename, mode) as fp:
+                yield fp
+
+    @contextmanager
+    def _open_atomic(self, filename: Path, mode: str) -> Iterator[IO[Any]]:
+        """Write into a hidden temporary file and move it to the destination on success.
+
+        Readers see either the previous file or the complete new one, and a failed
+        or abandoned write leaves the destination untouched.  In `x` mode the file
+        is published by a hard link, which fails if the destination exists, so only
+        one of concurrent exclusive writers succeeds.
+        """
+        if "x" in mode and filename.exists():
+            raise FileExistsError(filename)
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        tempfile = filename.parent / f".{filename.name}.{uuid.uuid4().hex}{TEMP_SUFFIX}"
+        try:
+            with self._openfn(tempfile, mode.replace("x", "w")) as fp:
+                yield fp
+            if self._fsync:
+                fd = os.open(tempfile, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            if "x" in mode:
+                os.link(tempfile, filename)
+                tempfile.unlink()
+            else:
+                os.replace(tempfile, filename)
+        except BaseException:
+            with suppress(FileNotFoundError):
+                tempfile.unlink()
+            raise
+
+    @contextmanager
+    def _open_in_place(self, filename: Path, mode: str) -> Iterator[IO[Any]]:
+        # The lock file is hidden and kept after use.  Removing it would let another
+        # process lock a new file of the same name while the old one is still held.
+        lockfile = filename.parent / f".{filename.name}{LOCK_SUFFIX}"
         filename.parent.mkdir(parents=True, exist_ok=True)
         with FileLock(lockfile):
             try:
@@ -42,23 +135,162 @@ class LocalStorage(Storage):
             except (Exception, KeyboardInterrupt):
                 filename.unlink()
                 raise
-            finally:
-                lockfile.unlink()
+
+    def lease(self, key: str) -> Lease:
+        # Like lock files, lease files are hidden and kept after use.  The lock is
+        # released by the OS if its owner dies, so stale leases recover by themselves.
+        filename = self._get_path(key)
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        return FileLock(filename.parent / f".{filename.name}{LEASE_SUFFIX}")
 
     def remove(self, key: str) -> None:
-        filename = self._root / key
+        filename = self._get_path(key)
         filename.unlink()
 
     def exists(self, key: str) -> bool:
-        return (self._root / key).exists()
+        return self._get_path(key).exists()
+
+    def exists_many(self, keys: Iterable[str]) -> set[str]:
+        # keys are grouped by directory, and each directory with many of them is listed once
+        directories: dict[Path, list[str]] = defaultdict(list)
+        for key in keys:
+            directories[self._get_path(key).parent].append(key)
+
+        existing: set[str] = set()
+        for directory, names in directories.items():
+            if len(names) < SCAN_THRESHOLD:
+                existing.update(name for name in names if (directory / name).exists())
+                continue
+            try:
+                with os.scandir(directory) as entries:
+                    listed = {entry.name for entry in entries if not entry.name.startswith(".")}
+            except FileNotFoundError:
+                continue
+            existing.update(name for name in names if name in listed)
+        return existing
+
+    def load_many(self, keys: Iterable[str]) -> dict[str, bytes]:
+        def load(key: str) -> bytes | None:
+            try:
+                with self.open(key, "rb") as file:
+                    return cast(bytes, file.read())
+            except FileNotFoundError:
+                return None
+
+        keys = list(dict.fromkeys(keys))
+        contents = self._run_many(load, keys)
+        return {key: content for key, content in zip(keys, contents) if content is not None}
+
+    def remove_many(self, keys: Iterable[str]) -> int:
+        def remove(key: str) -> bool:
+            try:
+                self._get_path(key).unlink()
+            except FileNotFoundError:
+                return False
+            return True
+
+        return sum(self._run_many(remove, list(dict.fromkeys(keys))))
+
+    @staticmethod
+    def _run_many(fn: Callable[[str], T], keys: list[str]) -> list[T]:
+        # file operations release the GIL, so they overlap in threads.  A pool of
+        # its own never waits for tasks queued in the shared storage executor.
+        if len(keys) <= 1:
+            return [fn(key) for key in keys]
+        with ThreadPoolExecutor(max_workers=min(DEFAULT_MAX_WORKERS, len(keys))) as pool:
+            return list(pool.map(fn, keys))
 
     def all(self) -> Iterator[str]:
-        for filename in self._root.glob("*"):
-            yield filename.name
+        if self._layout == "sharded":
+            for dirpath, dirnames, filenames in os.walk(self._root):
+                dirnames[:] = [dirname for dirname in dirnames if not dirname.startswith(".")]
+                for filename in filenames:
+                    if not filename.startswith("."):
+                        yield filename
+        else:
+            yield from self._scan(self._root)
 
     def filter(self, prefix: str) -> Iterator[str]:
-        for filename in self._root.glob(f"{prefix}*"):
-            yield filename.name
+        if self._layout == "sharded":
+            yield from self._filter_sharded(prefix)
+        else:
+            yield from self._scan(self._root, prefix)
+
+    @staticmethod
+    def _scan(directory: Path, prefix: str = "") -> Iterator[str]:
+        # hidden files like the metadata index are not artifacts.  Entries of a
+        # listing know their type, so files are told apart without `stat`.
+        try:
+            with os.scandir(directory) as entries:
+                names = [
+                    entry.name
+                    for entry in entries
+                    if entry.name.startswith(prefix) and not entry.name.startswith(".") and entry.is_file()
+                ]
+        except FileNotFoundError:
+            return
+        yield from names
+
+    def _filter_sharded(self, prefix: str) -> Iterator[str]:
+        _, _, name = prefix.rpartition("-")
+        funchash, sep, exechash = name.partition(".")
+        # a trailing slash of glob patterns matches only directories since Python 3.11
+        if sep and len(exechash) >= 2:
+            directories = [self._root / funchash / exechash[:2]]
+        elif sep:
+            directories = [path for path in (self._root / funchash).glob(f"{exechash}*") if path.is_dir()]
+        else:
+            directories = [
+                path for path in self._root.glob(f"{funchash}*/*") if path.is_dir() and not path.name.startswith(".")
+            ]
+
+        # keys not formatted as `function.execution` are kept in the root directory
+        directories.append(self._root)
+
+        for directory in directories:
+            yield from self._scan(directory, prefix)
+
+    def path(self, key: str) -> Path | None:
+        # files written through a custom open function such as `gzip.open` are not raw
+        if self._openfn is not open:
+            return None
+        return self._get_path(key)
+
+    def size(self, key: str) -> int:
+        return self._get_path(key).stat().st_size
+
+    def relocate(self) -> int:
+        """Move files placed for another layout to the paths of the current one.
+
+        This is used to migrate an existing flat cache to the sharded layout and
+        vice versa.  Returns the number of moved files.
+        """
+        if not self._root.exists():
+            return 0
+
+        num_moved = 0
+        for dirpath, dirnames, filenames in os.walk(self._root, topdown=False):
+            directory = Path(dirpath)
+            for filename in filenames:
+                # skip hidden files like the index, locks and temporary files being written
+                if filename.startswith("."):
+                    continue
+                source = directory / filename
+                target = self._get_path(filename)
+                if source != target:
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(source, target)
+                    num_moved += 1
+            if directory != self._root and not directory.name.startswith("."):
+                try:
+                    directory.rmdir()
+                except OSError:
+                    pass
+        return num_moved
+
+    @property
+    def metadata_index(self) -> MetadataIndex | None:
+        return self._index
 
     @classmethod
     def from_config(cls: Type[Self], config: SectionProxy) -> Self:
@@ -69,4 +301,8 @@ class LocalStorage(Storage):
         else:
             openfn = None
 
-        return cls(root=root, openfn=openfn)
+        index = config.getboolean("storage.index", False)
+        layout = config.get("storage.layout", "flat")
+        fsync = config.getboolean("storage.fsync", True)
+
+        return cls(root=root, openfn=openfn, index=index, layout=cast(Layout, layout), fsync=fsync)
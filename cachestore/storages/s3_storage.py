@@ -0,0 +1,409 @@
+from __future__ import annotations
+
+import io
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from configparser import SectionProxy
+from contextlib import contextmanager
+from typing import IO, Any, Callable, Iterable, Iterator, Type, TypeVar, cast
+
+from cachestore.storages.storage import Storage
+
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+except ModuleNotFoundError:
+    boto3 = None
+
+Self = TypeVar("Self", bound="S3Storage")
+T = TypeVar("T")
+
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_MAX_POOL_CONNECTIONS = 32
+# at most this many keys are deleted by a request
+DELETE_BATCH_SIZE = 1000
+# fewer keys than this are checked by requesting each of them instead of listing their prefix.
+# A listing is given up after a page per this many keys, where requesting each key is cheaper.
+SCAN_THRESHOLD = 16
+
+
+def _is_not_found(error: Exception) -> bool:
+    code = str(error.response.get("Error", {}).get("Code", ""))  # type: ignore[attr-defined]
+    return code in ("404", "NoSuchKey", "NotFound")
+
+
+class _MultipartWriter(io.RawIOBase):
+    """Stream uploading each full part while the next one is written.
+
+    Parts are uploaded in a thread pool with at most `max_concurrency` of them in
+    flight, so memory is bounded by the part size whatever the size of the object.
+    Objects smaller than a part are uploaded by a single request when closed.
+    """
+
+    def __init__(self, storage: S3Storage, key: str) -> None:
+        self._storage = storage
+        self._key = key
+        self._buffer = bytearray()
+        self._upload_id: str | None = None
+        self._parts: list[Future[dict[str, Any]]] = []
+        self._pool: ThreadPoolExecutor | None = None
+        self._failed = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        self._buffer += data
+        part_size = self._storage.part_size
+        while len(self._buffer) >= part_size:
+            self._upload_part(bytes(self._buffer[:part_size]))
+            del self._buffer[:part_size]
+        return len(memoryview(data))
+
+    def _upload_part(self, data: bytes) -> None:
+        storage = self._storage
+        if self._upload_id is None or self._pool is None:
+            response = storage.client.create_multipart_upload(Bucket=storage.bucket, Key=self._key)
+            self._upload_id = response["UploadId"]
+            self._pool = ThreadPoolExecutor(max_workers=storage.max_concurrency, thread_name_prefix="cachestore-s3")
+        # wait for the oldest part, so that buffered parts are bounded
+        in_flight = [part for part in self._parts if not part.done()]
+        if len(in_flight) >= storage.max_concurrency:
+            in_flight[0].result()
+
+        number = len(self._parts) + 1
+        upload_id = self._upload_id
+
+        def upload() -> dict[str, Any]:
+            response = storage.client.upload_part(
+                Bucket=storage.bucket, Key=self._key, UploadId=upload_id, PartNumber=number, Body=data
+            )
+            return {"ETag": response["ETag"], "PartNumber": number}
+
+        self._parts.append(self._pool.submit(upload))
+
+    def abort(self) -> None:
+        """Discard the object being written instead of completing it on close."""
+        self._failed = True
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        storage = self._storage
+        try:
+            if self._failed:
+                if self._upload_id is not None:
+                    storage.client.abort_multipart_upload(
+                        Bucket=storage.bucket, Key=self._key, UploadId=self._upload_id
+                    )
+            elif self._upload_id is None:
+                storage.client.put_object(Bucket=storage.bucket, Key=self._key, Body=bytes(self._buffer))
+            else:
+                try:
+                    if self._buffer:
+                        self._upload_part(bytes(self._buffer))
+                    parts = [part.result() for part in self._parts]
+                    storage.client.complete_multipart_upload(
+                        Bucket=storage.bucket,
+                        Key=self._key,
+                        UploadId=self._upload_id,
+                        MultipartUpload={"Parts": parts},
+                    )
+                except BaseException:
+                    storage.client.abort_multipart_upload(
+                        Bucket=storage.bucket, Key=self._key, UploadId=self._upload_id
+                    )
+                    raise
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+            self._buffer = bytearray()
+            super().close()
+
+
+class _RangedReader(io.RawIOBase):
+    """Stream downloading an object by ranges, fetching up to `max_concurrency` ranges ahead.
+
+    The first range is requested right away and tells the size of the object, so
+    objects smaller than a part are read by a single request.
+    """
+
+    def __init__(self, storage: S3Storage, key: str) -> None:
+        self._storage = storage
+        self._key = key
+        self._pool: ThreadPoolExecutor | None = None
+        self._ranges: deque[Future[bytes]] = deque()
+        self._current = memoryview(b"")
+
+        first, size = self._fetch_first()
+        self._current = memoryview(first)
+        self._next_offset = len(first)
+        self._size = size
+        if self._next_offset < size:
+            self._pool = ThreadPoolExecutor(max_workers=storage.max_concurrency, thread_name_prefix="cachestore-s3")
+            for _ in range(storage.max_concurrency):
+                self._schedule()
+
+    def _fetch_first(self) -> tuple[bytes, int]:
+        storage = self._storage
+        try:
+            response = storage.client.get_object(
+                Bucket=storage.bucket, Key=self._key, Range=f"bytes=0-{storage.part_size - 1}"
+            )
+        except ClientError as error:
+            if _is_not_found(error):
+                raise FileNotFoundError(self._key) from error
+            if str(error.response.get("Error", {}).get("Code")) == "InvalidRange":
+                # empty objects have no range to satisfy
+                return b"", 0
+            raise
+        data = response["Body"].read()
+        content_range = response.get("ContentRange")
+        size = int(content_range.rpartition("/")[2]) if content_range else len(data)
+        return data, size
+
+    def _schedule(self) -> None:
+        if self._pool is None or self._next_offset >= self._size:
+            return
+        storage = self._storage
+        start = self._next_offset
+        end = min(start + storage.part_size, self._size) - 1
+        self._next_offset = end + 1
+
+        def fetch() -> bytes:
+            response = storage.client.get_object(Bucket=storage.bucket, Key=self._key, Range=f"bytes={start}-{end}")
+            return cast(bytes, response["Body"].read())
+
+        self._ranges.append(self._pool.submit(fetch))
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        while not self._current:
+            if not self._ranges:
+                return 0
+            self._current = memoryview(self._ranges.popleft().result())
+            self._schedule()
+        size = min(len(buffer), len(self._current))
+        buffer[:size] = self._current[:size]
+        self._current = self._current[size:]
+        return size
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        for future in self._ranges:
+            future.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+        self._ranges.clear()
+        super().close()
+
+
+class S3Storage(Storage):
+    """Storage keeping each key as an object of a bucket in S3 or a compatible service like MinIO.
+
+    Keys are stored under `prefix` in the bucket, so that several caches share it.
+    The client keeps a pool of persistent connections shared by all threads.
+    Artifacts are streamed: writes upload parts of `part_size` bytes in parallel as
+    soon as they are full, and reads download ranges of the same size ahead in
+    parallel.  Listing keys pages through the objects under their prefix.
+
+    Metadata is kept as `metadata-<key>` objects next to artifacts, and every
+    process computes missing artifacts by itself.  This storage requires boto3.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        client: Any | None = None,
+        endpoint_url: str | None = None,
+        region: str | None = None,
+        part_size: int = DEFAULT_PART_SIZE,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+    ) -> None:
+        if boto3 is None:
+            raise ModuleNotFoundError("S3Storage requires boto3. Please install it by `pip install boto3`.")
+        if part_size < 5 * 1024 * 1024:
+            raise ValueError("part_size must be at least 5 MiB, the minimum size of multipart upload parts.")
+        if client is None:
+            config = BotoConfig(max_pool_connections=max_pool_connections, retries={"mode": "adaptive"})
+            client = boto3.session.Session().client("s3", endpoint_url=endpoint_url, region_name=region, config=config)
+        self._client = client
+        self._bucket = bucket
+        self._prefix = prefix
+        self._part_size = part_size
+        self._max_concurrency = max_concurrency
+
+    def __repr__(self) -> str:
+        return f"S3Storage(bucket={self._bucket}, prefix={self._prefix})"
+
+    @property
+    def client(self) -> Any:
+        return self._client
+
+    @property
+    def bucket(self) -> str:
+        return self._bucket
+
+    @property
+    def part_size(self) -> int:
+        return self._part_size
+
+    @property
+    def max_concurrency(self) -> int:
+        return self._max_concurrency
+
+    def _get_objkey(self, key: str) -> str:
+        return f"{self._prefix}{key}"
+
+    @contextmanager
+    def open(self, key: str, mode: str) -> Iterator[IO[Any]]:
+        if "+" in mode or "a" in mode:
+            raise ValueError(f"S3Storage does not support mode {mode}")
+        objkey = self._get_objkey(key)
+        if "r" in mode:
+            reader = io.BufferedReader(_RangedReader(self, objkey), buffer_size=io.DEFAULT_BUFFER_SIZE * 16)
+            with reader:
+                if "b" in mode:
+                    yield reader
+                else:
+                    with io.TextIOWrapper(reader, encoding="utf-8") as text:
+                        yield text
+            return
+
+        if "x" in mode and self.exists(key):
+            raise FileExistsError(key)
+        writer = _MultipartWriter(self, objkey)
+        # the object is created by closing the writer, so a failed write leaves the previous one
+        try:
+            stream: IO[bytes] = io.BufferedWriter(writer, buffer_size=io.DEFAULT_BUFFER_SIZE * 16)
+            if "b" in mode:
+                yield stream
+                stream.flush()
+            else:
+                text = io.TextIOWrapper(stream, encoding="utf-8")
+                yield text
+                text.flush()
+                text.detach()
+                stream.flush()
+        except BaseException:
+            writer.abort()
+            raise
+        finally:
+            writer.close()
+
+    def exists(self, key: str) -> bool:
+        try:
+            self._client.head_object(Bucket=self._bucket, Key=self._get_objkey(key))
+        except ClientError as error:
+            if _is_not_found(error):
+                return False
+            raise
+        return True
+
+    def remove(self, key: str) -> None:
+        # deleting a missing object succeeds unless the deletion is conditional on an existing one
+        try:
+            self._client.delete_object(Bucket=self._bucket, Key=self._get_objkey(key), IfMatch="*")
+        except ClientError as error:
+            if _is_not_found(error):
+                raise FileNotFoundError(key) from error
+            raise
+
+    def _list_pages(self, prefix: str) -> Iterator[list[tuple[str, int]]]:
+        paginator = self._client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self._bucket, Prefix=self._get_objkey(prefix)):
+            yield [(obj["Key"][len(self._prefix) :], obj["Size"]) for obj in page.get("Contents", [])]
+
+    def _list(self, prefix: str) -> Iterator[tuple[str, int]]:
+        for page in self._list_pages(prefix):
+            yield from page
+
+    def all(self) -> Iterator[str]:
+        for key, _ in self._list(""):
+            yield key
+
+    def filter(self, prefix: str) -> Iterator[str]:
+        for key, _ in self._list(prefix):
+            yield key
+
+    def size(self, key: str) -> int:
+        try:
+            response = self._client.head_object(Bucket=self._bucket, Key=self._get_objkey(key))
+        except ClientError as error:
+            if _is_not_found(error):
+                raise FileNotFoundError(key) from error
+            raise
+        return int(response["ContentLength"])
+
+    def _run_many(self, fn: Callable[[str], T], keys: list[str]) -> list[T]:
+        if len(keys) <= 1:
+            return [fn(key) for key in keys]
+        with ThreadPoolExecutor(max_workers=min(self._max_concurrency, len(keys))) as pool:
+            return list(pool.map(fn, keys))
+
+    def exists_many(self, keys: Iterable[str]) -> set[str]:
+        keys = list(dict.fromkeys(keys))
+        listed = self._list_function(keys) if len(keys) >= SCAN_THRESHOLD else None
+        if listed is None:
+            return {key for key, exists in zip(keys, self._run_many(self.exists, keys)) if exists}
+        return {key for key in keys if key in listed}
+
+    def _list_function(self, keys: list[str]) -> set[str] | None:
+        """List keys of the function shared by `keys`, or return `None` if it is not worth a listing."""
+        # keys are formatted like `[<namespace>-]<function>.<execution>`
+        function, sep, _ = keys[0].partition(".")
+        prefix = function + sep
+        if not function or not sep or not all(key.startswith(prefix) for key in keys):
+            return None
+        max_pages = len(keys) // SCAN_THRESHOLD
+        listed: set[str] = set()
+        for num_pages, page in enumerate(self._list_pages(prefix), 1):
+            if num_pages > max_pages:
+                return None
+            listed.update(key for key, _ in page)
+        return listed
+
+    def load_many(self, keys: Iterable[str]) -> dict[str, bytes]:
+        def load(key: str) -> bytes | None:
+            try:
+                response = self._client.get_object(Bucket=self._bucket, Key=self._get_objkey(key))
+            except ClientError as error:
+                if _is_not_found(error):
+                    return None
+                raise
+            return cast(bytes, response["Body"].read())
+
+        keys = list(dict.fromkeys(keys))
+        contents = self._run_many(load, keys)
+        return {key: content for key, content in zip(keys, contents) if content is not None}
+
+    def remove_many(self, keys: Iterable[str]) -> int:
+        keys = list(dict.fromkeys(keys))
+        num_removed = 0
+        for start in range(0, len(keys), DELETE_BATCH_SIZE):
+            objects = [{"Key": self._get_objkey(key)} for key in keys[start : start + DELETE_BATCH_SIZE]]
+            response = self._client.delete_objects(Bucket=self._bucket, Delete={"Objects": objects, "Quiet": False})
+            errors = response.get("Errors", [])
+            if errors:
+                raise OSError(f"Failed to remove {len(errors)} objects: {errors[0].get('Message')}")
+            num_removed += len(response.get("Deleted", []))
+        return num_removed
+
+    @classmethod
+    def from_config(cls: Type[Self], config: SectionProxy) -> Self:
+        return cls(
+            bucket=config["s3.bucket"],
+            prefix=config.get("s3.prefix", ""),
+            endpoint_url=config.get("s3.endpoint_url"),
+            region=config.get("s3.region"),
+            part_size=config.getint("s3.part_size", DEFAULT_PART_SIZE),
+            max_concurrency=config.getint("s3.max_concurrency", DEFAULT_MAX_CONCURRENCY),
+            max_pool_connections=config.getint("s3.max_pool_connections", DEFAULT_MAX_POOL_CONNECTIONS),
+        )
@@ -0,0 +1,382 @@
+from __future__ import annotations
+
+import io
+import os
+import sqlite3
+import threading
+import uuid
+from configparser import SectionProxy
+from contextlib import ExitStack, contextmanager, suppress
+from os import PathLike
+from pathlib import Path
+from typing import IO, Any, Callable, Iterable, Iterator, Optional, Tuple, Type, TypeVar
+
+from cachestore.indexes import MetadataIndex, SQLiteMetadataIndex
+from cachestore.storages.local_storage import TEMP_SUFFIX, LocalStorage
+from cachestore.storages.storage import Storage
+
+Self = TypeVar("Self", bound="SQLiteStorage")
+
+DEFAULT_PATH = ".cachestore.sqlite3"
+DEFAULT_SPILL_THRESHOLD = 1024 * 1024
+# limit of host parameters of old SQLite versions
+MAX_PARAMETERS = 999
+
+TABLES = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    data BLOB,
+    spilled INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# (key, inline data or None if spilled, size, side file written but not yet in place)
+Row = Tuple[str, Optional[bytes], int, Optional[Path]]
+
+
+class _SpillingWriter(io.RawIOBase):
+    """Stream keeping written bytes in memory until they exceed `threshold`, and then writing them to a file."""
+
+    def __init__(self, threshold: int, spill: Callable[[], IO[bytes]]) -> None:
+        self._threshold = threshold
+        self._spill = spill
+        self._buffer: io.BytesIO | None = io.BytesIO()
+        self._file: IO[bytes] | None = None
+        self.size = 0
+
+    @property
+    def data(self) -> bytes | None:
+        """Written bytes, or `None` if they were spilled into a file."""
+        return self._buffer.getvalue() if self._buffer is not None else None
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        size = len(memoryview(data))
+        self.size += size
+        if self._buffer is not None:
+            self._buffer.write(data)
+            if self._buffer.tell() <= self._threshold:
+                return size
+            self._file = self._spill()
+            self._file.write(self._buffer.getbuffer())
+            self._buffer = None
+        else:
+            assert self._file is not None
+            self._file.write(data)
+        return size
+
+
+class SQLiteStorage(Storage):
+    """Storage keeping artifacts as rows of a single SQLite database.
+
+    Small artifacts cost a row instead of files and locks, and the database runs in
+    WAL mode so that processes read concurrently with a writer.  Keys are the
+    primary key of the table, so `filter()` scans only the range of the prefix.
+    Artifacts larger than `spill_threshold` bytes are written to side files next to
+    the database instead, which are mapped into memory by formatters like other
+    local files.
+
+    Metadata is kept as `metadata-<key>` rows of the same table, or in the tables
+    of a `SQLiteMetadataIndex` in the same database with `index=True`.  Writes in a
+    `batch()` are committed in a single transaction.
+    """
+
+    def __init__(
+        self,
+        path: str | PathLike | None = None,
+        spill_threshold: int = DEFAULT_SPILL_THRESHOLD,
+        index: bool = False,
+        timeout: float = 30.0,
+    ) -> None:
+        self._path = Path(path or DEFAULT_PATH).absolute()
+        self._spill_threshold = spill_threshold
+        self._timeout = timeout
+        self._blobs = LocalStorage(self._path.parent / f"{self._path.name}.blobs", layout="sharded")
+        self._index = SQLiteMetadataIndex(self._path, timeout=timeout) if index else None
+        self._local = threading.local()
+
+    def __repr__(self) -> str:
+        return f"SQLiteStorage(path={self._path})"
+
+    @property
+    def database(self) -> Path:
+        return self._path
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection: sqlite3.Connection | None = getattr(self._local, "connection", None)
+        if connection is None:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self._path, timeout=self._timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(TABLES)
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    @staticmethod
+    def _prefix_range(prefix: str) -> tuple[str, str]:
+        return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+    @staticmethod
+    def _batches(keys: list[str]) -> Iterator[tuple[list[str], str]]:
+        for start in range(0, len(keys), MAX_PARAMETERS):
+            batch = keys[start : start + MAX_PARAMETERS]
+            yield batch, ", ".join("?" * len(batch))
+
+    @property
+    def _pending(self) -> dict[str, Row] | None:
+        pending: dict[str, Row] | None = getattr(self._local, "pending", None)
+        return pending
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Commit artifacts written by this thread in the block at once when it exits.
+
+        Artifacts are visible to other threads and processes only after the commit,
+        and none of them is stored if the block raises.
+        """
+        if self._pending is not None:
+            yield
+            return
+        self._local.pending = {}
+        try:
+            yield
+            rows = list(self._local.pending.values())
+        except BaseException:
+            self._discard(self._local.pending.values())
+            raise
+        finally:
+            self._local.pending = None
+        self._commit(rows)
+
+    def _commit(self, rows: list[Row]) -> None:
+        keys = [key for key, _, _, _ in rows]
+        try:
+            with self.transaction() as connection:
+                spilled: set[str] = set()
+                for batch, placeholders in self._batches(keys):
+                    spilled.update(
+                        key
+                        for (key,) in connection.execute(
+                            f"SELECT key FROM artifacts WHERE spilled = 1 AND key IN ({placeholders})", batch
+                        )
+                    )
+                connection.executemany(
+                    "INSERT OR REPLACE INTO artifacts (key, size, data, spilled) VALUES (?, ?, ?, ?)",
+                    ((key, size, data, int(data is None)) for key, data, size, _ in rows),
+                )
+        except BaseException:
+            self._discard(rows)
+            raise
+        # side files replace previous ones only once their rows are committed
+        for key, _, _, tempfile in rows:
+            if tempfile is not None:
+                os.replace(tempfile, self._blob_path(key))
+        # side files of artifacts replaced by small ones are not referenced anymore
+        self._blobs.remove_many(key for key, data, _, _ in rows if data is not None and key in spilled)
+
+    @staticmethod
+    def _discard(rows: Iterable[Row]) -> None:
+        for _, _, _, tempfile in rows:
+            if tempfile is not None:
+                with suppress(FileNotFoundError):
+                    tempfile.unlink()
+
+    def _blob_path(self, key: str) -> Path:
+        path = self._blobs.path(key)
+        assert path is not None
+        return path
+
+    @contextmanager
+    def _open_spill(self, key: str, tempfiles: list[Path]) -> Iterator[IO[bytes]]:
+        """Write a side file under a hidden temporary name, which is moved into place by `_commit`."""
+        path = self._blob_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tempfile = path.parent / f".{path.name}.{uuid.uuid4().hex}{TEMP_SUFFIX}"
+        tempfiles.append(tempfile)
+        try:
+            with open(tempfile, "wb") as file:
+                yield file
+                file.flush()
+                os.fsync(file.fileno())
+        except BaseException:
+            with suppress(FileNotFoundError):
+                tempfile.unlink()
+            raise
+
+    @contextmanager
+    def open(self, key: str, mode: str) -> Iterator[IO[Any]]:
+        if "+" in mode or "a" in mode:
+            raise ValueError(f"SQLiteStorage does not support mode {mode}")
+        if "r" in mode:
+            with self._open_reader(key) as stream:
+                if "b" in mode:
+                    yield stream
+                else:
+                    with io.TextIOWrapper(stream, encoding="utf-8") as text:
+                        yield text
+            return
+
+        if "x" in mode and self.exists(key):
+            raise FileExistsError(key)
+        tempfiles: list[Path] = []
+        with ExitStack() as stack:
+            # a failed write discards the side file, which replaces the previous one only on commit
+            writer = _SpillingWriter(
+                self._spill_threshold, lambda: stack.enter_context(self._open_spill(key, tempfiles))
+            )
+            stream = io.BufferedWriter(writer)
+            if "b" in mode:
+                yield stream
+            else:
+                text = io.TextIOWrapper(stream, encoding="utf-8")
+                yield text
+                text.flush()
+                text.detach()
+            stream.flush()
+        row = (key, writer.data, writer.size, tempfiles[0] if tempfiles else None)
+        pending = self._pending
+        if pending is not None:
+            if key in pending:
+                self._discard([pending[key]])
+            pending[key] = row
+        else:
+            self._commit([row])
+
+    @contextmanager
+    def _open_reader(self, key: str) -> Iterator[IO[bytes]]:
+        pending = self._pending
+        if pending is not None and key in pending:
+            _, data, _, tempfile = pending[key]
+            if tempfile is not None:
+                with open(tempfile, "rb") as file:
+                    yield file
+                return
+        else:
+            row = self.connection.execute("SELECT data, spilled FROM artifacts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                raise FileNotFoundError(key)
+            data = None if row[1] else row[0]
+        if data is not None:
+            yield io.BytesIO(data)
+            return
+        with self._blobs.open(key, "rb") as file:
+            yield file
+
+    def exists(self, key: str) -> bool:
+        if self._pending is not None and key in self._pending:
+            return True
+        return self.connection.execute("SELECT 1 FROM artifacts WHERE key = ?", (key,)).fetchone() is not None
+
+    def exists_many(self, keys: Iterable[str]) -> set[str]:
+        keys = list(keys)
+        existing = {key for key in keys if key in (self._pending or {})}
+        for batch, placeholders in self._batches(keys):
+            rows = self.connection.execute(f"SELECT key FROM artifacts WHERE key IN ({placeholders})", batch)
+            existing.update(key for (key,) in rows)
+        return existing
+
+    def load_many(self, keys: Iterable[str]) -> dict[str, bytes]:
+        contents: dict[str, bytes] = {}
+        spilled: list[str] = []
+        for batch, placeholders in self._batches(list(keys)):
+            rows = self.connection.execute(
+                f"SELECT key, data, spilled FROM artifacts WHERE key IN ({placeholders})", batch
+            )
+            for key, data, is_spilled in rows:
+                if is_spilled:
+                    spilled.append(key)
+                else:
+                    contents[key] = data
+        contents.update(self._blobs.load_many(spilled))
+        return contents
+
+    def remove(self, key: str) -> None:
+        with self.transaction() as connection:
+            row = connection.execute("SELECT spilled FROM artifacts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                raise FileNotFoundError(key)
+            connection.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+        if row[0]:
+            with suppress(FileNotFoundError):
+                self._blobs.remove(key)
+
+    def remove_many(self, keys: Iterable[str]) -> int:
+        num_removed = 0
+        spilled: list[str] = []
+        with self.transaction() as connection:
+            for batch, placeholders in self._batches(list(dict.fromkeys(keys))):
+                rows = connection.execute(f"SELECT key, spilled FROM artifacts WHERE key IN ({placeholders})", batch)
+                spilled.extend(key for key, is_spilled in rows if is_spilled)
+                num_removed += connection.execute(
+                    f"DELETE FROM artifacts WHERE key IN ({placeholders})", batch
+                ).rowcount
+        self._blobs.remove_many(spilled)
+        return num_removed
+
+    def all(self) -> Iterator[str]:
+        for (key,) in self.connection.execute("SELECT key FROM artifacts ORDER BY key").fetchall():
+            yield key
+
+    def filter(self, prefix: str) -> Iterator[str]:
+        if not prefix:
+            yield from self.all()
+            return
+        rows = self.connection.execute(
+            "SELECT key FROM artifacts WHERE key >= ? AND key < ? ORDER BY key", self._prefix_range(prefix)
+        ).fetchall()
+        for (key,) in rows:
+            yield key
+
+    def size(self, key: str) -> int:
+        pending = self._pending
+        if pending is not None and key in pending:
+            return pending[key][2]
+        row = self.connection.execute("SELECT size FROM artifacts WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(key)
+        return int(row[0])
+
+    def collect(self) -> int:
+        """Remove side files of no artifact, like ones left by interrupted writes."""
+        spilled = {key for (key,) in self.connection.execute("SELECT key FROM artifacts WHERE spilled = 1")}
+        return self._blobs.remove_many([key for key in self._blobs.all() if key not in spilled])
+
+    @property
+    def metadata_index(self) -> MetadataIndex | None:
+        return self._index
+
+    def path(self, key: str) -> Path | None:
+        pending = self._pending
+        if pending is not None and key in pending:
+            # side files are moved into place only once committed
+            return None
+        row = self.connection.execute("SELECT spilled FROM artifacts WHERE key = ?", (key,)).fetchone()
+        # small artifacts are rows rather than files
+        if row is None or not row[0]:
+            return None
+        return self._blobs.path(key)
+
+    @classmethod
+    def from_config(cls: Type[Self], config: SectionProxy) -> Self:
+        return cls(
+            path=config.get("sqlite.path"),
+            spill_threshold=config.getint("sqlite.spill_threshold", DEFAULT_SPILL_THRESHOLD),
+            index=config.getboolean("sqlite.index", False),
+            timeout=config.getfloat("sqlite.timeout", 30.0),
+        )
@@ -1,12 +1,26 @@
 import abc
+import io
+from concurrent.futures import Executor
 from configparser import SectionProxy
-from contextlib import contextmanager
-from typing import IO, Any, Iterator, Type, TypeVar
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import IO, Any, AsyncIterator, Dict, Iterable, Iterator, Optional, Set, Type, TypeVar
+
+from cachestore.common import AsyncFile, Lease
+from cachestore.common.aio import default_executor, enter_blocking, run_blocking
+from cachestore.indexes import MetadataIndex
 
 Self = TypeVar("Self", bound="Storage")
 
 
 class Storage(abc.ABC):
+    """Key-value store of artifacts.
+
+    Subclasses implement blocking methods.  Their `a`-prefixed async counterparts
+    run them in `executor` by default, so that coroutines never block the event
+    loop.  Storages with native async I/O may override the async methods.
+    """
+
     @abc.abstractmethod
     @contextmanager
     def open(self, key: str, mode: str) -> Iterator[IO[Any]]:
@@ -32,3 +46,96 @@ class Storage(abc.ABC):
         for key in self.all():
             if key.startswith(prefix):
                 yield key
+
+    def size(self, key: str) -> int:
+        with self.open(key, "rb") as file:
+            return file.seek(0, io.SEEK_END)
+
+    def exists_many(self, keys: Iterable[str]) -> Set[str]:
+        """Return the keys which exist among the given ones.
+
+        Bulk methods fall back to one call per key.  Storages which can answer many
+        keys at once, like in a single listing or request, override them.
+        """
+        return {key for key in keys if self.exists(key)}
+
+    def load_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """Read the content of the given keys as bytes.  Missing keys are skipped."""
+        contents: Dict[str, bytes] = {}
+        for key in keys:
+            try:
+                with self.open(key, "rb") as file:
+                    contents[key] = file.read()
+            except FileNotFoundError:
+                continue
+        return contents
+
+    def remove_many(self, keys: Iterable[str]) -> int:
+        """Remove the given keys, and return the number of removed ones.  Missing keys are ignored."""
+        num_removed = 0
+        for key in keys:
+            try:
+                self.remove(key)
+            except FileNotFoundError:
+                continue
+            num_removed += 1
+        return num_removed
+
+    @property
+    def metadata_index(self) -> Optional[MetadataIndex]:
+        """Index maintained by this storage to keep metadata of artifacts.
+
+        Storages without their own index return `None`, and metadata is kept in
+        the storage as `metadata-<key>` files instead.
+        """
+        return None
+
+    def lease(self, key: str) -> Optional[Lease]:
+        """Lease to coordinate computation of a key among processes sharing this storage.
+
+        Storages which cannot provide it return `None`, and every process computes
+        missing artifacts by itself.
+        """
+        return None
+
+    def path(self, key: str) -> Optional[Path]:
+        """Path of the file holding the artifact as is on the local file system.
+
+        Formatters use it to map artifacts into memory instead of reading them.
+        Storages whose artifacts are not such plain files return `None`.
+        """
+        return None
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Group writes of this thread in the block, so that they are committed at once.
+
+        Storages writing each artifact as it is closed do nothing.
+        """
+        yield
+
+    def collect(self) -> int:
+        """Remove data referenced by no key, and return the number of removed items.
+
+        Storages holding nothing but the artifacts of keys have nothing to collect.
+        """
+        return 0
+
+    @property
+    def executor(self) -> Executor:
+        return default_executor()
+
+    @asynccontextmanager
+    async def aopen(self, key: str, mode: str) -> AsyncIterator[AsyncFile]:
+        async with enter_blocking(self.executor, self.open(key, mode)) as file:
+            yield AsyncFile(file, self.executor)
+
+    async def aexists(self, key: str) -> bool:
+        return await run_blocking(self.executor, self.exists, key)
+
+    async def aremove(self, key: str) -> None:
+        await run_blocking(self.executor, self.remove, key)
+
+    async def afilter(self, prefix: str) -> AsyncIterator[str]:
+        for key in await run_blocking(self.executor, lambda: list(self.filter(prefix))):
+            yield key
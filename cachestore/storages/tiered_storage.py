@@ -0,0 +1,407 @@
+from __future__ import annotations
+
+import datetime
+import heapq
+import itertools
+import shutil
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, wait
+from configparser import SectionProxy
+from contextlib import contextmanager, suppress
+from logging import getLogger
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator, Literal, Sequence, Type, TypeVar, cast
+
+from cachestore.common import Lease
+from cachestore.indexes import MetadataIndex, Usage
+from cachestore.policies import EvictionPolicy, LRUPolicy
+from cachestore.storages.storage import Storage
+from cachestore.util import safe_import_object
+
+logger = getLogger(__name__)
+
+Self = TypeVar("Self", bound="TieredStorage")
+WriteMode = Literal["sync", "async"]
+
+# sections of the config file defining tiers are named `storage:<name>`
+SECTION_PREFIX = "storage:"
+COPY_CHUNK_SIZE = 1024 * 1024
+DEFAULT_WRITE_WORKERS = 4
+# the heap of ranked entries is rebuilt when outdated items outnumber live ones by this factor
+HEAP_COMPACTION_FACTOR = 2
+
+
+class _TierBudget:
+    """Usage of the entries of a tier, ranked by an eviction policy to keep the tier within its limits.
+
+    The budget is kept per process.  It starts from the entries found in the tier
+    when it is first needed, and then only follows writes of this process, so
+    entries written by other processes sharing the tier are not counted.
+
+    Entries are ranked in a heap updated as they are stored and accessed.  Items
+    of replaced or discarded entries are left in the heap and skipped when they
+    are popped.
+    """
+
+    def __init__(
+        self,
+        storage: Storage,
+        max_bytes: int | None,
+        max_entries: int | None,
+        eviction: EvictionPolicy,
+    ) -> None:
+        self._storage = storage
+        self._max_bytes = max_bytes
+        self._max_entries = max_entries
+        self._eviction = eviction
+        # key -> (usage, priority, sequence number of its item in the heap)
+        self._entries: dict[str, tuple[Usage, float, int]] = {}
+        self._heap: list[tuple[float, int, str]] = []
+        self._sequence = itertools.count()
+        self._nbytes = 0
+        self._floor = 0.0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        # entries stored before are ranked as if they were accessed long ago
+        accessed_at = datetime.datetime.fromtimestamp(0)
+        for key in list(self._storage.all()):
+            # sizes are only needed to bound bytes, and cost a request per key for remote tiers
+            size = 0
+            if self._max_bytes is not None:
+                try:
+                    size = self._storage.size(key)
+                except FileNotFoundError:
+                    continue
+            self._set(key, Usage(size, accessed_at, 0, None))
+
+    def _set(self, key: str, usage: Usage) -> None:
+        self._discard(key)
+        priority = self._eviction.priority(usage, self._floor)
+        sequence = next(self._sequence)
+        self._entries[key] = (usage, priority, sequence)
+        heapq.heappush(self._heap, (priority, sequence, key))
+        self._nbytes += usage.size
+        if len(self._heap) > HEAP_COMPACTION_FACTOR * len(self._entries) + 1:
+            self._heap = [(priority, sequence, key) for key, (_, priority, sequence) in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._nbytes -= entry[0].size
+
+    def put(self, key: str, size: int) -> None:
+        with self._lock:
+            self._load()
+            self._set(key, Usage(size, datetime.datetime.now(), 0, None))
+
+    def touch(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                usage = entry[0]
+                self._set(key, usage._replace(accessed_at=datetime.datetime.now(), hits=usage.hits + 1))
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._discard(key)
+
+    def _over_budget(self) -> bool:
+        return (self._max_bytes is not None and self._nbytes > self._max_bytes) or (
+            self._max_entries is not None and len(self._entries) > self._max_entries
+        )
+
+    def evict(self, keep: Iterable[str] = ()) -> list[str]:
+        """Drop the lowest ranked entries until the tier is within its limits, and return their keys."""
+        with self._lock:
+            self._load()
+            keep = set(keep)
+            kept: list[tuple[float, int, str]] = []
+            evicted: list[str] = []
+            while self._heap and self._over_budget():
+                item = heapq.heappop(self._heap)
+                priority, sequence, key = item
+                entry = self._entries.get(key)
+                if entry is None or entry[2] != sequence:
+                    continue
+                if key in keep:
+                    kept.append(item)
+                    continue
+                self._discard(key)
+                # like GreedyDual, later entries are ranked above the evicted ones
+                self._floor = max(self._floor, priority)
+                evicted.append(key)
+            for item in kept:
+                heapq.heappush(self._heap, item)
+            return evicted
+
+
+class TieredStorage(Storage):
+    """Storage chaining several storages from the fastest to the slowest, like a local disk in front of S3.
+
+    Reads look for the key in each tier in order, and hits in a slower tier are
+    promoted into all faster tiers.  Writes go to the fastest tier and then through
+    to all slower tiers, either before `open()` returns (`sync`) or in background
+    threads (`async`).  `flush()` waits for background writes.
+
+    Each tier but the slowest one may be bounded by `max_bytes` and `max_entries`,
+    and evicts entries ranked lowest by its eviction policy (LRU by default) when it
+    exceeds them.  Evicted entries remain in the slower tiers.  Usage of the tiers
+    is tracked per process, so a tier shared by several processes may exceed its
+    limits by what the other processes write.  Metadata is kept by the index of
+    the slowest tier.
+    """
+
+    def __init__(
+        self,
+        tiers: Sequence[Storage],
+        max_bytes: Sequence[int | None] | None = None,
+        max_entries: Sequence[int | None] | None = None,
+        eviction: Sequence[EvictionPolicy | None] | None = None,
+        write: WriteMode = "sync",
+        write_workers: int = DEFAULT_WRITE_WORKERS,
+    ) -> None:
+        if not tiers:
+            raise ValueError("TieredStorage needs at least one tier.")
+        if write not in ("sync", "async"):
+            raise ValueError(f"Unknown write mode: {write}")
+        max_bytes = list(max_bytes or [None] * len(tiers))
+        max_entries = list(max_entries or [None] * len(tiers))
+        policies = list(eviction or [None] * len(tiers))
+        if not len(max_bytes) == len(max_entries) == len(policies) == len(tiers):
+            raise ValueError("Limits and eviction policies must be given for each tier.")
+        if max_bytes[-1] is not None or max_entries[-1] is not None:
+            raise ValueError("The slowest tier keeps every entry, so it cannot be bounded.")
+
+        self._tiers = list(tiers)
+        self._budgets = [
+            (
+                _TierBudget(tier, tier_max_bytes, tier_max_entries, policy or LRUPolicy())
+                if tier_max_bytes is not None or tier_max_entries is not None
+                else None
+            )
+            for tier, tier_max_bytes, tier_max_entries, policy in zip(tiers, max_bytes, max_entries, policies)
+        ]
+        self._write = write
+        self._writer = ThreadPoolExecutor(max_workers=write_workers, thread_name_prefix="cachestore-tier")
+        self._pending: dict[str, Future[None]] = {}
+        self._pending_lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"TieredStorage({', '.join(repr(tier) for tier in self._tiers)})"
+
+    @property
+    def tiers(self) -> list[Storage]:
+        return self._tiers
+
+    def _copy(self, key: str, source: int, target: int) -> None:
+        with self._tiers[source].open(key, "rb") as src, self._tiers[target].open(key, "wb") as dst:
+            shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+        self._stored(key, target)
+
+    def _stored(self, key: str, level: int) -> None:
+        budget = self._budgets[level]
+        if budget is None:
+            return
+        budget.put(key, self._tiers[level].size(key))
+        with self._pending_lock:
+            # entries not written through yet are the only copy of their artifacts
+            keep = {key, *self._pending}
+        evicted = budget.evict(keep)
+        if evicted:
+            logger.info("evict %d entries from tier %d", len(evicted), level)
+            self._tiers[level].remove_many(evicted)
+
+    def _promote(self, key: str) -> int:
+        """Return the fastest tier from which the key can be read, promoting it into faster tiers."""
+        for level, tier in enumerate(self._tiers):
+            if not tier.exists(key):
+                continue
+            budget = self._budgets[level]
+            if budget is not None:
+                budget.touch(key)
+            target = level
+            try:
+                # each copy reads from the tier written just before, which is faster
+                for target in reversed(range(level)):
+                    self._copy(key, target + 1, target)
+                    level = target
+            except Exception:
+                logger.warning("Failed to promote %s into tier %d.", key, target, exc_info=True)
+            return level
+        raise FileNotFoundError(key)
+
+    def _write_through(self, key: str) -> None:
+        for level in range(1, len(self._tiers)):
+            self._copy(key, 0, level)
+
+    def _submit_write_through(self, key: str) -> None:
+        def done(future: Future[None]) -> None:
+            with self._pending_lock:
+                if self._pending.get(key) is future:
+                    del self._pending[key]
+            if not future.cancelled() and future.exception() is not None:
+                logger.error("Failed to write %s through slower tiers.", key, exc_info=future.exception())
+
+        with self._pending_lock:
+            future = self._writer.submit(self._write_through, key)
+            self._pending[key] = future
+        future.add_done_callback(done)
+
+    def _wait(self, keys: Iterable[str]) -> None:
+        with self._pending_lock:
+            futures = [self._pending[key] for key in keys if key in self._pending]
+        wait(futures)
+
+    def flush(self) -> None:
+        """Wait for all writes to slower tiers in the background."""
+        with self._pending_lock:
+            futures = list(self._pending.values())
+        wait(futures)
+
+    @contextmanager
+    def open(self, key: str, mode: str) -> Iterator[IO[Any]]:
+        if "+" in mode or "a" in mode:
+            raise ValueError(f"TieredStorage does not support mode {mode}")
+        if "r" in mode:
+            with self._tiers[self._promote(key)].open(key, mode) as file:
+                yield file
+            return
+
+        if "x" in mode and self.exists(key):
+            raise FileExistsError(key)
+        # a write through in progress would overwrite the new artifact with the previous one
+        self._wait([key])
+        with self._tiers[0].open(key, mode.replace("x", "w")) as file:
+            yield file
+        if len(self._tiers) > 1:
+            if self._write == "async":
+                self._submit_write_through(key)
+            else:
+                self._write_through(key)
+        self._stored(key, 0)
+
+    def exists(self, key: str) -> bool:
+        return any(tier.exists(key) for tier in self._tiers)
+
+    def exists_many(self, keys: Iterable[str]) -> set[str]:
+        remaining = set(keys)
+        existing: set[str] = set()
+        for tier in self._tiers:
+            if not remaining:
+                break
+            found = tier.exists_many(remaining)
+            existing |= found
+            remaining -= found
+        return existing
+
+    def remove(self, key: str) -> None:
+        self._wait([key])
+        removed = False
+        for tier, budget in zip(self._tiers, self._budgets):
+            if budget is not None:
+                budget.discard(key)
+            try:
+                tier.remove(key)
+            except FileNotFoundError:
+                continue
+            removed = True
+        if not removed:
+            raise FileNotFoundError(key)
+
+    def remove_many(self, keys: Iterable[str]) -> int:
+        keys = list(keys)
+        self._wait(keys)
+        existing = self.exists_many(keys)
+        for tier, budget in zip(self._tiers, self._budgets):
+            if budget is not None:
+                for key in keys:
+                    budget.discard(key)
+            tier.remove_many(keys)
+        return len(existing)
+
+    def _union(self, listings: Iterable[Iterator[str]]) -> Iterator[str]:
+        seen: set[str] = set()
+        for keys in listings:
+            for key in keys:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def all(self) -> Iterator[str]:
+        return self._union(tier.all() for tier in self._tiers)
+
+    def filter(self, prefix: str) -> Iterator[str]:
+        return self._union(tier.filter(prefix) for tier in self._tiers)
+
+    def size(self, key: str) -> int:
+        for tier in self._tiers:
+            with suppress(FileNotFoundError):
+                return tier.size(key)
+        raise FileNotFoundError(key)
+
+    def collect(self) -> int:
+        return sum(tier.collect() for tier in self._tiers)
+
+    @property
+    def metadata_index(self) -> MetadataIndex | None:
+        return self._tiers[-1].metadata_index
+
+    def lease(self, key: str) -> Lease | None:
+        # the slowest tier is shared by the most processes
+        for tier in reversed(self._tiers):
+            lease = tier.lease(key)
+            if lease is not None:
+                return lease
+        return None
+
+    def path(self, key: str) -> Path | None:
+        try:
+            level = self._promote(key)
+        except FileNotFoundError:
+            return None
+        return self._tiers[level].path(key)
+
+    @property
+    def executor(self) -> Executor:
+        return self._tiers[0].executor
+
+    @classmethod
+    def from_config(cls: Type[Self], config: SectionProxy) -> Self:
+        """Build tiers from the sections named `storage:<name>` listed by `tiered.tiers`.
+
+        Each of these sections is configured like a cache section, with `storage`
+        and the keys of that storage, as well as `eviction`, `eviction.maxbytes`
+        and `eviction.maxentries` to bound the tier.
+        """
+        tiers: list[Storage] = []
+        max_bytes: list[int | None] = []
+        max_entries: list[int | None] = []
+        policies: list[EvictionPolicy | None] = []
+        for name in config["tiered.tiers"].split(","):
+            section = config.parser[f"{SECTION_PREFIX}{name.strip()}"]
+            storagecls = safe_import_object(section.get("storage", "cachestore.LocalStorage"))
+            assert issubclass(storagecls, Storage)
+            tiers.append(storagecls.from_config(section))
+            max_bytes.append(section.getint("eviction.maxbytes") if "eviction.maxbytes" in section else None)
+            max_entries.append(section.getint("eviction.maxentries") if "eviction.maxentries" in section else None)
+            policy = None
+            if "eviction" in section:
+                policycls = safe_import_object(section["eviction"])
+                assert issubclass(policycls, EvictionPolicy)
+                policy = policycls.from_config(section)
+            policies.append(policy)
+
+        return cls(
+            tiers=tiers,
+            max_bytes=max_bytes,
+            max_entries=max_entries,
+            eviction=policies,
+            write=cast(WriteMode, config.get("tiered.write", "sync")),
+            write_workers=config.getint("tiered.write_workers", DEFAULT_WRITE_WORKERS),
+        )
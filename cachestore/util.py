@@ -1,43 +1,35 @@
 from __future__ import annotations
 
 import asyncio
-import bz2
-import gzip
 import importlib
 import inspect
-import lzma
 import pkgutil
 import string
 import sys
 import threading
 from collections.abc import AsyncIterator
-from contextlib import suppress
+from contextlib import ExitStack, suppress
 from queue import Queue
-from types import ModuleType
-from typing import Any, Callable, Iterator, TypeVar, Union
+from types import FunctionType, MethodType, ModuleType
+from typing import IO, Any, Callable, ContextManager, Iterator, TypeVar, Union, cast
 
 T = TypeVar("T")
 
 
-def b62encode(data: bytes) -> str:
-    num = int.from_bytes(data, "big")
-    characters = string.digits + string.ascii_letters
+B62_CHARACTERS = string.digits + string.ascii_letters
 
-    encoded = ""
-    base: int = len(characters)
 
-    if num < 0:
+def b62encode(data: bytes) -> str:
+    num = int.from_bytes(data, "big")
+    if num <= 0:
         return ""
 
-    while num >= base:
-        mod = num % base
-        num //= base
-        encoded = characters[mod] + encoded
-
-    if num > 0:
-        encoded = characters[num] + encoded
-
-    return encoded
+    characters = B62_CHARACTERS
+    encoded: list[str] = []
+    while num:
+        num, mod = divmod(num, 62)
+        encoded.append(characters[mod])
+    return "".join(reversed(encoded))
 
 
 def import_submodules(package_name: str) -> None:
@@ -94,14 +86,81 @@ def find_variable_path(obj: Any) -> str | None:
     return None
 
 
-def detect_open_fn(file: Any) -> Callable:
-    if isinstance(file, gzip.GzipFile):
-        return gzip.open
-    if isinstance(file, bz2.BZ2File):
-        return bz2.open
-    if isinstance(file, lzma.LZMAFile):
-        return lzma.open
-    return open
+def estimate_size(obj: Any) -> int:
+    """Roughly estimate the number of bytes held by an object and its children."""
+    size = 0
+    seen: set[int] = set()
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        if isinstance(value, (type, ModuleType, FunctionType, MethodType)):
+            continue
+
+        # buffers like memoryview and numpy.ndarray report their payload via nbytes
+        nbytes = getattr(value, "nbytes", None)
+        if isinstance(nbytes, int):
+            size += max(nbytes, sys.getsizeof(value))
+            continue
+
+        size += sys.getsizeof(value)
+        if isinstance(value, (str, bytes, bytearray)):
+            continue
+        if isinstance(value, dict):
+            stack.extend(value.keys())
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            stack.extend(value)
+        elif hasattr(value, "__dict__"):
+            stack.append(vars(value))
+    return size
+
+
+def take_batch(batch: Any, elements: list[Any], positions: list[int]) -> Any:
+    """Return the elements of a batch at the positions, in the same kind of container.
+
+    NumPy arrays are indexed along their first axis, tuples stay tuples, and other
+    batches are passed as lists.
+    """
+    numpy = sys.modules.get("numpy")
+    if numpy is not None and isinstance(batch, numpy.ndarray):
+        return batch[positions]
+    selected = [elements[position] for position in positions]
+    return tuple(selected) if isinstance(batch, tuple) else selected
+
+
+def stack_batch(elements: list[Any]) -> Any:
+    """Reassemble elements of a batch, stacking NumPy arrays and scalars into one array."""
+    numpy = sys.modules.get("numpy")
+    if numpy is not None and elements and all(isinstance(e, (numpy.ndarray, numpy.generic)) for e in elements):
+        return numpy.stack(elements)
+    return elements
+
+
+def read_keeping_open(manager: ContextManager[IO[Any]], read: Callable[[IO[Any]], T]) -> T:
+    """Read an artifact from the file opened by `manager` and close it.
+
+    Iterator artifacts read their items lazily, so the file is kept open until the
+    returned iterator is exhausted or garbage collected.  Iterators with an
+    `on_close(callback)` method are given the closing callback instead.
+    """
+    with ExitStack() as stack:
+        artifact = read(stack.enter_context(manager))
+        if not hasattr(artifact, "__next__"):
+            return artifact
+        on_close = getattr(artifact, "on_close", None)
+        if callable(on_close):
+            # iterators accessing the file at random close it by themselves
+            on_close(stack.pop_all().close)
+            return artifact
+        return cast(T, _iterate_and_close(cast(Iterator[Any], artifact), stack.pop_all()))
+
+
+def _iterate_and_close(iterator: Iterator[T], stack: ExitStack) -> Iterator[T]:
+    with stack:
+        yield from iterator
 
 
 def async_to_sync_iterator(async_iter: AsyncIterator[T]) -> Iterator[T]:
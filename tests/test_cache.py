@@ -1,8 +1,15 @@
 import asyncio
+import datetime
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import AsyncIterator, Iterator
+from typing import IO, Any, AsyncIterator, Dict, Generator, Iterator, List
 
-from cachestore import Cache, LocalStorage
+import pytest
+
+from cachestore import Cache, LocalStorage, StructuralHasher
 
 
 def test_cache(tmp_path: Path) -> None:
@@ -20,6 +27,22 @@ def test_cache(tmp_path: Path) -> None:
     assert output_1 == output_2 == 4
 
 
+def test_cache_with_structural_hasher(tmp_path: Path) -> None:
+    cache_root = tmp_path / "cache"
+    cache = Cache("testcache", storage=LocalStorage(cache_root), hasher=StructuralHasher())
+
+    @cache()
+    def total(values: Dict[str, List[int]]) -> int:
+        return sum(sum(v) for v in values.values())
+
+    assert total({"a": [1, 2], "b": [3]}) == 6
+    assert cache.exists(total)
+    assert len(list(cache.info(total))) == 1
+
+    assert total({"b": [3], "a": [1, 2]}) == 6
+    assert len(list(cache.info(total))) == 1
+
+
 def test_iterator_cache(tmp_path: Path) -> None:
     cache_root = tmp_path / "cache"
     cache = Cache("testcache", storage=LocalStorage(cache_root))
@@ -66,3 +89,441 @@ def test_async_iterator_cache(tmp_path: Path) -> None:
 
         output_2 = [x async for x in async_gen(5)]
         assert output_1 == output_2 == [0, 1, 2, 3, 4]
+
+    asyncio.run(run())
+
+
+def test_async_iterator_runs_on_caller_loop(tmp_path: Path) -> None:
+    cache_root = tmp_path / "cache"
+    cache = Cache("testcache", storage=LocalStorage(cache_root))
+
+    loops: List[asyncio.AbstractEventLoop] = []
+
+    @cache()
+    async def async_gen(n: int) -> AsyncIterator[int]:
+        loops.append(asyncio.get_running_loop())
+        for i in range(n):
+            await asyncio.sleep(0)
+            yield i
+
+    async def run() -> None:
+        assert [x async for x in async_gen(200)] == list(range(200))
+        assert loops == [asyncio.get_running_loop()]
+        assert [x async for x in async_gen(200)] == list(range(200))
+        assert len(loops) == 1
+
+    asyncio.run(run())
+
+
+def test_memory_cache(tmp_path: Path) -> None:
+    cache_root = tmp_path / "cache"
+    cache = Cache("testcache", storage=LocalStorage(cache_root), memory_maxsize=8)
+
+    num_calls = 0
+
+    @cache()
+    def square(x: int) -> int:
+        nonlocal num_calls
+        num_calls += 1
+        return x * x
+
+    assert square(3) == 9
+
+    # remove artifacts behind the cache to make sure hits are served from memory
+    for filename in cache_root.glob("*"):
+        filename.unlink()
+
+    assert square(3) == 9
+    assert num_calls == 1
+
+    cache.remove(square)
+    assert square(3) == 9
+    assert num_calls == 2
+
+
+def test_memory_cache_is_disabled_per_function(tmp_path: Path) -> None:
+    cache_root = tmp_path / "cache"
+    cache = Cache("testcache", storage=LocalStorage(cache_root), memory_maxsize=8)
+
+    @cache(memory=False)
+    def square(x: int) -> int:
+        return x * x
+
+    assert square(3) == 9
+    assert len(cache.memory) == 0
+
+
+def test_streaming_iterator_cache(tmp_path: Path) -> None:
+    cache_root = tmp_path / "cache"
+    cache = Cache("testcache", storage=LocalStorage(cache_root))
+
+    produced: List[int] = []
+
+    @cache(stream=True)
+    def gen(n: int) -> Iterator[int]:
+        for i in range(n):
+            produced.append(i)
+            yield i
+
+    output_1 = gen(5)
+    assert next(output_1) == 0
+    assert produced == [0]
+    assert not cache.exists(gen)
+
+    assert list(output_1) == [1, 2, 3, 4]
+    assert cache.exists(gen)
+
+    output_2 = gen(5)
+    assert list(output_2) == [0, 1, 2, 3, 4]
+    assert produced == [0, 1, 2, 3, 4]
+
+
+def test_abandoned_stream_is_discarded(tmp_path: Path) -> None:
+    cache_root = tmp_path / "cache"
+    cache = Cache("testcache", storage=LocalStorage(cache_root))
+
+    @cache(stream=True)
+    def gen(n: int) -> Generator[int, None, None]:
+        yield from range(n)
+
+    output = gen(5)
+    assert next(output) == 0
+    output.close()
+
+    assert not cache.exists(gen)
+    assert list(cache_root.glob("*")) == []
+    assert list(gen(5)) == [0, 1, 2, 3, 4]
+
+
+def test_streaming_async_iterator_cache(tmp_path: Path) -> None:
+    cache_root = tmp_path / "cache"
+    cache = Cache("testcache", storage=LocalStorage(cache_root))
+
+    @cache(stream=True)
+    async def async_gen(n: int) -> AsyncIterator[int]:
+        for i in range(n):
+            yield i
+
+    async def run() -> None:
+        output_1 = [x async for x in async_gen(5)]
+        assert cache.exists(async_gen)
+
+        output_2 = [x async for x in async_gen(5)]
+        assert output_1 == output_2 == [0, 1, 2, 3, 4]
+
+    asyncio.run(run())
+
+
+def test_concurrent_misses_are_computed_once(tmp_path: Path) -> None:
+    cache_root = tmp_path / "cache"
+    cache = Cache("testcache", storage=LocalStorage(cache_root))
+
+    num_calls = 0
+
+    @cache()
+    def slow_square(x: int) -> int:
+        nonlocal num_calls
+        num_calls += 1
+        time.sleep(0.1)
+        return x * x
+
+    results: List[int] = []
+    threads = [threading.Thread(target=lambda: results.append(slow_square(3))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [9] * 8
+    assert num_calls == 1
+
+
+def test_concurrent_async_misses_are_computed_once(tmp_path: Path) -> None:
+    cache_root = tmp_path / "cache"
+    cache = Cache("testcache", storage=LocalStorage(cache_root))
+
+    num_calls = 0
+
+    @cache()
+    async def async_square(x: int) -> int:
+        nonlocal num_calls
+        num_calls += 1
+        await asyncio.sleep(0.1)
+        if x < 0:
+            raise ValueError(x)
+        return x * x
+
+    async def run() -> None:
+        assert await asyncio.gather(*(async_square(3) for _ in range(8))) == [9] * 8
+        assert num_calls == 1
+
+        # failures are shared by waiters and not cached
+        results = await asyncio.gather(*(async_square(-1) for _ in range(4)), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert num_calls == 2
+
+    asyncio.run(run())
+
+
+def test_cache_evicts_entries_over_budget(tmp_path: Path) -> None:
+    cache_root = tmp_path / "cache"
+    cache = Cache("testcache", storage=LocalStorage(cache_root, index=True), max_entries=3)
+
+    num_calls = 0
+
+    @cache()
+    def square(x: int) -> int:
+        nonlocal num_calls
+        num_calls += 1
+        return x * x
+
+    for x in range(3):
+        square(x)
+    square(0)  # hit, so that 1 becomes the least recently used entry
+    square(3)
+
+    assert cache.index.totals()[0] == 3
+    assert num_calls == 4
+    square(0)
+    assert num_calls == 4
+    square(1)
+    assert num_calls == 5
+
+
+def test_memory_hits_are_tracked_for_eviction(tmp_path: Path) -> None:
+    cache_root = tmp_path / "cache"
+    cache = Cache("testcache", storage=LocalStorage(cache_root, index=True), max_entries=3, memory_maxsize=8)
+
+    @cache()
+    def square(x: int) -> int:
+        return x * x
+
+    for x in range(3):
+        square(x)
+    square(0)  # served from memory, and still recorded as a hit
+    square(3)
+
+    keys = {str(info.parameters["x"]): key for key, info in cache.info(square)}
+    assert sorted(keys) == ["0", "2", "3"]
+    usage = cache.index.usage(keys["0"])
+    assert usage is not None and usage.hits == 1
+
+
+def test_cache_budget_requires_usage_tracking(tmp_path: Path) -> None:
+    cache = Cache("testcache", storage=LocalStorage(tmp_path / "cache"), max_bytes=1024)
+
+    with pytest.raises(ValueError):
+
+        @cache()
+        def square(x: int) -> int:
+            return x * x
+
+
+def test_sweep_removes_expired_entries(tmp_path: Path) -> None:
+    cache_root = tmp_path / "cache"
+    cache = Cache("testcache", storage=LocalStorage(cache_root))
+
+    @cache(expire=datetime.timedelta(hours=1))
+    def square(x: int) -> int:
+        return x * x
+
+    @cache()
+    def cube(x: int) -> int:
+        return x * x * x
+
+    for x in range(3):
+        square(x)
+    cube(2)
+
+    assert cache.sweep() == 0
+    assert cache.sweep(datetime.datetime.now() + datetime.timedelta(hours=2)) == 3
+    assert not cache.exists(square)
+    assert cache.exists(cube)
+    assert sorted(path.name for path in cache_root.iterdir()) == sorted(
+        [key for key, _ in cache.info(cube)] + [f"metadata-{key}" for key, _ in cache.info(cube)]
+    )
+
+
+def test_background_sweeper(tmp_path: Path) -> None:
+    cache_root = tmp_path / "cache"
+    cache = Cache("testcache", storage=LocalStorage(cache_root, index=True), sweep_interval=0.05)
+
+    @cache(expire=datetime.timedelta(milliseconds=100))
+    def square(x: int) -> int:
+        return x * x
+
+    try:
+        square(2)
+        assert cache.exists(square)
+        time.sleep(0.5)
+        assert list(cache.info(square)) == []
+        assert list(cache.storage.all()) == []
+    finally:
+        cache.stop_sweeper()
+
+
+class SlowStorage(LocalStorage):
+    @contextmanager
+    def open(self, key: str, mode: str) -> Iterator[IO[Any]]:
+        time.sleep(0.2)
+        with super().open(key, mode) as file:
+            yield file
+
+
+def test_async_cache_does_not_block_event_loop(tmp_path: Path) -> None:
+    cache_root = tmp_path / "cache"
+    cache = Cache("testcache", storage=SlowStorage(cache_root))
+
+    @cache()
+    async def async_square(x: int) -> int:
+        return x * x
+
+    @cache()
+    async def async_gen(n: int) -> AsyncIterator[int]:
+        for i in range(n):
+            yield i
+
+    async def run() -> None:
+        num_ticks = 0
+
+        async def tick() -> None:
+            nonlocal num_ticks
+            while True:
+                await asyncio.sleep(0.01)
+                num_ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        try:
+            assert await async_square(3) == 9  # miss
+            assert await async_square(3) == 9  # hit
+            assert [x async for x in async_gen(3)] == [0, 1, 2]
+            assert [x async for x in async_gen(3)] == [0, 1, 2]
+        finally:
+            ticker.cancel()
+        # each storage access sleeps for 0.2 seconds outside the event loop
+        assert num_ticks >= 40
+
+    asyncio.run(run())
+
+
+def test_map(tmp_path: Path) -> None:
+    cache_root = tmp_path / "cache"
+    cache = Cache("testcache", storage=LocalStorage(cache_root, index=True))
+
+    computed: List[int] = []
+
+    @cache()
+    def square(x: int) -> int:
+        computed.append(x)
+        return x * x
+
+    assert square(3) == 9
+    assert list(cache.map(square, [1, 2, 3, 2, 4], batch_size=2)) == [1, 4, 9, 4, 16]
+    # hits and duplicated items are not computed again
+    assert sorted(computed) == [1, 2, 3, 4]
+    assert len(list(cache.info(square))) == 4
+
+    results = dict(cache.map(square, range(6), ordered=False))
+    assert results == {x: x * x for x in range(6)}
+    assert sorted(computed) == [0, 1, 2, 3, 4, 5]
+
+    with pytest.raises(ValueError):
+        list(cache.map(lambda x: x, [1]))
+
+
+def test_amap(tmp_path: Path) -> None:
+    cache_root = tmp_path / "cache"
+    cache = Cache("testcache", storage=LocalStorage(cache_root))
+
+    @cache()
+    def square(x: int) -> int:
+        return x * x
+
+    @cache()
+    async def async_square(x: int) -> int:
+        await asyncio.sleep(0.01)
+        return x * x
+
+    async def run() -> None:
+        assert [x async for x in cache.amap(square, range(5))] == [0, 1, 4, 9, 16]
+        assert [x async for x in cache.amap(async_square, range(5), concurrency=2)] == [0, 1, 4, 9, 16]
+        assert dict([x async for x in cache.amap(async_square, range(5), ordered=False)]) == {
+            x: x * x for x in range(5)
+        }
+        assert len(list(cache.info(async_square))) == 5
+
+        with pytest.raises(ValueError):
+            [x async for x in cache.amap(async_square, range(5), executor=ThreadPoolExecutor())]
+
+    asyncio.run(run())
+
+
+def test_amap_with_busy_storage_executor(tmp_path: Path) -> None:
+    storage_executor = ThreadPoolExecutor(max_workers=1)
+
+    class SingleThreadStorage(LocalStorage):
+        @property
+        def executor(self) -> Executor:
+            return storage_executor
+
+    cache = Cache("testcache", storage=SingleThreadStorage(tmp_path / "cache"))
+
+    @cache()
+    def square(x: int) -> int:
+        return x * x
+
+    assert list(cache.map(square, range(5))) == [0, 1, 4, 9, 16]
+
+    async def run() -> None:
+        # hits are loaded in the only thread of the storage executor
+        results = [x async for x in cache.amap(square, range(5))]
+        assert results == [0, 1, 4, 9, 16]
+
+    try:
+        asyncio.run(asyncio.wait_for(run(), timeout=10))
+    finally:
+        storage_executor.shutdown(wait=False)
+
+
+def test_batched_cache(tmp_path: Path) -> None:
+    cache_root = tmp_path / "cache"
+    cache = Cache("testcache", storage=LocalStorage(cache_root))
+
+    batches: List[List[int]] = []
+
+    @cache.batched("inputs")
+    def scale(inputs: List[int], factor: int = 2) -> List[int]:
+        batches.append(list(inputs))
+        return [x * factor for x in inputs]
+
+    assert scale([1, 2, 3]) == [2, 4, 6]
+    assert scale([3, 4, 1, 4]) == [6, 8, 2, 8]
+    assert batches == [[1, 2, 3], [4]]
+    assert len(list(cache.info(scale))) == 4
+
+    # other arguments are part of the key of each element
+    assert scale([1, 2], factor=3) == [3, 6]
+    assert batches[-1] == [1, 2]
+    assert scale([1, 2]) == [2, 4]
+    assert len(batches) == 3
+
+
+def test_batched_cache_with_numpy(tmp_path: Path) -> None:
+    numpy = pytest.importorskip("numpy")
+
+    cache_root = tmp_path / "cache"
+    cache = Cache("testcache", storage=LocalStorage(cache_root))
+
+    sizes: List[int] = []
+
+    @cache.batched()
+    def embed(inputs: Any) -> Any:
+        sizes.append(len(inputs))
+        return numpy.stack([inputs * 2.0, inputs + 1.0], axis=1)
+
+    first = embed(numpy.array([1.0, 2.0, 3.0]))
+    second = embed(numpy.array([3.0, 0.0, 1.0]))
+    assert sizes == [3, 1]
+    assert second.shape == (3, 2)
+    numpy.testing.assert_array_equal(second, [[6.0, 4.0], [0.0, 1.0], [2.0, 2.0]])
+    numpy.testing.assert_array_equal(first[0], second[2])
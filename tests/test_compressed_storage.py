@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import gzip
+import pickle
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from cachestore import Cache, CompressedStorage, LocalStorage
+from cachestore.common import compression
+
+LIBRARIES = {"zstd": "zstandard", "lz4": "lz4.frame"}
+
+
+@pytest.mark.parametrize("codec", ["gzip", "bz2", "lzma", "zstd", "lz4"])
+def test_cache_with_compressed_storage(tmp_path: Path, codec: str) -> None:
+    # missing libraries would fall back to gzip
+    if codec in LIBRARIES:
+        pytest.importorskip(LIBRARIES[codec])
+    storage = CompressedStorage(LocalStorage(tmp_path), codec=codec)
+    cache = Cache("testcache", storage=storage)
+
+    @cache()
+    def records(n: int) -> list:
+        return [{"id": i, "name": f"record-{i}"} for i in range(n)]
+
+    @cache(stream=True)
+    def numbers(n: int) -> Iterator[int]:
+        yield from range(n)
+
+    assert records(100) == records(100)
+    assert list(numbers(10)) == list(range(10))
+    assert list(numbers(10)) == list(range(10))
+    for key in storage.all():
+        assert (tmp_path / key).read_bytes().startswith(b"\x93CSZ")
+
+
+def test_compressed_storage_reads_files_of_other_codecs(tmp_path: Path) -> None:
+    with LocalStorage(tmp_path).open("plain", "wb") as file:
+        file.write(b"uncompressed")
+    with CompressedStorage(LocalStorage(tmp_path), codec="gzip").open("gzip", "wb") as file:
+        file.write(b"gzip")
+
+    storage = CompressedStorage(LocalStorage(tmp_path), codec="lzma")
+    with storage.open("plain", "rb") as file:
+        assert file.read() == b"uncompressed"
+    with storage.open("gzip", "rb") as file:
+        assert file.read() == b"gzip"
+    with storage.open("text", "w") as file:
+        file.write("text")
+    with storage.open("text", "r") as file:
+        assert file.read() == "text"
+
+
+def test_zstd_with_dictionary_and_threads(tmp_path: Path) -> None:
+    pytest.importorskip("zstandard")
+    samples = [pickle.dumps({"id": i, "name": f"user-{i}", "tags": ["a", "b", str(i % 7)]}) for i in range(1000)]
+    dictionary = compression.train_dictionary(samples, size=4096)
+
+    storage = CompressedStorage(LocalStorage(tmp_path), codec="zstd", level=10, threads=2, dictionary=dictionary)
+    with storage.open("with-dictionary", "wb") as file:
+        file.write(samples[0])
+    with storage.open("with-dictionary", "rb") as file:
+        assert file.read() == samples[0]
+
+    with CompressedStorage(LocalStorage(tmp_path), codec="zstd", level=10).open("without-dictionary", "wb") as file:
+        file.write(samples[0])
+    assert storage.size("with-dictionary") < storage.size("without-dictionary")
+
+
+def test_missing_codec_falls_back_to_gzip(monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture) -> None:
+    monkeypatch.setattr(compression, "zstandard", None)
+    monkeypatch.setattr(compression, "lz4frame", None)
+    assert compression.get_codec("zstd").NAME == "gzip"
+    assert compression.get_codec("lz4").NAME == "gzip"
+    assert "ignoring level" not in caplog.text
+
+    assert compression.get_codec("zstd", level=19).NAME == "gzip"
+    assert "ignoring level 19" in caplog.text
+
+
+def test_iterator_keeps_file_open_while_read(tmp_path: Path) -> None:
+    cache = Cache("testcache", storage=LocalStorage(tmp_path, openfn=gzip.open))
+
+    @cache(stream=True)
+    def numbers(n: int) -> Iterator[int]:
+        yield from range(n)
+
+    assert list(numbers(5)) == [0, 1, 2, 3, 4]
+    cached = numbers(5)
+    assert next(cached) == 0
+    assert list(cached) == [1, 2, 3, 4]
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from cachestore import Cache, ContentAddressedStorage, LocalStorage
+
+
+def _blobs(root: Path) -> list[str]:
+    return sorted(path.name for path in root.glob("blob-*"))
+
+
+def test_identical_artifacts_are_stored_once(tmp_path: Path) -> None:
+    storage = ContentAddressedStorage(LocalStorage(tmp_path))
+    cache = Cache("testcache", storage=storage)
+
+    @cache(ignore={"verbose"})
+    def dataset(size: int, verbose: bool = False) -> list[int]:
+        return list(range(size))
+
+    @cache()
+    def tagged(size: int, tag: str) -> list[int]:
+        return list(range(size))
+
+    assert tagged(100, "a") == tagged(100, "b") == dataset(100) == list(range(100))
+    assert len(_blobs(tmp_path)) == 1 + 3  # one artifact and three distinct metadata files
+    assert storage.usage()[0] == 4
+
+    cache.remove(tagged)
+    assert len(_blobs(tmp_path)) == 2
+    assert dataset(100) == list(range(100))
+
+    cache.remove(dataset)
+    assert _blobs(tmp_path) == []
+    assert list(storage.all()) == []
+
+
+def test_overwriting_releases_previous_blob(tmp_path: Path) -> None:
+    with LocalStorage(tmp_path).open("legacy", "w") as file:
+        file.write("legacy")
+
+    storage = ContentAddressedStorage(LocalStorage(tmp_path))
+    with storage.open("legacy", "r") as file:
+        assert file.read() == "legacy"
+
+    for key, content in [("a", b"first"), ("b", b"first"), ("a", b"second"), ("legacy", b"first")]:
+        with storage.open(key, "wb") as file:
+            file.write(content)
+
+    assert sorted(storage.all()) == ["a", "b", "legacy"]
+    assert storage.usage() == (2, len(b"first") + len(b"second"))
+    with storage.open("a", "rb") as file:
+        assert file.read() == b"second"
+    assert storage.size("legacy") == len(b"first")
+    assert not (tmp_path / "legacy").exists()
+
+    storage.remove("a")
+    assert storage.usage() == (1, len(b"first"))
+
+
+def test_collect_removes_orphaned_blobs(tmp_path: Path) -> None:
+    storage = ContentAddressedStorage(LocalStorage(tmp_path))
+    with storage.open("key", "wb") as file:
+        file.write(b"content")
+    with LocalStorage(tmp_path).open("blob-ab.abcdef", "wb") as file:
+        file.write(b"left by an interrupted write")
+
+    assert storage.collect() == 1
+    assert len(_blobs(tmp_path)) == 1
+    with storage.open("key", "rb") as file:
+        assert file.read() == b"content"
+
+
+@pytest.mark.parametrize("spool_size", [1024 * 1024, 16])
+def test_text_artifacts_are_spooled(tmp_path: Path, spool_size: int, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("cachestore.storages.content_addressed_storage.SPOOL_SIZE", spool_size)
+    storage = ContentAddressedStorage(LocalStorage(tmp_path))
+    for key in ["a", "b"]:
+        with storage.open(key, "w") as file:
+            file.write("line\n" * 100)
+
+    assert storage.usage() == (1, len("line\n" * 100))
+    with storage.open("b", "r") as file:
+        assert file.read() == "line\n" * 100
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import datetime
+
+from cachestore.common import ExpiryView
+
+NOW = datetime.datetime(2024, 1, 1)
+
+
+def test_expiry_view_pops_expired_keys_in_order() -> None:
+    view = ExpiryView()
+    view.set("a", NOW + datetime.timedelta(hours=2))
+    view.set("b", NOW + datetime.timedelta(hours=1))
+    view.set("c", None)
+    assert view.lookup("c") == (True, None)
+    assert view.lookup("d") == (False, None)
+
+    # updated expiry times replace old ones
+    view.set("a", NOW + datetime.timedelta(hours=3))
+    assert view.pop_expired(NOW + datetime.timedelta(hours=2)) == ["b"]
+    assert view.pop_expired(NOW + datetime.timedelta(hours=4)) == ["a"]
+    assert len(view) == 1
+
+
+def test_expiry_view_is_bounded() -> None:
+    view = ExpiryView(maxsize=2)
+    for key in "abc":
+        view.set(key, NOW)
+    assert "a" not in view
+    assert view.pop_expired(NOW) == ["b", "c"]
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import io
+from pathlib import Path
+from typing import AsyncIterator, Iterator, cast
+
+import pytest
+
+from cachestore import Cache, LocalStorage, NumpyFormatter, PickleFormatter
+from cachestore.formatters.pickle_formatter import PickleChunkedSequence
+
+try:
+    import numpy
+except ModuleNotFoundError:
+    numpy = None  # type: ignore[assignment]
+
+requires_numpy = pytest.mark.skipif(numpy is None, reason="numpy is not installed")
+
+
+def _artifact() -> dict:
+    return {
+        "matrix": numpy.arange(12, dtype=numpy.float32).reshape(3, 4),
+        "fortran": numpy.asfortranarray(numpy.arange(6, dtype=numpy.int64).reshape(2, 3)),
+        "strided": numpy.arange(10)[::2],
+        "records": numpy.zeros(2, dtype=[("a", "<i4"), ("b", "<f8", (2,))]),
+        "pair": (numpy.array([], dtype=numpy.int8), numpy.array(1.5)),
+        "meta": {"name": "embeddings", "objects": numpy.array([None, "x"], dtype=object)},
+    }
+
+
+def _assert_artifact_equal(actual: dict, expected: dict) -> None:
+    for name in ("matrix", "fortran", "strided", "records"):
+        assert actual[name].dtype == expected[name].dtype
+        numpy.testing.assert_array_equal(actual[name], expected[name])
+    assert isinstance(actual["pair"], tuple)
+    numpy.testing.assert_array_equal(actual["pair"][0], expected["pair"][0])
+    assert actual["pair"][1] == expected["pair"][1]
+    assert actual["meta"]["name"] == "embeddings"
+    assert actual["meta"]["objects"].tolist() == [None, "x"]
+
+
+@requires_numpy
+def test_numpy_formatter_maps_arrays_into_memory(tmp_path: Path) -> None:
+    formatter = NumpyFormatter()
+    artifact = _artifact()
+    with open(tmp_path / "artifact", "wb") as file:
+        formatter.write(file, artifact)
+
+    loaded = formatter.read_path(tmp_path / "artifact")
+    _assert_artifact_equal(loaded, artifact)
+    assert not loaded["matrix"].flags.writeable
+    assert loaded["matrix"].ctypes.data % 64 == 0
+
+    with open(tmp_path / "artifact", "rb") as file:
+        _assert_artifact_equal(formatter.read(file), artifact)
+
+
+@requires_numpy
+def test_numpy_formatter_reads_from_stream() -> None:
+    formatter = NumpyFormatter()
+    buffer = io.BytesIO()
+    formatter.write(buffer, iter([numpy.ones(3), numpy.zeros(2)]))
+    buffer.seek(0)
+    items = formatter.read(buffer)
+    assert hasattr(items, "__next__")
+    assert [item.tolist() for item in items] == [[1.0, 1.0, 1.0], [0.0, 0.0]]
+
+
+@requires_numpy
+def test_cache_with_numpy_formatter(tmp_path: Path) -> None:
+    cache = Cache("testcache", storage=LocalStorage(tmp_path / "cache"), formatter=NumpyFormatter())
+
+    @cache()
+    def embeddings(n: int) -> numpy.ndarray:
+        return numpy.arange(n * 4, dtype=numpy.float32).reshape(n, 4)
+
+    numpy.testing.assert_array_equal(embeddings(3), numpy.arange(12).reshape(3, 4))
+    assert not embeddings(3).flags.writeable
+
+
+@requires_numpy
+def test_pickle_formatter_with_out_of_band_buffers(tmp_path: Path) -> None:
+    formatter = PickleFormatter(out_of_band=True, min_buffer_size=1024)
+    artifact = {"large": numpy.arange(4096, dtype=numpy.float64), "small": numpy.arange(3), "raw": bytearray(2048)}
+    with open(tmp_path / "artifact", "wb") as file:
+        formatter.write(file, artifact)
+
+    loaded = formatter.read_path(tmp_path / "artifact")
+    numpy.testing.assert_array_equal(loaded["large"], artifact["large"])
+    numpy.testing.assert_array_equal(loaded["small"], artifact["small"])
+    assert loaded["raw"] == artifact["raw"]
+    assert not loaded["large"].flags.writeable
+    assert loaded["large"].ctypes.data % 64 == 0
+    assert loaded["small"].flags.writeable
+
+    with open(tmp_path / "artifact", "rb") as file:
+        loaded = formatter.read(file)
+    numpy.testing.assert_array_equal(loaded["large"], artifact["large"])
+    assert loaded["large"].flags.writeable
+
+
+@requires_numpy
+def test_pickle_formatter_reads_both_layouts(tmp_path: Path) -> None:
+    with open(tmp_path / "legacy", "wb") as file:
+        PickleFormatter().write(file, numpy.ones(3))
+    with open(tmp_path / "oob", "wb") as file:
+        PickleFormatter(out_of_band=True, min_buffer_size=0).write(file, numpy.ones(3))
+
+    for formatter in (PickleFormatter(), PickleFormatter(out_of_band=True)):
+        for name in ("legacy", "oob"):
+            assert formatter.read_path(tmp_path / name).tolist() == [1.0, 1.0, 1.0]
+            with open(tmp_path / name, "rb") as file:
+                assert formatter.read(file).tolist() == [1.0, 1.0, 1.0]
+
+    with pytest.raises(ValueError):
+        PickleFormatter(protocol=4, out_of_band=True)
+
+    # plain pickles gain nothing from paths, so they are read from opened files
+    assert not PickleFormatter().MAPPABLE
+    assert PickleFormatter(out_of_band=True).MAPPABLE and PickleFormatter(chunk_size=4).MAPPABLE
+
+
+def test_pickle_formatter_with_chunked_iterators(tmp_path: Path) -> None:
+    formatter = PickleFormatter(chunk_size=10)
+    with open(tmp_path / "artifact", "wb") as file:
+        formatter.write(file, iter(range(95)))
+
+    items = formatter.read_path(tmp_path / "artifact")
+    assert len(items) == 95
+    assert items[0] == 0 and items[42] == 42 and items[-1] == 94
+    assert items[8:13] == [8, 9, 10, 11, 12]
+    assert items[::30] == [0, 30, 60, 90]
+    assert list(items.iterate(90)) == [90, 91, 92, 93, 94]
+    assert list(items.iterate(25, 31)) == [25, 26, 27, 28, 29, 30]
+    assert next(items) == 0
+    assert list(items) == list(range(1, 95))
+    with pytest.raises(IndexError):
+        items[95]
+    items.close()
+
+    # streams which cannot seek are read sequentially
+    buffer = io.BytesIO()
+    write = formatter.iterwriter(buffer)
+    for i in range(25):
+        write(i)
+    write.close()  # type: ignore[attr-defined]
+    buffer.seek(0)
+    stream = io.BufferedReader(io.BytesIO(buffer.getvalue()))  # type: ignore[arg-type]
+    stream.seekable = lambda: False  # type: ignore[method-assign]
+    assert list(formatter.read(stream)) == list(range(25))
+
+
+def test_cache_with_chunked_iterators(tmp_path: Path) -> None:
+    cache = Cache("testcache", storage=LocalStorage(tmp_path), formatter=PickleFormatter(chunk_size=4))
+
+    @cache(stream=True)
+    def numbers(n: int) -> Iterator[int]:
+        yield from range(n)
+
+    assert list(numbers(10)) == list(range(10))
+    cached = cast(PickleChunkedSequence, numbers(10))
+    assert len(cached) == 10
+    assert cached[5:] == [5, 6, 7, 8, 9]
+
+    async def collect() -> list[int]:
+        return [item async for item in anumbers(10)]
+
+    @cache()
+    async def anumbers(n: int) -> AsyncIterator[int]:
+        for i in range(n):
+            yield i
+
+    assert asyncio.run(collect()) == list(range(10))
+    assert asyncio.run(collect()) == list(range(10))
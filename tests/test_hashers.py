@@ -0,0 +1,93 @@
+import dataclasses
+import datetime
+from pathlib import Path
+
+import pytest
+
+from cachestore import PickleHasher, StructuralHasher
+
+
+@dataclasses.dataclass
+class Point:
+    x: float
+    y: float
+
+
+class Opaque:
+    def __init__(self, value: int) -> None:
+        self.value = value
+
+
+def test_structural_hasher_distinguishes_values() -> None:
+    hasher = StructuralHasher()
+    values = [
+        None,
+        True,
+        1,
+        1.0,
+        "1",
+        b"1",
+        (1,),
+        [1],
+        {1},
+        {"1": 1},
+        Path("1"),
+        datetime.date(2020, 1, 1),
+        Point(1.0, 2.0),
+        Point(2.0, 1.0),
+    ]
+    digests = [hasher(value) for value in values]
+    assert len(set(digests)) == len(values)
+
+
+def test_structural_hasher_distinguishes_packed_sequences() -> None:
+    hasher = StructuralHasher()
+    # packed items must not encode like the walked items of another sequence
+    large = 2**50
+    crafted = int.from_bytes(large.to_bytes(7, "little", signed=True) + b"N", "little", signed=True)
+    assert hasher([7, crafted]) != hasher([large, None])
+    assert hasher(["a", "b"]) != hasher(["ab"])
+    assert hasher([1.0, 2.0]) != hasher([1.0, 2.0, 3.0])
+
+
+def test_structural_hasher_is_deterministic() -> None:
+    hasher = StructuralHasher()
+    assert hasher({"a": [1, 2.0, "x"], "b": {b"y"}}) == hasher({"b": {b"y"}, "a": [1, 2.0, "x"]})
+    assert hasher(memoryview(b"abcd")) == hasher(memoryview(bytearray(b"abcd")))
+    assert hasher(memoryview(b"abcdef")[::2]) == hasher(memoryview(b"ace"))
+
+
+def test_structural_hasher_handles_recursive_containers() -> None:
+    hasher = StructuralHasher()
+    value: list = [1]
+    value.append(value)
+    assert hasher(value) == hasher(value)
+
+
+def test_structural_hasher_uses_registered_reducer() -> None:
+    hasher = StructuralHasher()
+
+    @StructuralHasher.register(Opaque)
+    def _reduce_opaque(obj: Opaque) -> int:
+        return obj.value
+
+    try:
+        assert hasher(Opaque(1)) == hasher(Opaque(1))
+        assert hasher(Opaque(1)) != hasher(Opaque(2))
+    finally:
+        del StructuralHasher._registry[Opaque]
+
+
+def test_structural_hasher_supports_numpy() -> None:
+    numpy = pytest.importorskip("numpy")
+    hasher = StructuralHasher()
+    array = numpy.arange(12, dtype=numpy.float32).reshape(3, 4)
+    assert hasher(array) == hasher(array.copy())
+    assert hasher(array.T) == hasher(numpy.ascontiguousarray(array.T))
+    assert hasher(array) != hasher(array.astype(numpy.float64))
+    assert hasher(array) != hasher(array.reshape(4, 3))
+
+
+def test_pickle_hasher() -> None:
+    hasher = PickleHasher()
+    assert hasher({"a": 1}) == hasher({"a": 1})
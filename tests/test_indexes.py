@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import datetime
+from pathlib import Path
+
+from cachestore import Cache, LocalStorage
+from cachestore.indexes import FileMetadataIndex, SQLiteMetadataIndex
+from cachestore.metadata import CacheInfo, FunctionInfo
+
+FUNCINFO = FunctionInfo(name="module.func", filename=Path("module.py"), source="...")
+
+
+def _cacheinfo(expired_at: datetime.datetime | None = None) -> CacheInfo:
+    return CacheInfo(
+        function=FUNCINFO,
+        parameters={"x": "1"},
+        executed_at=datetime.datetime(2024, 1, 1),
+        expired_at=expired_at,
+    )
+
+
+def test_sqlite_metadata_index(tmp_path: Path) -> None:
+    index = SQLiteMetadataIndex(tmp_path / "index.sqlite3")
+    index.put("aaa.111", _cacheinfo(), size=10)
+    index.put("aaa.222", _cacheinfo(datetime.datetime(2024, 1, 2)), size=20)
+    index.put("aab.111", _cacheinfo(datetime.datetime(2024, 1, 3)), size=30)
+
+    cacheinfo = index.get("aaa.111")
+    assert cacheinfo is not None
+    assert cacheinfo._replace(parameters={}) == _cacheinfo()._replace(parameters={})
+    assert cacheinfo.parameters == {"x": "'1'"}
+
+    # restored metadata can be stored again as is
+    index.put("aaa.111", cacheinfo, size=10)
+    assert index.get("aaa.111") == cacheinfo
+    assert index.get("missing") is None
+    index.put("aaa.333", _cacheinfo()._replace(duration=1.5))
+    assert index.get_many(["aaa.333"])["aaa.333"].duration == 1.5
+    index.remove("aaa.333")
+    assert index.size("aaa.222") == 20
+    assert [key for key, _ in index.filter("aaa")] == ["aaa.111", "aaa.222"]
+    assert [key for key, _ in index.function("aab")] == ["aab.111"]
+    assert list(index.expired(datetime.datetime(2024, 1, 2, 12))) == ["aaa.222"]
+
+    index.remove("aaa.111")
+    assert list(index.keys()) == ["aaa.222", "aab.111"]
+
+
+def test_cache_with_sqlite_metadata_index(tmp_path: Path) -> None:
+    storage = LocalStorage(tmp_path / "cache", index=True)
+    cache = Cache("testcache", storage=storage)
+
+    @cache()
+    def square(x: int) -> int:
+        return x * x
+
+    assert square(2) == square(2) == 4
+    assert cache.exists(square)
+    assert [info.parameters for _, info in cache.info(square)] == [{"x": "2"}]
+    assert not any(key.startswith(FileMetadataIndex.PREFIX) for key in storage.all())
+
+    cache.remove(square)
+    assert not cache.exists(square)
+    assert list(storage.all()) == []
+
+
+def test_migrate_metadata(tmp_path: Path) -> None:
+    cache = Cache("testcache", storage=LocalStorage(tmp_path / "cache"))
+
+    @cache()
+    def square(x: int) -> int:
+        return x * x
+
+    square(2)
+    square(3)
+
+    storage = LocalStorage(tmp_path / "cache", index=True)
+    indexed_cache = Cache("testcache", storage=storage)
+    indexed_cache._function_registry = cache._function_registry
+    assert indexed_cache.migrate_metadata() == 2
+    assert not any(key.startswith(FileMetadataIndex.PREFIX) for key in storage.all())
+    assert sorted(info.parameters["x"] for _, info in indexed_cache.info(square)) == ["2", "3"]
+
+
+def test_sqlite_metadata_index_tracks_usage(tmp_path: Path) -> None:
+    index = SQLiteMetadataIndex(tmp_path / "index.sqlite3")
+    index.put("aaa.111", _cacheinfo(), size=10, priority=3.0)
+    index.put("aaa.222", _cacheinfo(), size=20, priority=1.0)
+    index.put("aaa.333", _cacheinfo(), size=30, priority=2.0)
+    assert index.totals() == (3, 60)
+    assert index.floor() == 1.0
+    assert list(index.lowest(2)) == ["aaa.222", "aaa.333"]
+
+    index.touch("aaa.222", datetime.datetime(2024, 1, 5), priority=4.0)
+    usage = index.usage("aaa.222")
+    assert usage is not None
+    assert usage.hits == 1
+    assert usage.accessed_at == datetime.datetime(2024, 1, 5)
+    assert list(index.lowest(3)) == ["aaa.333", "aaa.111", "aaa.222"]
+
+    # replacing and removing entries keep totals up to date
+    index.put("aaa.111", _cacheinfo(), size=15)
+    index.remove("aaa.333")
+    assert index.totals() == (2, 35)
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from cachestore import Cache, LocalStorage
+
+
+def test_sharded_layout(tmp_path: Path) -> None:
+    storage = LocalStorage(tmp_path, layout="sharded")
+    for key in ["abc.def", "abc.dxy", "abd.xyz", "metadata-abc.def", "other", "abcfile"]:
+        with storage.open(key, "w") as file:
+            file.write(key)
+
+    assert (tmp_path / "abc" / "de" / "abc.def").exists()
+    assert (tmp_path / "abc" / "de" / "metadata-abc.def").exists()
+    assert (tmp_path / "other").exists()
+
+    assert sorted(storage.all()) == ["abc.def", "abc.dxy", "abcfile", "abd.xyz", "metadata-abc.def", "other"]
+    assert sorted(storage.filter("abc.")) == ["abc.def", "abc.dxy"]
+    assert sorted(storage.filter("abc.de")) == ["abc.def"]
+    # files in the root matching the patterns of shard directories are not scanned as ones
+    assert sorted(storage.filter("ab")) == ["abc.def", "abc.dxy", "abcfile", "abd.xyz"]
+    assert sorted(storage.filter("metadata-")) == ["metadata-abc.def"]
+    assert sorted(storage.filter("oth")) == ["other"]
+
+
+@pytest.mark.parametrize("layout", ["flat", "sharded"])
+def test_bulk_operations(tmp_path: Path, layout: str) -> None:
+    storage = LocalStorage(tmp_path, layout=layout)  # type: ignore[arg-type]
+    keys = [f"abc.{i:03d}" for i in range(40)] + ["other"]
+    for key in keys:
+        with storage.open(key, "wb") as file:
+            file.write(key.encode())
+
+    missing = ["abc.999", "abd.000", "unknown"]
+    assert storage.exists_many(keys + missing) == set(keys)
+    assert storage.exists_many(missing) == set()
+    assert storage.load_many(["abc.001", "other", "unknown"]) == {"abc.001": b"abc.001", "other": b"other"}
+
+    assert storage.remove_many(keys[:30] + missing) == 30
+    assert sorted(storage.all()) == sorted(keys[30:])
+
+
+def test_exclusive_writers(tmp_path: Path) -> None:
+    storage = LocalStorage(tmp_path)
+    barrier = threading.Barrier(4)
+
+    def write(content: str) -> bool:
+        try:
+            with storage.open("key", "x") as file:
+                barrier.wait()
+                file.write(content)
+        except FileExistsError:
+            return False
+        return True
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(write, "abcd"))
+
+    assert results.count(True) == 1
+    with storage.open("key", "r") as file:
+        assert file.read() == "abcd"[results.index(True)]
+    assert [path.name for path in tmp_path.iterdir()] == ["key"]
+
+
+def test_relocate_flat_cache_into_sharded_layout(tmp_path: Path) -> None:
+    cache = Cache("testcache", storage=LocalStorage(tmp_path))
+
+    @cache()
+    def square(x: int) -> int:
+        return x * x
+
+    square(2)
+    square(3)
+
+    storage = LocalStorage(tmp_path, layout="sharded")
+    assert storage.relocate() == 4
+    assert not any(path.is_file() for path in tmp_path.iterdir())
+
+    sharded_cache = Cache("testcache", storage=storage)
+    sharded_square = sharded_cache()(square.__wrapped__)  # type: ignore[attr-defined]
+    assert sharded_cache.exists(sharded_square)
+    assert len(list(sharded_cache.info(sharded_square))) == 2
+
+    assert LocalStorage(tmp_path).relocate() == 4
+    assert not any(path.is_dir() for path in tmp_path.iterdir())
+
+
+def _write_repeatedly(root: Path, num_writes: int) -> None:
+    storage = LocalStorage(root, fsync=False)
+    for i in range(num_writes):
+        with storage.open("key", "wb") as file:
+            file.write(bytes([i % 256]) * 100_000)
+
+
+def _read_repeatedly(root: Path, num_reads: int) -> bool:
+    storage = LocalStorage(root)
+    for _ in range(num_reads):
+        with storage.open("key", "rb") as file:
+            data = file.read()
+        if len(data) != 100_000 or data != data[:1] * len(data):
+            return False
+    return True
+
+
+def test_concurrent_readers_see_complete_files(tmp_path: Path) -> None:
+    context = multiprocessing.get_context("fork")
+    _write_repeatedly(tmp_path, 1)
+
+    with context.Pool(4) as pool:
+        writer = pool.apply_async(_write_repeatedly, (tmp_path, 50))
+        readers = [pool.apply_async(_read_repeatedly, (tmp_path, 100)) for _ in range(3)]
+        writer.get(timeout=60)
+        assert all(reader.get(timeout=60) for reader in readers)
+
+    assert [path.name for path in tmp_path.iterdir()] == ["key"]
+
+
+def test_failed_write_keeps_previous_file(tmp_path: Path) -> None:
+    storage = LocalStorage(tmp_path)
+    with storage.open("key", "w") as file:
+        file.write("old")
+
+    with pytest.raises(RuntimeError):
+        with storage.open("key", "w") as file:
+            file.write("new")
+            raise RuntimeError
+
+    with storage.open("key", "r") as file:
+        assert file.read() == "old"
+    assert [path.name for path in tmp_path.iterdir()] == ["key"]
+
+
+def test_lease_times_out_while_held(tmp_path: Path) -> None:
+    storage = LocalStorage(tmp_path)
+    lease = storage.lease("key")
+    assert lease.acquire(timeout=0)
+
+    assert not storage.lease("key").acquire(timeout=0.1)
+
+    lease.release()
+    other = storage.lease("key")
+    assert other.acquire(timeout=0)
+    other.release()
+
+
+def _square_with_lease(root: Path) -> int:
+    cache = Cache("testcache", storage=LocalStorage(root / "cache"), lease=True)
+
+    @cache()
+    def slow_square(x: int) -> int:
+        with open(root / "calls", "a") as file:
+            file.write("called\n")
+        time.sleep(0.5)
+        return x * x
+
+    return slow_square(3)
+
+
+def test_lease_deduplicates_misses_across_processes(tmp_path: Path) -> None:
+    context = multiprocessing.get_context("fork")
+    with context.Pool(4) as pool:
+        results = [pool.apply_async(_square_with_lease, (tmp_path,)) for _ in range(4)]
+        assert [result.get(timeout=60) for result in results] == [9] * 4
+
+    assert (tmp_path / "calls").read_text() == "called\n"
@@ -0,0 +1,28 @@
+from cachestore.common import LRUCache
+
+
+def test_lrucache_evicts_least_recently_used_entries() -> None:
+    cache = LRUCache[str, int](maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+
+    cache.put("c", 3)
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+
+
+def test_lrucache_is_bounded_by_bytes() -> None:
+    cache = LRUCache[str, int](maxbytes=10)
+    cache.put("a", 1, size=6)
+    cache.put("b", 2, size=6)
+    assert "a" not in cache
+    assert cache.nbytes == 6
+
+    cache.put("c", 3, size=11)
+    assert "c" not in cache
+
+    cache.remove_prefix("b")
+    assert len(cache) == 0
+    assert cache.nbytes == 0
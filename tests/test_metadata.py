@@ -0,0 +1,46 @@
+import inspect
+from typing import Any, Dict
+
+import pytest
+
+from cachestore.metadata import ExecutionInfo, ExecutionInfoBuilder
+
+
+def _bind(func: Any, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+    bound_args = inspect.signature(func).bind(*args, **kwargs)
+    bound_args.apply_defaults()
+    return dict(bound_args.arguments)
+
+
+def test_execution_info_builder_matches_signature_binding() -> None:
+    def func(a: int, b: int = 2, /, c: int = 3, *, d: int = 4) -> None: ...
+
+    build = ExecutionInfoBuilder(func)
+    for args, kwargs in [((1,), {}), ((1, 5), {"d": 6}), ((1, 5, 7), {}), ((1,), {"c": 8})]:
+        execinfo = build(*args, **kwargs)
+        assert execinfo == ExecutionInfo(_bind(func, *args, **kwargs))
+        assert list(execinfo.params) == list(_bind(func, *args, **kwargs))
+
+
+def test_execution_info_builder_with_var_arguments() -> None:
+    def func(a: int, *args: int, **kwargs: int) -> None: ...
+
+    execinfo = ExecutionInfoBuilder(func)(1, 2, 3, x=4)
+    assert execinfo.params == {"a": 1, "args": (2, 3), "kwargs": {"x": 4}}
+
+
+def test_execution_info_builder_ignores_parameters() -> None:
+    def func(a: int, b: int = 2) -> None: ...
+
+    execinfo = ExecutionInfoBuilder(func, ignore={"b"})(1, b=3)
+    assert execinfo.params == {"a": 1}
+
+
+def test_execution_info_builder_raises_on_invalid_arguments() -> None:
+    def func(a: int, /, b: int) -> None: ...
+
+    build = ExecutionInfoBuilder(func)
+    with pytest.raises(ValueError):
+        build(a=1, b=2)
+    with pytest.raises(ValueError):
+        build(1, 2, 3)
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import datetime
+
+from cachestore.indexes import Usage
+from cachestore.policies import GreedyDualSizePolicy, LFUPolicy, LRUPolicy
+
+NOW = datetime.datetime(2024, 1, 1)
+
+
+def test_lru_policy_prefers_recent_entries() -> None:
+    policy = LRUPolicy()
+    old = Usage(size=10, accessed_at=NOW, hits=10, duration=1.0)
+    new = Usage(size=10, accessed_at=NOW + datetime.timedelta(seconds=1), hits=0, duration=1.0)
+    assert policy.priority(old, 0.0) < policy.priority(new, 0.0)
+
+
+def test_lfu_policy_prefers_frequent_entries() -> None:
+    policy = LFUPolicy()
+    rare = Usage(size=10, accessed_at=NOW, hits=1, duration=1.0)
+    frequent = Usage(size=10, accessed_at=NOW, hits=5, duration=1.0)
+    assert policy.priority(rare, 0.0) < policy.priority(frequent, 0.0)
+    # aging lets new entries overtake ones which were popular long ago
+    assert policy.priority(frequent, 0.0) < policy.priority(rare, 10.0)
+
+
+def test_greedy_dual_size_policy_prefers_expensive_entries() -> None:
+    policy = GreedyDualSizePolicy()
+    cheap = Usage(size=1000, accessed_at=NOW, hits=0, duration=1.0)
+    expensive = Usage(size=1000, accessed_at=NOW, hits=0, duration=60.0)
+    small = Usage(size=10, accessed_at=NOW, hits=0, duration=1.0)
+    assert policy.priority(cheap, 0.0) < policy.priority(expensive, 0.0)
+    assert policy.priority(cheap, 0.0) < policy.priority(small, 0.0)
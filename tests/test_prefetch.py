@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from cachestore import Cache, LocalStorage, PickleFormatter
+from cachestore.common import PrefetchIterator
+
+
+def test_prefetch_iterator_reads_ahead() -> None:
+    produced: list[int] = []
+
+    def source() -> Iterator[int]:
+        for i in range(10):
+            produced.append(i)
+            yield i
+
+    items = PrefetchIterator(source(), depth=3)
+    assert next(items) == 0
+    deadline = time.monotonic() + 5.0
+    while len(produced) < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    # one item consumed, three buffered and one waiting to be put
+    assert len(produced) == 5
+    assert list(items) == list(range(1, 10))
+
+
+def test_prefetch_iterator_raises_errors_of_source() -> None:
+    def source() -> Iterator[int]:
+        yield 1
+        raise KeyError("broken")
+
+    items = PrefetchIterator(source(), depth=2)
+    assert next(items) == 1
+    with pytest.raises(KeyError):
+        next(items)
+    assert list(items) == []
+
+
+def test_prefetch_iterator_stops_when_closed() -> None:
+    items = PrefetchIterator(iter(range(1000)), depth=1)
+    assert next(items) == 0
+    items.close()
+    items._thread.join(timeout=1.0)
+    assert not items._thread.is_alive()
+
+
+@pytest.mark.parametrize("chunk_size", [None, 7])
+def test_cache_prefetches_iterator_artifacts(tmp_path: Path, chunk_size: int | None) -> None:
+    cache = Cache("testcache", storage=LocalStorage(tmp_path), formatter=PickleFormatter(chunk_size=chunk_size))
+
+    @cache(stream=True, prefetch=2)
+    def numbers(n: int) -> Iterator[int]:
+        yield from range(n)
+
+    assert list(numbers(50)) == list(range(50))
+    assert list(numbers(50)) == list(range(50))
+
+
+def test_chunks_are_prefetched_in_processes(tmp_path: Path) -> None:
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        cache = Cache(
+            "testcache",
+            storage=LocalStorage(tmp_path),
+            formatter=PickleFormatter(chunk_size=10),
+            prefetch_executor=executor,
+        )
+
+        @cache(stream=True, prefetch=3)
+        def numbers(n: int) -> Iterator[int]:
+            yield from range(n)
+
+        assert list(numbers(95)) == list(range(95))
+        assert list(numbers(95)) == list(range(95))
+
+        (path,) = [path for path in tmp_path.glob("*.*") if not path.name.startswith("metadata-")]
+        items = PickleFormatter().read_path(path)
+        assert next(items) == 0
+        assert list(items.prefetch(2, executor)) == list(range(1, 95))
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import os
+from typing import Iterator
+
+import pytest
+
+from cachestore import Cache, S3Storage
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+PART_SIZE = 5 * 1024 * 1024
+
+
+@pytest.fixture
+def storage(monkeypatch: pytest.MonkeyPatch) -> Iterator[S3Storage]:
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="cachestore")
+        yield S3Storage("cachestore", prefix="caches/", client=client, part_size=PART_SIZE, max_concurrency=4)
+
+
+def test_cache_with_s3_storage(storage: S3Storage) -> None:
+    cache = Cache("testcache", storage=storage)
+
+    num_calls = 0
+
+    @cache()
+    def square(x: int) -> int:
+        nonlocal num_calls
+        num_calls += 1
+        return x * x
+
+    @cache(stream=True)
+    def numbers(n: int) -> Iterator[int]:
+        yield from range(n)
+
+    assert square(3) == square(3) == 9
+    assert num_calls == 1
+    assert list(numbers(5)) == list(numbers(5)) == [0, 1, 2, 3, 4]
+    assert len(list(cache.info(square))) == 1
+
+    cache.remove(square)
+    assert not cache.exists(square)
+
+
+def test_large_objects_are_transferred_in_parts(storage: S3Storage) -> None:
+    data = os.urandom(PART_SIZE * 2 + 123)
+    with storage.open("large", "wb") as file:
+        for start in range(0, len(data), 1024 * 1024):
+            file.write(data[start : start + 1024 * 1024])
+
+    response = storage.client.head_object(Bucket="cachestore", Key="caches/large", PartNumber=1)
+    assert response["PartsCount"] == 3
+    assert storage.size("large") == len(data)
+    with storage.open("large", "rb") as file:
+        assert file.read() == data
+
+
+def test_failed_write_keeps_previous_object(storage: S3Storage) -> None:
+    with storage.open("key", "w") as file:
+        file.write("previous")
+
+    with pytest.raises(RuntimeError):
+        with storage.open("key", "wb") as file:
+            file.write(os.urandom(PART_SIZE + 1))
+            raise RuntimeError
+
+    with storage.open("key", "r") as file:
+        assert file.read() == "previous"
+    assert storage.client.list_multipart_uploads(Bucket="cachestore").get("Uploads", []) == []
+
+
+def test_s3_storage_keys(storage: S3Storage, monkeypatch: pytest.MonkeyPatch) -> None:
+    keys = [f"abc.{i:03d}" for i in range(20)] + ["empty"]
+    for key in keys:
+        with storage.open(key, "wb") as file:
+            file.write(key.encode() if key != "empty" else b"")
+
+    with pytest.raises(FileNotFoundError):
+        with storage.open("missing", "rb"):
+            pass
+    with storage.open("empty", "rb") as file:
+        assert file.read() == b""
+
+    assert sorted(storage.all()) == sorted(keys)
+    assert sorted(storage.filter("abc.01")) == [f"abc.{i:03d}" for i in range(10, 20)]
+    assert storage.exists("abc.000") and not storage.exists("missing")
+    assert storage.exists_many(keys + ["abc.999"]) == set(keys)
+    assert storage.exists_many(["abc.001", "missing"]) == {"abc.001"}
+    assert storage.load_many(["abc.001", "missing"]) == {"abc.001": b"abc.001"}
+
+    with pytest.raises(FileNotFoundError):
+        storage.remove("missing")
+
+    # keys of a function are checked by listing it
+    with monkeypatch.context() as patch:
+        patch.setattr(storage, "exists", None)
+        assert storage.exists_many(f"abc.{i:03d}" for i in range(30)) == set(keys[:20])
+
+    storage.remove_many(keys[:10])
+    assert sorted(storage.all()) == sorted(keys[10:])
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from cachestore import Cache, SQLiteStorage
+
+
+def test_cache_with_sqlite_storage(tmp_path: Path) -> None:
+    storage = SQLiteStorage(tmp_path / "cache.sqlite3")
+    cache = Cache("testcache", storage=storage)
+
+    num_calls = 0
+
+    @cache()
+    def square(x: int) -> int:
+        nonlocal num_calls
+        num_calls += 1
+        return x * x
+
+    @cache(stream=True)
+    def numbers(n: int) -> Iterator[int]:
+        yield from range(n)
+
+    assert square(3) == square(3) == 9
+    assert num_calls == 1
+    assert list(numbers(5)) == list(numbers(5)) == [0, 1, 2, 3, 4]
+    assert len(list(cache.info(square))) == 1
+
+    # artifacts and metadata are rows of the database
+    assert [path.name for path in tmp_path.iterdir() if not path.name.startswith("cache.sqlite3-")] == ["cache.sqlite3"]
+    cache.remove(square)
+    assert not cache.exists(square)
+
+
+def test_cache_commits_artifacts_with_their_metadata(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    storage = SQLiteStorage(tmp_path / "cache.sqlite3")
+    cache = Cache("testcache", storage=storage)
+    commits: list[list[str]] = []
+    commit = storage._commit
+
+    def record(rows: list) -> None:
+        commits.append(sorted(key for key, *_ in rows))
+        commit(rows)
+
+    monkeypatch.setattr(storage, "_commit", record)
+
+    @cache()
+    def square(x: int) -> int:
+        return x * x
+
+    assert square(3) == 9
+    assert len(commits) == 1 and len(commits[0]) == 2
+    assert list(cache.map(square, range(4))) == [0, 1, 4, 9]
+    # metadata of the three misses is committed at once after their artifacts
+    assert [len(keys) for keys in commits[1:]] == [1, 1, 1, 3]
+
+
+def test_sqlite_storage_spills_large_artifacts(tmp_path: Path) -> None:
+    storage = SQLiteStorage(tmp_path / "cache.sqlite3", spill_threshold=16)
+    with storage.open("small", "wb") as file:
+        file.write(b"small")
+    with storage.open("large", "wb") as file:
+        file.write(b"large" * 10)
+
+    assert storage.path("small") is None
+    path = storage.path("large")
+    assert path is not None and path.read_bytes() == b"large" * 10
+    assert storage.size("large") == 50
+    assert storage.load_many(["small", "large", "missing"]) == {"small": b"small", "large": b"large" * 10}
+
+    # replacing a large artifact with a small one removes its side file
+    with storage.open("large", "w") as file:
+        file.write("now small")
+    with storage.open("large", "r") as file:
+        assert file.read() == "now small"
+    assert not path.exists()
+
+    with pytest.raises(RuntimeError):
+        with storage.open("small", "wb") as file:
+            file.write(b"x" * 100)
+            raise RuntimeError
+    with storage.open("small", "rb") as file:
+        assert file.read() == b"small"
+    assert storage.collect() == 0
+
+
+def test_sqlite_storage_keys_and_batches(tmp_path: Path) -> None:
+    storage = SQLiteStorage(tmp_path / "cache.sqlite3", spill_threshold=4)
+    with storage.batch():
+        for i in range(20):
+            with storage.open(f"abc.{i:03d}", "wb") as file:
+                file.write(b"value" if i % 2 else b"v")
+        assert storage.exists("abc.001")
+        with storage.open("abc.001", "rb") as file:
+            assert file.read() == b"value"
+        assert SQLiteStorage(tmp_path / "cache.sqlite3").exists_many(["abc.001"]) == set()
+    with storage.open("other", "wb") as file:
+        file.write(b"other")
+
+    assert list(storage.filter("abc.01")) == [f"abc.{i:03d}" for i in range(10, 20)]
+    assert len(list(storage.all())) == 21
+    assert storage.exists_many(["abc.000", "abc.999", "other"]) == {"abc.000", "other"}
+    assert storage.remove_many([f"abc.{i:03d}" for i in range(20)] + ["missing"]) == 20
+    assert list(storage.all()) == ["other"]
+    assert list((tmp_path / "cache.sqlite3.blobs").rglob("abc.*")) == []
+
+    with pytest.raises(FileNotFoundError):
+        storage.remove("missing")
+
+    # a failed batch leaves side files of already spilled artifacts as they were
+    with storage.open("abc.spilled", "wb") as file:
+        file.write(b"spilled")
+    with pytest.raises(RuntimeError):
+        with storage.batch():
+            with storage.open("abc.spilled", "wb") as file:
+                file.write(b"overwritten")
+            with storage.open("abc.spilled", "wb") as file:
+                file.write(b"overwritten twice")
+            raise RuntimeError
+    with storage.open("abc.spilled", "rb") as file:
+        assert file.read() == b"spilled"
+    assert storage.collect() == 0
+    assert [path.name for path in (tmp_path / "cache.sqlite3.blobs").rglob("*abc.*")] == ["abc.spilled"]
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from cachestore import Cache, LocalStorage, TieredStorage
+from cachestore.config import Config
+
+
+def _write(storage: TieredStorage, key: str, data: bytes) -> None:
+    with storage.open(key, "wb") as file:
+        file.write(data)
+
+
+def test_tiered_storage_writes_through_and_promotes(tmp_path: Path) -> None:
+    fast, slow = LocalStorage(tmp_path / "fast"), LocalStorage(tmp_path / "slow")
+    storage = TieredStorage([fast, slow])
+
+    _write(storage, "key", b"value")
+    assert fast.exists("key") and slow.exists("key")
+
+    fast.remove("key")
+    with storage.open("key", "rb") as file:
+        assert file.read() == b"value"
+    assert fast.exists("key")
+
+    assert storage.path("key") == fast.path("key")
+    storage.remove("key")
+    assert not storage.exists("key")
+    assert not slow.exists("key")
+
+
+def test_tiered_storage_writes_asynchronously(tmp_path: Path) -> None:
+    fast, slow = LocalStorage(tmp_path / "fast"), LocalStorage(tmp_path / "slow")
+    storage = TieredStorage([fast, slow], write="async")
+
+    for i in range(10):
+        _write(storage, f"key{i}", b"value")
+    storage.flush()
+    assert sorted(slow.all()) == sorted(fast.all()) == sorted(f"key{i}" for i in range(10))
+
+
+def test_tiered_storage_evicts_entries_from_bounded_tiers(tmp_path: Path) -> None:
+    fast, slow = LocalStorage(tmp_path / "fast"), LocalStorage(tmp_path / "slow")
+    storage = TieredStorage([fast, slow], max_entries=[2, None])
+
+    for key in ["a", "b", "c"]:
+        _write(storage, key, key.encode())
+    assert sorted(fast.all()) == ["b", "c"]
+    assert sorted(slow.all()) == ["a", "b", "c"]
+
+    # the hit on `b` makes `c` the least recently used entry
+    with storage.open("b", "rb"):
+        pass
+    with storage.open("a", "rb") as file:
+        assert file.read() == b"a"
+    assert sorted(fast.all()) == ["a", "b"]
+    assert sorted(storage.all()) == ["a", "b", "c"]
+
+
+def test_tiered_storage_from_config(tmp_path: Path) -> None:
+    config_path = tmp_path / "cachestore.ini"
+    config_path.write_text(
+        f"""
+[tiered]
+storage = cachestore.TieredStorage
+tiered.tiers = local, shared
+tiered.write = async
+
+[storage:local]
+storage = cachestore.LocalStorage
+storage.root = {tmp_path / "local"}
+eviction.maxbytes = 1000000
+
+[storage:shared]
+storage = cachestore.LocalStorage
+storage.root = {tmp_path / "shared"}
+storage.index = true
+"""
+    )
+    config = Config(config_path)
+    cache = Cache("tiered", config=config)
+    storage = cache.storage
+    assert isinstance(storage, TieredStorage)
+    assert [tier.root for tier in storage.tiers] == [tmp_path / "local", tmp_path / "shared"]  # type: ignore[attr-defined]
+
+    @cache()
+    def square(x: int) -> int:
+        return x * x
+
+    assert square(3) == square(3) == 9
+    storage.flush()
+    assert len(list(cache.info(square))) == 1
+    assert len(list(storage.tiers[1].all())) == 1